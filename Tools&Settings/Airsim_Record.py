@@ -0,0 +1,122 @@
+import os
+
+REC_FILE_NAME = 'airsim_rec.txt'
+STREAMS = ('left', 'right', 'seg', 'depth')
+
+def classify_stream(filename):
+    """
+    依 AirSim 錄製檔名判斷影像串流：img_*_left_0 / img_*_right_0 / img_*_left_5 的 png 與 pfm 深度圖。
+    無法辨識時回傳 None。
+    """
+    if filename.startswith('img_') and filename.endswith('.png'):
+        if '_left_0' in filename:
+            return 'left'
+        if '_right_0' in filename:
+            return 'right'
+        if '_left_5' in filename:
+            return 'seg'
+        return None
+    if filename.endswith('.pfm'):
+        return 'depth'
+    return None
+
+def depth_image_type(filename):
+    """
+    依檔名中的 AirSim ImageType 判斷深度類型：1 = DepthPlanar，2 = DepthPerspective，其他回傳 None。
+    """
+    parts = filename.split('_')
+    if len(parts) < 2:
+        return None
+    return {'1': 'planar', '2': 'perspective'}.get(parts[-2])
+
+def frame_key(filename):
+    """檔名尾端的數字（AirSim 的時間戳記）"""
+    return int(filename.split('_')[-1].split('.')[0])
+
+def rec_file_for(images_folder):
+    """AirSim 的 airsim_rec.txt 與 images 資料夾位於同一個錄製資料夾中"""
+    return os.path.join(os.path.dirname(os.path.abspath(images_folder)), REC_FILE_NAME)
+
+class RecordTail:
+    """
+    逐步讀取錄製中的 airsim_rec.txt。
+    每次 poll() 只讀取新附加的完整行，回傳每行的 {串流: 檔名}；尚未寫完的最後一行留到下次再讀。
+    """
+    def __init__(self, rec_path):
+        self.rec_path = rec_path
+        self.offset = 0
+        self.columns = None
+        self._partial = b''
+
+    def poll(self):
+        if not os.path.exists(self.rec_path):
+            return []
+        with open(self.rec_path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        self.offset += len(chunk)
+        data = self._partial + chunk
+        lines = data.split(b'\n')
+        self._partial = lines.pop()
+
+        rows = []
+        for raw in lines:
+            line = raw.decode('utf-8', errors='replace').rstrip('\r')
+            if not line.strip():
+                continue
+            fields = line.split('\t')
+            if self.columns is None:
+                self.columns = fields
+                continue
+            if 'ImageFile' not in self.columns or len(fields) < len(self.columns):
+                continue
+            image_field = fields[self.columns.index('ImageFile')]
+            streams = {}
+            for name in image_field.split(';'):
+                stream = classify_stream(name.strip())
+                if stream:
+                    streams[stream] = name.strip()
+            if streams:
+                rows.append(streams)
+        return rows
+
+def parse_rec_row(columns, fields):
+    """
+    將錄製檔的一行轉為 {'timestamp': 毫秒, 'position': (x, y, z), 'orientation': (w, x, y, z), 'streams': {串流: 檔名}}。
+    欄位不完整時回傳 None。
+    """
+    if len(fields) < len(columns):
+        return None
+    values = dict(zip(columns, fields))
+    try:
+        timestamp = int(values['TimeStamp'])
+        position = tuple(float(values[key]) for key in ('POS_X', 'POS_Y', 'POS_Z'))
+        orientation = tuple(float(values[key]) for key in ('Q_W', 'Q_X', 'Q_Y', 'Q_Z'))
+    except (KeyError, ValueError):
+        return None
+    streams = {}
+    for name in values.get('ImageFile', '').split(';'):
+        stream = classify_stream(name.strip())
+        if stream:
+            streams[stream] = name.strip()
+    return {'timestamp': timestamp, 'position': position, 'orientation': orientation, 'streams': streams}
+
+def read_rec_table(rec_path):
+    """
+    讀取整個 airsim_rec.txt，回傳每一行的紀錄（格式同 parse_rec_row），無法解析的行略過。
+    """
+    rows = []
+    with open(rec_path, 'r', encoding='utf-8', errors='replace') as f:
+        columns = None
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line.strip():
+                continue
+            fields = line.split('\t')
+            if columns is None:
+                columns = fields
+                continue
+            row = parse_rec_row(columns, fields)
+            if row is not None:
+                rows.append(row)
+    return rows
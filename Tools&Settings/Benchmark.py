@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+from datetime import datetime
+from Airsim_Record import REC_FILE_NAME
+from Fake_Recording import write_recording
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_GENERATOR = os.path.join(TOOLS_DIR, 'DataGenerator.py')
+# 基準檔與每次的結果一起放在 --workdir 中，不寫入原始碼資料夾
+BASELINE_NAME = 'Benchmark_Baseline.json'
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+
+# 比較的階段（Run_Telemetry 的階段名稱），加上整體的 wall
+BENCH_STAGES = ('scan', 'depth_read', 'copy_left', 'copy_right', 'copy_seg',
+                'depth_convert', 'depth_clamp', 'depth_stats', 'disparity', 'right_view', 'scene_flow', 'pyramid',
+                'write_maps', 'point_cloud', 'results_copy', 'wall')
+
+# 低於此值（毫秒/影格）的差異視為量測雜訊，不判定為退步
+NOISE_FLOOR_MS = 0.02
+
+def recording_frames(record_folder):
+    """airsim_rec.txt 的資料行數，沒有時回傳 0"""
+    rec_path = os.path.join(record_folder, REC_FILE_NAME)
+    if not os.path.exists(rec_path):
+        return 0
+    with open(rec_path, 'r', encoding='utf-8') as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+def ensure_recording(workdir, frames, width, height):
+    """建立（或重用）指定大小的假錄製資料夾，回傳 images 資料夾路徑"""
+    name = f'bench_{frames}_{width}x{height}'
+    record_folder = os.path.join(workdir, 'recordings', name)
+    if recording_frames(record_folder) == frames:
+        return os.path.join(record_folder, 'images')
+    if os.path.exists(record_folder):
+        shutil.rmtree(record_folder)
+    print(f'[bench] writing {frames} synthetic frames ({width}x{height})...', flush=True)
+    return write_recording(os.path.join(workdir, 'recordings'), frames, width, height, folder_name=name)
+
+def run_generator(images_folder, output_folder, workers):
+    """
+    以命令列模式執行一次完整的 DataGenerator（清空輸出，避免增量處理略過影格），
+    回傳 telemetry 報告。
+    """
+    if os.path.exists(output_folder):
+        shutil.rmtree(output_folder)
+    command = [sys.executable, DATA_GENERATOR, '--source', images_folder, '--json', '--lang', 'en',
+               '--output', os.path.join(output_folder, 'ProcessData'),
+               '--results', os.path.join(output_folder, 'Results', 'Img')]
+    if workers is not None:
+        command += ['--workers', str(workers)]
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8')
+    report = None
+    for line in process.stdout.splitlines():
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if event.get('event') == 'telemetry':
+            report = event['report']
+    if process.returncode != 0 or report is None:
+        raise RuntimeError(f'DataGenerator failed (exit {process.returncode}):\n{process.stderr[-2000:]}')
+    return report
+
+def per_frame_ms(report, frames):
+    """將報告換算為各階段的毫秒/影格"""
+    result = {}
+    for stage in BENCH_STAGES:
+        if stage == 'wall':
+            seconds = report['wall_seconds']
+        elif stage in report['stages']:
+            seconds = report['stages'][stage]['seconds']
+        else:
+            continue
+        result[stage] = round(seconds * 1000.0 / frames, 4)
+    return result
+
+def compare(current, baseline, tolerance):
+    """回傳退步清單 [(階段, 目前, 基準)]：比基準慢超過 tolerance 比例且超過雜訊門檻"""
+    regressions = []
+    for stage, value in current.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        if value > base * (1 + tolerance) and value - base > NOISE_FLOOR_MS:
+            regressions.append((stage, value, base))
+    return regressions
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='Benchmark.py',
+        description='以假錄製資料量測 DataGenerator 各階段效能並與基準比較 / '
+                    'benchmark DataGenerator stages on synthetic recordings')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='影格數 / frame counts')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--workers', type=int, help='Worker_Num（預設沿用 Settings.txt）')
+    parser.add_argument('--workdir', default='Benchmark', help='假錄製資料與輸出資料夾 / working folder')
+    parser.add_argument('--baseline', help=f'基準檔，預設為 <workdir>/{BASELINE_NAME} / baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允許變慢的比例 / allowed slowdown ratio')
+    parser.add_argument('--save-baseline', action='store_true', help='將本次結果存為基準 / store results as baseline')
+    parser.add_argument('--clean', action='store_true', help='結束後刪除假錄製資料 / delete recordings afterwards')
+    args = parser.parse_args(argv)
+    if args.baseline is None:
+        args.baseline = os.path.join(args.workdir, BASELINE_NAME)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    baseline = load_baseline(args.baseline)
+    results = {}
+    all_regressions = []
+
+    for frames in args.sizes:
+        key = f'{frames}@{args.width}x{args.height}'
+        images_folder = ensure_recording(args.workdir, frames, args.width, args.height)
+        print(f'[bench] {key}: running DataGenerator...', flush=True)
+        start = time.time()
+        report = run_generator(images_folder, os.path.join(args.workdir, 'output'), args.workers)
+        current = per_frame_ms(report, frames)
+        results[key] = current
+
+        regressions = compare(current, baseline.get(key, {}), args.tolerance)
+        flagged = {stage for stage, _, _ in regressions}
+        print(f'[bench] {key}: {time.time() - start:.1f}s, peak RSS {report["peak_rss_bytes"] / 1048576:.0f}MB')
+        print(f'    {"stage":<13} {"ms/frame":>10} {"baseline":>10}')
+        for stage, value in current.items():
+            base = baseline.get(key, {}).get(stage)
+            base_text = f'{base:.4f}' if base is not None else '-'
+            mark = '  REGRESSION' if stage in flagged else ''
+            print(f'    {stage:<13} {value:>10.4f} {base_text:>10}{mark}', flush=True)
+        all_regressions += [(key,) + item for item in regressions]
+
+    result_path = os.path.join(args.workdir, f'benchmark_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump({'tolerance': args.tolerance, 'results': results,
+                   'regressions': [list(item) for item in all_regressions]}, f, indent=2)
+    print(f'[bench] results saved: {result_path}')
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f'[bench] baseline updated: {args.baseline}')
+
+    if args.clean:
+        shutil.rmtree(os.path.join(args.workdir, 'recordings'), ignore_errors=True)
+    shutil.rmtree(os.path.join(args.workdir, 'output'), ignore_errors=True)
+
+    if all_regressions:
+        for key, stage, value, base in all_regressions:
+            print(f'[bench] REGRESSION {key} {stage}: {value:.4f} ms/frame vs baseline {base:.4f}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,36 @@
+import numpy as np
+from functools import lru_cache
+
+def focal_length_px(width, fov_degrees):
+    """水平 FOV 與影像寬度對應的焦距（像素）"""
+    return (width / 2) / np.tan(np.deg2rad(fov_degrees / 2))
+
+@lru_cache(maxsize=8)
+def ray_grid(width, height, fov_degrees, normalized=False):
+    """
+    每個像素中心的射線方向 (H, W, 3)，相機座標為 x 向右、y 向下、z 向前（與 OpenCV / KITTI 相機座標相同）。
+    normalized=False 時 z = 1，乘上平面深度即為 3D 點；normalized=True 時為單位向量，乘上透視深度（沿射線的距離）。
+    深度類型轉換、點雲與光流都由這裡取得相機內參，依 (寬, 高, 水平 FOV) 只建立一次；回傳的陣列為唯讀。
+    """
+    focal = focal_length_px(width, fov_degrees)
+    u = (np.arange(width, dtype=np.float64) - width / 2 + 0.5) / focal
+    v = (np.arange(height, dtype=np.float64) - height / 2 + 0.5) / focal
+    grid = np.empty((height, width, 3), dtype=np.float64)
+    grid[..., 0] = u[np.newaxis, :]
+    grid[..., 1] = v[:, np.newaxis]
+    grid[..., 2] = 1.0
+    if normalized:
+        grid /= np.linalg.norm(grid, axis=2, keepdims=True)
+    grid = grid.astype(np.float32)
+    grid.flags.writeable = False
+    return grid
+
+@lru_cache(maxsize=8)
+def ray_cosine_grid(width, height, fov_degrees):
+    """
+    每個像素的射線與光軸夾角的餘弦 (H, W)，即單位射線的 z 分量：planar = perspective * cos，perspective = planar / cos。
+    之後每個影格只需一次乘法；回傳的陣列為唯讀。
+    """
+    grid = np.ascontiguousarray(ray_grid(width, height, fov_degrees, True)[..., 2])
+    grid.flags.writeable = False
+    return grid
@@ -1,15 +1,34 @@
 import os
 import shutil
 import re
+import time
 import glob
-import numpy as np
+import threading
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QSpinBox, QPushButton, QMessageBox, QComboBox, QTextEdit, 
                              QProgressBar, QMainWindow, QWidget)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
 import sys
+import json
+import argparse
+from PFM_Codec import MAP_FORMATS, PNG16_MAX, get_map_format
+from File_Stager import materialize, get_stage_mode
+from Run_Manifest import FrameManifest, settings_hash, source_fingerprint
+from Airsim_Record import STREAMS, RecordTail, classify_stream, frame_key, rec_file_for
+from Frame_Index import get_frame_index
+from Point_Cloud import POINT_CLOUD_FORMATS, get_point_cloud_format
+from Depth_Stats import DEPTH_STATS_NAME, DepthStats, get_depth_stats_bins
+from Dataset_Export import EXPORT_LAYOUTS, get_export_layout, export_dataset
+from Scene_Flow import flow_transforms, get_camera_extrinsic
+from Frame_Pyramid import PYRAMID_IMAGES, PYRAMID_MAPS, get_pyramid_scales, scale_folder, make_scale_folders
+from Frame_Filter import dedupe_frames, renumber_frames, get_subsample_mode, subsample_frames
+from Run_Telemetry import Telemetry, REPORT_NAME, report_path_for
+from Frame_Shards import (parse_shard, shard_ranges, shard_folder, write_shard_info,
+                          check_shards, merge_shards)
+from Frame_Engine import (get_camera_params, get_worker_num, get_depth_types, DEPTH_TYPES, FrameConfig,
+                          process_frame, run_frame_conversion)
 
 class DataGeneratorProgressWindow(QMainWindow):
     """資料生成器進度顯示視窗"""
@@ -24,6 +43,7 @@ class DataGeneratorProgressWindow(QMainWindow):
                 "progress_title": "🔄 AirSim 資料處理進度",
                 "ready": "",
                 "log_title": "📋 處理詳細日誌：",
+                "telemetry_title": "⏱️ 各階段效能（耗時 / 影格 / 速度 / 讀取 / 寫入）：",
                 "close": "❌ 關閉",
                 "language": "🌐 語言",
                 "reselect_input": "🔄 重新選擇輸入源",
@@ -32,6 +52,8 @@ class DataGeneratorProgressWindow(QMainWindow):
                 "user_cancelled": "⚠️ 使用者取消操作或關閉視窗",
                 "processing_error": "⚠️ 重新處理時發生錯誤：{error}",
                 "reselect_error": "⚠️ 重新選擇輸入源時發生錯誤：{error}",
+                "cancel_processing": "⏹ 取消處理",
+                "cancelling": "⏹ 正在取消，等待處理中的影格寫完...",
                 "select_input_source": "選擇輸入源",
                 "select_data_source": "請選擇資料來源：",
                 "use_local_rawdata": "使用本地 RawData 資料夾",
@@ -81,6 +103,7 @@ class DataGeneratorProgressWindow(QMainWindow):
                 "progress_title": "🔄 AirSim Data Processing Progress",
                 "ready": "",
                 "log_title": "📋 Processing Detailed Log:",
+                "telemetry_title": "⏱️ Stage performance (time / frames / rate / read / written):",
                 "close": "❌ Close",
                 "language": "🌐 Language",
                 "reselect_input": "🔄 Reselect Input Source",
@@ -89,6 +112,8 @@ class DataGeneratorProgressWindow(QMainWindow):
                 "user_cancelled": "⚠️ User cancelled operation or closed window",
                 "processing_error": "⚠️ Error occurred during reprocessing: {error}",
                 "reselect_error": "⚠️ Error occurred while reselecting input source: {error}",
+                "cancel_processing": "⏹ Cancel",
+                "cancelling": "⏹ Cancelling, waiting for frames in progress to finish...",
                 "select_input_source": "Select Input Source",
                 "select_data_source": "Please select data source:",
                 "use_local_rawdata": "Use local RawData folder",
@@ -143,6 +168,8 @@ class DataGeneratorProgressWindow(QMainWindow):
             }
         """)
         
+        # 目前的背景處理執行緒
+        self.worker = None
         self.init_ui()
         
     def init_ui(self):
@@ -228,6 +255,28 @@ class DataGeneratorProgressWindow(QMainWindow):
         """)
         layout.addWidget(self.reselect_input_btn)
         
+        # 各階段效能統計
+        self.telemetry_label = QLabel(self.texts[self.current_language]["telemetry_title"])
+        self.telemetry_label.setFont(QFont("Microsoft YaHei", 11, QFont.Bold))
+        self.telemetry_label.setStyleSheet("color: #2c3e50; margin-top: 10px;")
+        layout.addWidget(self.telemetry_label)
+
+        self.telemetry_text = QTextEdit()
+        self.telemetry_text.setReadOnly(True)
+        self.telemetry_text.setMaximumHeight(150)
+        self.telemetry_text.setStyleSheet("""
+            QTextEdit {
+                background-color: #ecf0f1;
+                color: #2c3e50;
+                border: 1px solid #bdc3c7;
+                border-radius: 8px;
+                font-family: 'Consolas', 'Monaco', monospace;
+                font-size: 11px;
+                padding: 6px;
+            }
+        """)
+        layout.addWidget(self.telemetry_text)
+
         # 詳細日誌區域
         self.log_label = QLabel(self.texts[self.current_language]["log_title"])
         log_font = QFont("Microsoft YaHei", 11, QFont.Bold)
@@ -295,8 +344,33 @@ class DataGeneratorProgressWindow(QMainWindow):
             }
         """)
         
+        # 取消按鈕：只在背景處理進行中可按
+        self.cancel_btn = QPushButton(self.texts[self.current_language]["cancel_processing"])
+        self.cancel_btn.clicked.connect(self.cancel_processing)
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #e67e22;
+                color: white;
+                border: none;
+                border-radius: 6px;
+                font-size: 12px;
+                font-weight: bold;
+                padding: 10px 20px;
+                min-width: 100px;
+            }
+            QPushButton:hover {
+                background-color: #d35400;
+            }
+            QPushButton:disabled {
+                background-color: #95a5a6;
+                color: #7f8c8d;
+            }
+        """)
+
         button_layout.addWidget(self.language_btn)
         button_layout.addStretch()
+        button_layout.addWidget(self.cancel_btn)
         button_layout.addWidget(self.close_btn)
         
         layout.addLayout(button_layout)
@@ -314,9 +388,11 @@ class DataGeneratorProgressWindow(QMainWindow):
         # 更新UI文字
         self.title_label.setText(self.texts[self.current_language]["progress_title"])
         self.log_label.setText(self.texts[self.current_language]["log_title"])
+        self.telemetry_label.setText(self.texts[self.current_language]["telemetry_title"])
         self.close_btn.setText(self.texts[self.current_language]["close"])
         self.language_btn.setText(self.texts[self.current_language]["language"])
         self.reselect_input_btn.setText(self.texts[self.current_language]["reselect_input"])
+        self.cancel_btn.setText(self.texts[self.current_language]["cancel_processing"])
         
         # 更新狀態標籤（如果沒有在處理中）
         if not self.close_btn.isEnabled():
@@ -324,6 +400,8 @@ class DataGeneratorProgressWindow(QMainWindow):
 
     def reselect_input_source(self):
         """重新選擇輸入源"""
+        if self.worker is not None and self.worker.isRunning():
+            return
         try:
             # 重置進度和狀態
             self.progress_bar.setValue(0)
@@ -333,106 +411,113 @@ class DataGeneratorProgressWindow(QMainWindow):
             # 清空日誌
             self.log_text.clear()
             self.add_log(self.texts[self.current_language]["reselect_input_log"])
+            self.add_log(self.texts[self.current_language]["start_processing"])
             
             # 直接調用輸入源選擇和處理流程
-            self.restart_processing()
+            self.start_processing()
             
         except Exception as e:
             self.add_log(self.texts[self.current_language]["reselect_error"].format(error=e))
 
-    def restart_processing(self):
-        """重新開始處理流程"""
+    def start_processing(self):
+        """
+        在主執行緒中選擇輸入源與處理範圍（對話框只能在主執行緒顯示），再交給背景執行緒處理。
+        """
+        self.set_progress_range(0, 100)
+        self.update_progress(0, 100)
         try:
-            # 重置進度
-            self.set_progress_range(0, 100)
-            self.update_progress(0, 100)
-            
-            # 重新執行主要處理邏輯
-            self.add_log(self.texts[self.current_language]["start_processing"])
-            
-            # 調用輸入源選擇和處理函數
-            process_result = process_raw_data()
-            if process_result is None:
+            settings = load_settings()
+            raw_data_folder = "RawData"
+            if os.path.exists(raw_data_folder):
+                # 檢查是否有符合新格式的圖片檔案
+                raw_index = get_frame_index(raw_data_folder)
+                if raw_index.image_count or raw_index.count('depth'):
+                    log_message(get_text("rawdata_found_files", img_count=raw_index.image_count,
+                                         pfm_count=raw_index.count('depth')), update_status=True)
+                else:
+                    log_message(get_text("rawdata_no_files"), update_status=True)
+            else:
+                log_message(get_text("rawdata_not_found"), update_status=True)
+            self.update_progress(5, 100)
+
+            input_source = select_input_source()
+            if input_source is None:
+                log_message(get_text("user_cancelled_operation"))
                 self.add_log(self.texts[self.current_language]["user_cancelled"])
                 self.close_btn.setEnabled(True)
                 return
-                
-            self.update_progress(60, 100)
-            
-            # 繼續執行 PFM 轉換
-            pfm_start_msg = "🔄 開始執行 PFM 轉換..." if self.current_language == "zh" else "🔄 Starting PFM conversion..."
-            self.add_log(pfm_start_msg)
-            self.update_progress(65, 100)
-            
-            # 從設定檔案讀取相機參數
-            settings = load_settings()
-            FOV_degrees = settings.get('FOV_degrees', 90)
-            image_width = settings.get('image_width', 640)
-            image_height = settings.get('image_height', 480)
-            baseline_meters = settings.get('baseline_meters', 1.0)
-            max_depth = settings.get('MaxDepth', 100.0)
-
-            camera_params_msg = f"⚙️ 使用相機參數：FOV={FOV_degrees}°, 解析度={image_width}x{image_height}, 基線={baseline_meters}m, 最大深度={max_depth}m" if self.current_language == "zh" else f"⚙️ Using camera parameters: FOV={FOV_degrees}°, Resolution={image_width}x{image_height}, Baseline={baseline_meters}m, Max Depth={max_depth}m"
-            self.add_log(camera_params_msg)
-            self.update_progress(70, 100)
+            frame_range = None
+            if input_source != "local" and not input_source.startswith(FOLLOW_PREFIX):
+                frame_range = get_processing_range(input_source)
+                if frame_range[0] is None:
+                    log_message(get_text("user_cancelled_range"))
+                    self.close_btn.setEnabled(True)
+                    return
+        except Exception as e:
+            self.add_log(self.texts[self.current_language]["processing_error"].format(error=e))
+            self.close_btn.setEnabled(True)
+            return
 
-            focal_length = (image_width / 2) / np.tan(np.deg2rad(FOV_degrees / 2))
+        global active_worker
+        self.worker = DataGeneratorThread(input_source, frame_range, settings)
+        self.worker.progress_updated.connect(self.update_progress)
+        self.worker.status_updated.connect(self.update_status)
+        self.worker.log_updated.connect(self.add_logs)
+        self.worker.telemetry_updated.connect(self.update_telemetry)
+        self.worker.finished.connect(self.on_processing_finished)
+        active_worker = self.worker
+        self.reselect_input_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.close_btn.setEnabled(False)
+        self.worker.start()
 
-            input_folder = "ProcessData"
-            output_folder = "ProcessData"
+    def cancel_processing(self):
+        """要求背景執行緒在目前處理中的影格完成後停止"""
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.add_log(self.texts[self.current_language]["cancelling"])
 
-            pfm_files = [f for f in os.listdir(input_folder) if f.startswith('DepthGT_') and f.endswith(".pfm")]
-            pfm_files.sort(key=lambda x: int(x.split('_')[-1].split('.')[0]))
-            
-            self.update_progress(75, 100)
-
-            for index, filename in enumerate(pfm_files):
-                input_path = os.path.join(input_folder, filename)
-                
-                new_filename = f"Disparity_{index + 1}.pfm"
-                output_path = os.path.join(output_folder, new_filename)
-                depth_to_disparity(input_path, output_path, focal_length, baseline_meters, max_depth)
-                
-                # 更新進度
-                pfm_progress = 75 + int((index + 1) / len(pfm_files) * 15)
-                self.update_progress(pfm_progress, 100)
-                
-            pfm_complete_msg = f"✅ 已處理 {len(pfm_files)} 個 '.pfm' 檔案，完成深度到視差轉換。" if self.current_language == "zh" else f"✅ Processed {len(pfm_files)} '.pfm' files, completed depth to disparity conversion."
-            self.add_log(pfm_complete_msg)
-            self.update_progress(90, 100)
-            
-            copy_start_msg = "🔄 開始複製檔案到結果資料夾..." if self.current_language == "zh" else "🔄 Starting to copy files to results folder..."
-            self.add_log(copy_start_msg)
-            copy_to_results()
-            self.update_progress(100, 100)
-            
-            complete_msg = "🎉 所有處理完成！" if self.current_language == "zh" else "🎉 All processing completed!"
-            self.add_log(complete_msg)
+    def on_processing_finished(self, success, message):
+        """背景處理結束（完成、取消或發生錯誤）"""
+        global active_worker
+        active_worker = None
+        self.cancel_btn.setEnabled(False)
+        self.reselect_input_btn.setEnabled(True)
+        if success:
             self.processing_complete()
-            
-        except Exception as e:
-            self.add_log(self.texts[self.current_language]["processing_error"].format(error=e))
+        else:
+            if message:
+                self.add_log(message)
             self.close_btn.setEnabled(True)
 
+    def closeEvent(self, event):
+        """處理中關閉視窗時先取消並等待背景執行緒結束，確保 ProcessData 與影格清單一致"""
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+        event.accept()
+
     def add_log(self, message):
         """添加日誌訊息"""
-        from datetime import datetime
+        self.add_logs([message])
+
+    def add_logs(self, messages):
+        """一次添加一批日誌訊息（背景執行緒以批次送出，避免大量訊息逐一重繪）"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {message}"
-        
-        self.log_text.append(log_message)
+        self.log_text.append('\n'.join(f"[{timestamp}] {message}" for message in messages))
         
         # 自動滾動到底部
         scrollbar = self.log_text.verticalScrollBar()
         scrollbar.setValue(scrollbar.maximum())
         
-        # 強制更新 UI
-        QApplication.processEvents()
-        
+    def update_telemetry(self, lines):
+        """更新各階段效能統計"""
+        self.telemetry_text.setPlainText('\n'.join(lines))
+
     def update_status(self, status):
         """更新狀態標籤"""
         self.status_label.setText(status)
-        QApplication.processEvents()
         
     def update_progress(self, current, total):
         """更新進度條"""
@@ -440,12 +525,10 @@ class DataGeneratorProgressWindow(QMainWindow):
             progress = int((current / total) * 100)
             self.progress_bar.setValue(progress)
             self.progress_bar.setFormat(f"{current}/{total} ({progress}%)")
-        QApplication.processEvents()
         
     def set_progress_range(self, minimum, maximum):
         """設定進度條範圍"""
         self.progress_bar.setRange(minimum, maximum)
-        QApplication.processEvents()
         
     def processing_complete(self):
         """處理完成"""
@@ -465,11 +548,145 @@ class DataGeneratorProgressWindow(QMainWindow):
         self.close_btn.setEnabled(True)
         complete_log = "🎉 所有處理步驟已完成！" if self.current_language == "zh" else "🎉 All processing steps completed!"
         self.add_log(complete_log)
-        QApplication.processEvents()
+
+class DataGeneratorThread(QThread):
+    """
+    在背景執行緒中執行處理流程（處理資料、複製到結果資料夾）。
+    日誌、狀態、進度與效能統計先暫存，最多每 UI_UPDATE_INTERVAL 秒以一批訊號送回主執行緒。
+    """
+    progress_updated = pyqtSignal(int, int)  # current, total
+    status_updated = pyqtSignal(str)
+    log_updated = pyqtSignal(list)  # 一批日誌訊息
+    telemetry_updated = pyqtSignal(list)
+    finished = pyqtSignal(bool, str)  # success, message
+
+    def __init__(self, input_source, frame_range, settings):
+        super().__init__()
+        self.input_source = input_source
+        self.frame_range = frame_range
+        self.settings = settings
+        self.is_cancelled = False
+        self._lock = threading.Lock()
+        self._logs = []
+        self._status = None
+        self._progress = None
+        self._telemetry = None
+        self._last_flush = 0.0
+
+    def cancel(self):
+        """協作式取消：尚未開始讀取的影格不再處理，處理中的影格會完整寫出並記錄到影格清單"""
+        self.is_cancelled = True
+
+    # 以下方法與進度視窗同名，log_message 等函式在背景執行緒中會改呼叫這些暫存版本
+    def add_log(self, message):
+        with self._lock:
+            self._logs.append(message)
+        self.flush()
+
+    def update_status(self, status):
+        with self._lock:
+            self._status = status
+        self.flush()
+
+    def update_progress(self, current, total):
+        with self._lock:
+            self._progress = (current, total)
+        self.flush()
+
+    def update_telemetry(self, lines):
+        with self._lock:
+            self._telemetry = lines
+        self.flush()
+
+    def flush(self, force=False):
+        """距離上次送出超過 UI_UPDATE_INTERVAL 秒（或 force）時，將暫存的內容一次送出"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_flush < UI_UPDATE_INTERVAL:
+                return
+            self._last_flush = now
+            logs, self._logs = self._logs, []
+            status, self._status = self._status, None
+            progress, self._progress = self._progress, None
+            telemetry, self._telemetry = self._telemetry, None
+        if logs:
+            self.log_updated.emit(logs)
+        if status is not None:
+            self.status_updated.emit(status)
+        if progress is not None:
+            self.progress_updated.emit(*progress)
+        if telemetry is not None:
+            self.telemetry_updated.emit(telemetry)
+
+    def run(self):
+        success = False
+        message = ''
+        try:
+            self.update_progress(10, 100)
+            result = process_raw_data(input_source=self.input_source, frame_range=self.frame_range,
+                                      settings=self.settings)
+            if result is None:
+                message = get_text("processing_cancelled_short" if self.is_cancelled else "program_ended")
+            else:
+                self.update_progress(90, 100)
+                log_message(get_text("copy_start"), update_status=True)
+                copy_to_results(self.settings)
+                self.update_progress(100, 100)
+                log_message(get_text("all_complete"), update_status=True)
+                success = True
+        except Exception as e:
+            message = get_text("cli_processing_error", error=e)
+        finally:
+            self.flush(force=True)
+        self.finished.emit(success, message)
 
 # 全局進度視窗實例
 progress_window = None
 
+# 輸入源選擇中代表「即時跟隨錄製」的前綴
+FOLLOW_PREFIX = "follow:"
+
+# 對齊報告中最多列出的缺少串流行數
+ALIGN_REPORT_LIMIT = 10
+
+# 背景處理執行緒（GUI 模式）與其送出日誌/進度訊號的最短間隔（秒）
+active_worker = None
+UI_UPDATE_INTERVAL = 0.1
+
+# 本次執行的各階段效能統計（process_raw_data 開始時建立）
+run_telemetry = None
+_last_telemetry_refresh = 0.0
+
+# 命令列模式的輸出方式：None = 一般模式，'text' = 純文字，'json' = 每行一個 JSON 事件
+headless_output = None
+_last_progress_percent = None
+
+# 命令列參數 -> Settings.txt 鍵值
+CLI_SETTING_KEYS = (
+    ('max_depth', 'MaxDepth'),
+    ('fov', 'FOV_degrees'),
+    ('width', 'image_width'),
+    ('height', 'image_height'),
+    ('baseline', 'baseline_meters'),
+    ('workers', 'Worker_Num'),
+    ('format', 'Output_Format'),
+    ('depth_type', 'Depth_Type'),
+    ('depth_output', 'Depth_Output'),
+    ('point_cloud', 'Point_Cloud'),
+    ('right_disparity', 'Right_Disparity'),
+    ('depth_stats', 'Depth_Stats'),
+    ('pyramid', 'Pyramid_Scales'),
+    ('scene_flow', 'Scene_Flow'),
+    ('dedupe', 'Dedupe_Frames'),
+    ('stride', 'Subsample_Stride'),
+    ('target_fps', 'Subsample_FPS'),
+    ('output', 'output_folder_Seg'),
+    ('results', 'output_folder'),
+    ('export', 'Export_Layout'),
+    ('export_folder', 'Export_Folder'),
+    ('val_ratio', 'Export_Val_Ratio'),
+)
+
 def get_text(key, **kwargs):
     """獲取多語言文字"""
     current_language = os.environ.get('AIRSIM_LANGUAGE', 'zh')  # 從環境變數讀取
@@ -493,6 +710,16 @@ def get_text(key, **kwargs):
             "processed_img_right": "✅ 已處理 {count} 個 'img_right_0' 檔案。",
             "processed_img_seg": "✅ 已處理 {count} 個 'img_front_left_5' 檔案。",
             "processed_pfm_depth": "✅ 已處理 {count} 個 '.pfm' 檔案，並限制最大深度為 {depth}m。",
+            "processed_disparity": "✅ 已處理 {count} 個 '.pfm' 檔案，完成深度到視差轉換。",
+            "depth_workers": "⚙️ 使用 {workers} 個行程平行轉換深度圖",
+            "staged_files": "📁 檔案放置方式：{summary}",
+            "frames_up_to_date": "✅ {skipped} 個影格已是最新，略過；需處理 {pending} 個影格",
+            "syncing_result_folder": "🔄 同步結果資料夾：'{folder}'",
+            "results_up_to_date": "✅ {count} 個結果檔案已是最新，略過",
+            "following_recording": "🔴 即時跟隨錄製資料夾：{folder}",
+            "follow_progress": "🔄 已即時處理 {count} 個影格",
+            "follow_finished": "✅ {timeout} 秒內沒有新影格，視為錄製結束；共即時處理 {count} 個影格",
+            "follow_retry": "⏳ 影格 {frame} 處理失敗，下次輪詢重試（第 {attempt}/{limit} 次）: {error}",
             "file_processing_error": "⚠️ 處理檔案 {file} 時發生錯誤: {error}",
             "source_folder_not_exist": "⚠️ 錯誤：來源資料夾 '{folder}' 不存在，無法複製到結果資料夾。",
             "result_folder_created": "✅ 已建立結果資料夾：'{folder}'",
@@ -507,7 +734,48 @@ def get_text(key, **kwargs):
             "rawdata_no_files": "📁 RawData 資料夾存在但沒有可處理的文件，打開 AirSim 資料夾選擇功能...",
             "rawdata_not_found": "📁 找不到 RawData 資料夾，打開 AirSim 資料夾選擇功能...",
             "starting_pfm_conversion": "🔄 開始執行 PFM 轉換...",
-            "camera_params": "⚙️ 使用相機參數：FOV={fov}°, 解析度={width}x{height}, 基線={baseline}m, 最大深度={depth}m"
+            "camera_params": "⚙️ 使用相機參數：FOV={fov}°, 解析度={width}x{height}, 基線={baseline}m, 最大深度={depth}m",
+            "png16_depth_clipped": "⚠️ png16 最多只能儲存 {limit:.2f}m，MaxDepth={depth}m 時超過的 DepthGT 會被截斷",
+            "telemetry_saved": "📁 效能報告已儲存：{path}",
+            "copy_start": "🔄 開始複製檔案到結果資料夾...",
+            "all_complete": "🎉 所有處理完成！",
+            "processing_cancelled": "⏹ 已取消：完成 {done} 個影格，其餘 {remaining} 個影格會在下次執行時處理",
+            "processing_cancelled_short": "⏹ 處理已取消",
+            "follow_cancelled": "⏹ 已停止跟隨錄製",
+            "depth_stats_missing": "📊 {count} 個已是最新的影格沒有深度統計，將重新處理",
+            "depth_stats_saved": "📊 已記錄 {count} 個影格的深度統計：{path}",
+            "dedupe_result": "✅ 去除重複影格：保留 {kept} 個，移除 {dropped} 個幾乎相同的影格，並重新連續編號",
+            "dedupe_shard_disabled": "⚠️ 分片模式不支援抽樣與去除重複影格（會破壞跨分片的連續編號），已停用",
+            "subsample_result": "✅ 抽樣（{mode}）：{total} 個影格中保留 {kept} 個",
+            "align_rec": "🔗 依 airsim_rec.txt 對齊串流：{rows} 行中 {frames} 行完整",
+            "align_positional": "⚠️ 找不到 airsim_rec.txt，各串流依檔名排序後以相同位置配對",
+            "align_incomplete": "⚠️ {count} 行缺少串流的檔案，已略過：",
+            "align_incomplete_row": "    TimeStamp {timestamp}：缺少 {streams}",
+            "align_unreferenced": "⚠️ {count} 個影像檔案沒有出現在 airsim_rec.txt 中，已略過",
+            "subsample_missing_pose": "⚠️ {count} 個影格在 airsim_rec.txt 中找不到位姿，已保留",
+            "subsample_no_record": "⚠️ 找不到錄製檔 {path}，無法依相機移動抽樣",
+            "scene_flow_no_record": "⚠️ 找不到錄製檔 {path}，沒有相機位姿，無法輸出光流與場景流",
+            "scene_flow_frames": "🌊 {count} 個影格有下一個影格的位姿，將輸出光流與場景流",
+            "scene_flow_follow": "⚠️ 即時跟隨錄製時不輸出光流與場景流（需要下一個影格的位姿）",
+            "cli_source_invalid": "⚠️ 錯誤：找不到來源資料夾 '{folder}'",
+            "cli_invalid_range": "⚠️ 錯誤：處理範圍 {start} ~ {end} 無效（共 {count} 張圖片）",
+            "cli_progress": "🔄 進度：{current}/{total} ({percent}%)",
+            "cli_copying_results": "🔄 開始複製檔案到結果資料夾...",
+            "cli_finished": "✅ 所有處理完成，耗時 {seconds} 秒",
+            "cli_finished_with_errors": "⚠️ 處理完成但有影格失敗，耗時 {seconds} 秒",
+            "cli_processing_error": "⚠️ 處理過程中發生錯誤：{error}",
+            "cli_source_required": "⚠️ 錯誤：需要指定 --source（或使用 --merge 合併分片）",
+            "shard_range": "📁 分片 {shard}/{shards}：處理第 {start} 到第 {end} 張圖片，輸出到 '{folder}'",
+            "shard_empty": "📁 分片 {shard}/{shards} 沒有分配到任何影格",
+            "merge_checking": "🔄 檢查 {count} 個分片資料夾...",
+            "merge_range": "📁 分片涵蓋第 {start} 到第 {end} 張圖片，共 {frames} 個影格",
+            "merge_gaps": "⚠️ 缺少 {count} 個影格：{frames}",
+            "merge_overlap": "⚠️ 影格 {frame} 同時出現在：{folders}",
+            "merge_problem": "⚠️ {problem}",
+            "merge_aborted": "⚠️ 分片檢查未通過，未合併任何檔案",
+            "merge_done": "✅ 已合併 {staged} 個檔案到 '{folder}'，{up_to_date} 個已是最新",
+            "export_start": "📦 匯出 {layout} 結構到 '{folder}'...",
+            "export_done": "✅ 已匯出 {frames} 個影格（{exported} 個檔案，{up_to_date} 個已是最新；{summary}），train {train} / val {val}"
         },
         "en": {
             "load_settings_failed": "⚠️ Failed to load settings file: {error}",
@@ -524,6 +792,16 @@ def get_text(key, **kwargs):
             "processed_img_right": "✅ Processed {count} 'img_right_0' files.",
             "processed_img_seg": "✅ Processed {count} 'img_front_left_5' files.",
             "processed_pfm_depth": "✅ Processed {count} '.pfm' files, limited max depth to {depth}m.",
+            "processed_disparity": "✅ Processed {count} '.pfm' files, completed depth to disparity conversion.",
+            "depth_workers": "⚙️ Converting depth maps with {workers} worker processes",
+            "staged_files": "📁 Files staged via: {summary}",
+            "frames_up_to_date": "✅ {skipped} frames already up to date, skipped; {pending} frames to process",
+            "syncing_result_folder": "🔄 Syncing results folder: '{folder}'",
+            "results_up_to_date": "✅ {count} result files already up to date, skipped",
+            "following_recording": "🔴 Following live recording folder: {folder}",
+            "follow_progress": "🔄 Processed {count} frames live",
+            "follow_finished": "✅ No new frames for {timeout}s, recording considered finished; processed {count} frames live",
+            "follow_retry": "⏳ Frame {frame} failed, retrying on the next poll (attempt {attempt}/{limit}): {error}",
             "file_processing_error": "⚠️ Error processing file {file}: {error}",
             "source_folder_not_exist": "⚠️ Error: Source folder '{folder}' does not exist, cannot copy to results folder.",
             "result_folder_created": "✅ Created results folder: '{folder}'",
@@ -538,7 +816,48 @@ def get_text(key, **kwargs):
             "rawdata_no_files": "📁 RawData folder exists but has no processable files, opening AirSim folder selection...",
             "rawdata_not_found": "📁 RawData folder not found, opening AirSim folder selection...",
             "starting_pfm_conversion": "🔄 Starting PFM conversion...",
-            "camera_params": "⚙️ Using camera parameters: FOV={fov}°, Resolution={width}x{height}, Baseline={baseline}m, Max Depth={depth}m"
+            "camera_params": "⚙️ Using camera parameters: FOV={fov}°, Resolution={width}x{height}, Baseline={baseline}m, Max Depth={depth}m",
+            "png16_depth_clipped": "⚠️ png16 can store at most {limit:.2f}m; DepthGT beyond that is clipped with MaxDepth={depth}m",
+            "telemetry_saved": "📁 Performance report saved: {path}",
+            "copy_start": "🔄 Starting to copy files to results folder...",
+            "all_complete": "🎉 All processing completed!",
+            "processing_cancelled": "⏹ Cancelled: {done} frames finished, the remaining {remaining} frames will be processed on the next run",
+            "processing_cancelled_short": "⏹ Processing cancelled",
+            "follow_cancelled": "⏹ Stopped following the recording",
+            "depth_stats_missing": "📊 {count} up-to-date frames have no depth statistics and will be reprocessed",
+            "depth_stats_saved": "📊 Recorded depth statistics for {count} frames: {path}",
+            "dedupe_result": "✅ Deduplication: kept {kept} frames, dropped {dropped} near-duplicates, renumbered contiguously",
+            "dedupe_shard_disabled": "⚠️ Subsampling and deduplication are not supported in shard mode (they break numbering across shards), disabled",
+            "subsample_result": "✅ Subsampling ({mode}): kept {kept} of {total} frames",
+            "align_rec": "🔗 Streams aligned by airsim_rec.txt: {frames} of {rows} rows complete",
+            "align_positional": "⚠️ airsim_rec.txt not found, pairing streams by sorted position",
+            "align_incomplete": "⚠️ {count} rows are missing stream files and were skipped:",
+            "align_incomplete_row": "    TimeStamp {timestamp}: missing {streams}",
+            "align_unreferenced": "⚠️ {count} image files are not listed in airsim_rec.txt and were skipped",
+            "subsample_missing_pose": "⚠️ {count} frames have no pose in airsim_rec.txt and were kept",
+            "subsample_no_record": "⚠️ Recording file {path} not found, cannot subsample by camera motion",
+            "scene_flow_no_record": "⚠️ Recording file {path} not found, no camera poses for optical/scene flow",
+            "scene_flow_frames": "🌊 {count} frames have a pose for the next frame and will get optical/scene flow",
+            "scene_flow_follow": "⚠️ Optical/scene flow is not written while following a recording (needs the next frame's pose)",
+            "cli_source_invalid": "⚠️ Error: source folder '{folder}' not found",
+            "cli_invalid_range": "⚠️ Error: invalid processing range {start} ~ {end} ({count} images available)",
+            "cli_progress": "🔄 Progress: {current}/{total} ({percent}%)",
+            "cli_copying_results": "🔄 Starting to copy files to results folder...",
+            "cli_finished": "✅ All processing completed in {seconds}s",
+            "cli_finished_with_errors": "⚠️ Processing finished with failed frames in {seconds}s",
+            "cli_processing_error": "⚠️ Error occurred during processing: {error}",
+            "cli_source_required": "⚠️ Error: --source is required (or use --merge to merge shards)",
+            "shard_range": "📁 Shard {shard}/{shards}: processing images {start} to {end} into '{folder}'",
+            "shard_empty": "📁 Shard {shard}/{shards} has no frames assigned",
+            "merge_checking": "🔄 Checking {count} shard folders...",
+            "merge_range": "📁 Shards cover images {start} to {end}, {frames} frames in total",
+            "merge_gaps": "⚠️ {count} frames missing: {frames}",
+            "merge_overlap": "⚠️ Frame {frame} appears in: {folders}",
+            "merge_problem": "⚠️ {problem}",
+            "merge_aborted": "⚠️ Shard check failed, nothing was merged",
+            "merge_done": "✅ Merged {staged} files into '{folder}', {up_to_date} already up to date",
+            "export_start": "📦 Exporting the {layout} layout to '{folder}'...",
+            "export_done": "✅ Exported {frames} frames ({exported} files, {up_to_date} up to date; {summary}), train {train} / val {val}"
         }
     }
     
@@ -547,20 +866,85 @@ def get_text(key, **kwargs):
     else:
         return key  # 如果找不到鍵值，返回鍵值本身
 
+def ui_target():
+    """
+    進度更新的對象：在背景處理執行緒中為 active_worker（暫存後以訊號送出），否則為進度視窗本身。
+    """
+    if active_worker is not None and threading.current_thread() is not threading.main_thread():
+        return active_worker
+    return progress_window
+
+def processing_cancelled():
+    """GUI 的背景處理收到取消要求時回傳 True；命令列模式永遠為 False"""
+    return active_worker is not None and active_worker.is_cancelled
+
 def log_message(message, update_status=False):
     """全局日誌函數，優先使用進度視窗顯示"""
     global progress_window
     if progress_window:
-        progress_window.add_log(message)
+        target = ui_target()
+        target.add_log(message)
         if update_status:
             # 移除時間戳記和表情符號用於狀態顯示
             status = message.split('] ', 1)[-1] if '] ' in message else message
             status = status.replace('🔄 ', '').replace('✅ ', '').replace('📁 ', '').replace('⚠️ ', '')
-            progress_window.update_status(status)
+            target.update_status(status)
     else:
         # 移除表情符號用於終端機顯示
         clean_message = message.replace('🔄 ', '').replace('✅ ', '').replace('📁 ', '').replace('⚠️ ', '')
-        print(clean_message)
+        if headless_output == 'json':
+            emit_event('log', message=clean_message, status=update_status)
+        else:
+            print(clean_message, flush=True)
+
+def emit_event(event, **fields):
+    """命令列 JSON 模式：輸出一行 JSON 事件"""
+    record = {'event': event, 'time': datetime.now().isoformat(timespec='seconds')}
+    record.update(fields)
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+def report_progress(current, total, start=10, end=60):
+    """將子步驟進度映射到進度視窗的 start~end 區間；命令列模式則在百分比改變時輸出"""
+    global _last_progress_percent
+    if total <= 0:
+        return
+    if progress_window:
+        ui_target().update_progress(start + int(current / total * (end - start)), 100)
+        refresh_telemetry(force=current >= total)
+    elif headless_output:
+        percent = int(current * 100 / total)
+        if percent == _last_progress_percent:
+            return
+        _last_progress_percent = percent
+        if headless_output == 'json':
+            emit_event('progress', current=current, total=total, percent=percent)
+        else:
+            log_message(get_text("cli_progress", current=current, total=total, percent=percent))
+
+def refresh_telemetry(force=False):
+    """在進度視窗中更新各階段統計，最多每 0.5 秒一次"""
+    global _last_telemetry_refresh
+    if progress_window is None or run_telemetry is None:
+        return
+    now = time.time()
+    if force or now - _last_telemetry_refresh >= 0.5:
+        _last_telemetry_refresh = now
+        ui_target().update_telemetry(run_telemetry.summary_lines())
+
+def write_run_report(report_path, **extra):
+    """
+    儲存本次執行的效能報告（JSON），並在進度視窗或終端機顯示各階段摘要。
+    """
+    if run_telemetry is None:
+        return
+    report = run_telemetry.write_report(report_path, **extra)
+    refresh_telemetry(force=True)
+    if headless_output == 'json':
+        emit_event('telemetry', report=report)
+    elif progress_window is None:
+        for line in run_telemetry.summary_lines():
+            print(line, flush=True)
+    log_message(get_text("telemetry_saved", path=report_path))
 
 def load_settings():
     """
@@ -652,7 +1036,8 @@ def select_input_source():
             "ok": "確定",
             "cancel": "取消",
             "warning": "警告",
-            "no_airsim_folders": "在 AirSim 資料夾中找不到符合格式的資料夾"
+            "no_airsim_folders": "在 AirSim 資料夾中找不到符合格式的資料夾",
+            "follow_recording": "🔴 即時跟隨最新錄製：{name}"
         },
         "en": {
             "select_input_source": "Select Input Source",
@@ -662,7 +1047,8 @@ def select_input_source():
             "ok": "OK",
             "cancel": "Cancel",
             "warning": "Warning",
-            "no_airsim_folders": "No folders matching the format found in AirSim folder"
+            "no_airsim_folders": "No folders matching the format found in AirSim folder",
+            "follow_recording": "🔴 Follow latest recording live: {name}"
         }
     }
     
@@ -681,9 +1067,14 @@ def select_input_source():
     if input_airsim:
         airsim_folders = find_airsim_data_folders()
         if airsim_folders:
+            # 最新的錄製資料夾可能仍在錄製中，提供即時跟隨選項
+            latest = airsim_folders[0]
+            combo.addItem(texts[current_language]["follow_recording"].format(name=latest['name']),
+                          FOLLOW_PREFIX + latest['images_path'])
             for folder in airsim_folders:
-                images_count = len([f for f in os.listdir(folder['images_path']) if f.endswith('.png')])
-                display_text = f"{folder['name']} ({images_count//3} {texts[current_language]['images_count']})"
+                # 掃描結果會被快取，之後選擇範圍與處理時直接重用
+                images_count = get_frame_index(folder['images_path']).frame_count
+                display_text = f"{folder['name']} ({images_count} {texts[current_language]['images_count']})"
                 combo.addItem(display_text, folder['images_path'])
     
     layout.addWidget(combo)
@@ -708,43 +1099,6 @@ def select_input_source():
     else:
         return None
 
-def read_pfm(file_path):
-    """
-    從 PFM 檔案讀取數據，返回一個 NumPy 陣列。
-    """
-    with open(file_path, 'rb') as file:
-        color = file.readline().decode('utf-8').strip()
-        if color not in ['PF', 'Pf']:
-            raise Exception('不是有效的 PFM 檔案！')
-
-        width, height = re.findall(r'\d+', file.readline().decode('utf-8'))
-        width, height = int(width), int(height)
-
-        scale = float(file.readline().decode('utf-8').strip())
-        if scale < 0:
-            data = np.fromfile(file, '<f4')
-        else:
-            data = np.fromfile(file, '>f4')
-
-        shape = (height, width, 3) if color == 'PF' else (height, width)
-        return np.reshape(data, shape)
-
-def write_pfm(file_path, image, scale=-1.0):
-    """
-    將 NumPy 陣列儲存為 PFM 檔案。
-    """
-    image = image.astype(np.float32)
-
-    with open(file_path, 'wb') as f:
-        header = 'Pf\n' if image.ndim == 2 else 'PF\n'
-        f.write(header.encode('ascii'))
-
-        height, width = image.shape[:2]
-        f.write(f'{width} {height}\n'.encode('ascii'))
-
-        f.write(f'{scale}\n'.encode('ascii'))
-        image.tofile(f)
-
 def get_processing_range(raw_data_folder='RawData'):
     """
     顯示對話框讓使用者選擇處理範圍
@@ -788,14 +1142,7 @@ def get_processing_range(raw_data_folder='RawData'):
         QMessageBox.warning(None, texts[current_language]["error"], texts[current_language]["folder_not_found"].format(folder=raw_data_folder))
         return None, None
     
-    all_files = os.listdir(raw_data_folder)
-    # 使用更通用的匹配模式：img_*_left_0, img_*_right_0, img_*_left_5
-    img_left_files = [f for f in all_files if ('_left_0' in f and f.startswith('img_') and f.endswith('.png'))]
-    img_right_files = [f for f in all_files if ('_right_0' in f and f.startswith('img_') and f.endswith('.png'))]
-    img_seg_files = [f for f in all_files if ('_left_5' in f and f.startswith('img_') and f.endswith('.png'))]
-    pfm_files = [f for f in all_files if f.endswith('.pfm')]
-    
-    max_images = max(len(img_left_files), len(img_right_files), len(img_seg_files), len(pfm_files))
+    max_images = get_frame_index(raw_data_folder).frame_count
     
     if max_images == 0:
         QMessageBox.warning(None, texts[current_language]["error"], texts[current_language]["no_processable_files"].format(folder=raw_data_folder))
@@ -851,20 +1198,26 @@ def get_processing_range(raw_data_folder='RawData'):
     else:
         return None, None
 
-def process_raw_data(raw_data_folder='RawData', processed_data_folder='ProcessData'):
+def process_raw_data(raw_data_folder='RawData', processed_data_folder='ProcessData',
+                     input_source=None, frame_range=None, settings=None):
     """
     處理原始資料夾中的檔案，並將處理後的檔案移動到 ProcessData 資料夾。
+    input_source / frame_range / settings 由命令列模式直接指定時不會顯示對話框。
     """
-    settings = load_settings()
+    if settings is None:
+        settings = load_settings()
     processed_data_folder = settings.get('output_folder_Seg', 'ProcessData')
 
-    input_source = select_input_source()
+    if input_source is None:
+        input_source = select_input_source()
     if input_source is None:
         log_message(get_text("user_cancelled_operation"))
         return None
     
     source_for_processing = raw_data_folder
-    if input_source != "local":
+    if input_source.startswith(FOLLOW_PREFIX):
+        return follow_recording(input_source[len(FOLLOW_PREFIX):], processed_data_folder, settings)
+    elif input_source != "local":
         log_message(get_text("processing_from_airsim", source=input_source), update_status=True)
         source_for_processing = input_source # 直接使用 AirSim 的 images 資料夾作為來源
     else:
@@ -876,118 +1229,382 @@ def process_raw_data(raw_data_folder='RawData', processed_data_folder='ProcessDa
         return None # 在此處返回，讓使用者準備 RawData 資料夾
 
     # 注意：get_processing_range 現在需要從 source_for_processing 來計算最大圖片數
-    start_idx, end_idx = get_processing_range(source_for_processing)
+    if frame_range is None:
+        start_idx, end_idx = get_processing_range(source_for_processing)
+    else:
+        start_idx, end_idx = frame_range
     if start_idx is None:
         log_message(get_text("user_cancelled_range"))
         return None
     
     log_message(get_text("processing_range_info", start=start_idx, end=end_idx), update_status=True)
     
-    if os.path.exists(processed_data_folder):
+    # 已有影格清單時保留 ProcessData，只處理新增或變更的影格；舊版（沒有清單）的資料夾仍整個清空
+    manifest = FrameManifest(processed_data_folder)
+    if os.path.exists(processed_data_folder) and not manifest.exists():
         log_message(get_text("clearing_folder", folder=processed_data_folder), update_status=True)
         shutil.rmtree(processed_data_folder)
     
-    os.makedirs(processed_data_folder)
-    log_message(get_text("folder_created", folder=processed_data_folder))
-
-    all_files = os.listdir(source_for_processing)
-
-    img_left_files = []
-    img_right_files = []
-    img_left_Seg_files = []
-    pfm_files = []
-
-    for file in all_files:
-        # 使用更通用的匹配模式：img_*_left_0, img_*_right_0, img_*_left_5
-        if '_left_0' in file and file.startswith('img_') and file.endswith('.png'):
-            img_left_files.append(file)
-        elif '_right_0' in file and file.startswith('img_') and file.endswith('.png'):
-            img_right_files.append(file)
-        elif '_left_5' in file and file.startswith('img_') and file.endswith('.png'):
-            img_left_Seg_files.append(file)
-        elif file.endswith('.pfm'):
-            pfm_files.append(file)
-
-    log_message(get_text("files_found", img0=len(img_left_files), img1=len(img_right_files), seg=len(img_left_Seg_files), pfm=len(pfm_files)))
-
-    img_left_files.sort(key=lambda x: int(x.split('_')[-1].split('.')[0]))
-    img_left_files = img_left_files[start_idx-1:end_idx]
-    for i, old_name in enumerate(img_left_files):
-        new_name = f'Img0_{start_idx + i}.png'
-        shutil.copy(os.path.join(source_for_processing, old_name), os.path.join(processed_data_folder, new_name))
-    
-    log_message(get_text("processed_img_left", count=len(img_left_files)))
+    if not os.path.exists(processed_data_folder):
+        os.makedirs(processed_data_folder)
+        log_message(get_text("folder_created", folder=processed_data_folder))
 
-    img_right_files.sort(key=lambda x: int(x.split('_')[-1].split('.')[0]))
-    img_right_files = img_right_files[start_idx-1:end_idx]
-    for i, old_name in enumerate(img_right_files):
-        new_name = f'Img1_{start_idx + i}.png'
-        shutil.copy(os.path.join(source_for_processing, old_name), os.path.join(processed_data_folder, new_name))
-        
-    log_message(get_text("processed_img_right", count=len(img_right_files)))
+    global run_telemetry
+    run_telemetry = Telemetry()
+    with run_telemetry.measure('scan'):
+        frame_index = get_frame_index(source_for_processing)
+    run_telemetry.add('scan', frames=frame_index.max_count)
+    log_message(get_text("files_found", img0=frame_index.count('left'), img1=frame_index.count('right'),
+                         seg=frame_index.count('seg'), pfm=frame_index.count('depth')))
 
-    img_left_Seg_files.sort(key=lambda x: int(x.split('_')[-1].split('.')[0]))
-    img_left_Seg_files = img_left_Seg_files[start_idx-1:end_idx]
-    for i, old_name in enumerate(img_left_Seg_files):
-        new_name = f'Seg_{start_idx + i}.png'
-        shutil.copy(os.path.join(source_for_processing, old_name), os.path.join(processed_data_folder, new_name))
-        
-    log_message(get_text("processed_img_seg", count=len(img_left_Seg_files)))
+    # 讀取設定檔中的相機參數與MaxDepth參數
+    focal_length, baseline_meters, max_depth = get_camera_params(settings)
+    log_message(get_text("camera_params", fov=settings.get('FOV_degrees', 90), width=settings.get('image_width', 640),
+                         height=settings.get('image_height', 480), baseline=baseline_meters, depth=max_depth))
+    if get_map_format(settings) == 'png16' and max_depth > PNG16_MAX:
+        log_message(get_text("png16_depth_clipped", limit=PNG16_MAX, depth=max_depth))
+    config_hash = get_config_hash(settings)
 
-    pfm_files.sort(key=lambda x: int(x.split('_')[-1].split('.')[0]))
-    pfm_files = pfm_files[start_idx-1:end_idx]
-    
-    # 讀取設定檔中的MaxDepth參數
-    max_depth = settings.get('MaxDepth', 100.0)
-    
-    for i, old_name in enumerate(pfm_files):
-        input_path = os.path.join(source_for_processing, old_name)
-        new_name = f'DepthGT_{start_idx + i}.pfm'
-        output_path = os.path.join(processed_data_folder, new_name)
-        
-        # 讀取原始深度圖
-        pfm_data = read_pfm(input_path)
-        
-        # 限制最小深度值
-        pfm_data[pfm_data < 1e-6] = 1e-6
-        
-        # 限制最大深度值為MaxDepth
-        pfm_data[pfm_data > max_depth] = max_depth
-        
-        # 寫入處理後的深度圖到ProcessData
-        write_pfm(output_path, pfm_data)
-        
-    log_message(get_text("processed_pfm_depth", count=len(pfm_files), depth=max_depth))
+    # 有 airsim_rec.txt 時以錄製檔的每一行對齊四個串流，否則各串流依檔名尾端的數字排序後以相同位置配對
+    frames = frame_index.frame_paths(start_idx, end_idx)
+    report_alignment(frame_index)
+
+    # 選用的影格篩選在放置或轉換任何檔案之前進行：先抽樣，再移除近似重複的影格，保留的影格從 start_idx 起連續編號
+    filtered = apply_frame_filters(frames, frame_index, start_idx, settings, max_depth)
+    unfiltered = filtered is frames
+    frames = filtered
+
+    # 移除不在本次處理範圍內的舊影格，讓 ProcessData 與所選範圍一致
+    for frame in [frame for frame in manifest.records if frame not in frames]:
+        manifest.remove(frame)
+
+    # 記錄深度統計時，沿用 sidecar 中已有的統計；已是最新但沒有統計的影格仍需重新處理
+    depth_stats = None
+    stats_bins = get_depth_stats_bins(settings)
+    if stats_bins:
+        stats_path = os.path.join(processed_data_folder, DEPTH_STATS_NAME)
+        depth_stats = DepthStats.load(stats_path, stats_bins, max_depth)
+
+    # 光流與場景流需要此影格與下一個影格的位姿，相對運動記錄在來源中，位姿或下一個影格改變時重新處理
+    transforms = {}
+    if settings.get('Scene_Flow', False):
+        if frame_index.rec_rows:
+            # 沒有篩選時，範圍外的下一個影格（例如分片的邊界）也用來計算最後一個影格的光流
+            next_frames = frame_index.frame_paths(end_idx + 1, end_idx + 1) if unfiltered else {}
+            transforms = flow_transforms(sorted(frames.items()) + sorted(next_frames.items()), frame_index.rec_rows,
+                                         get_camera_extrinsic(settings))
+            log_message(get_text("scene_flow_frames", count=len(transforms)))
+        else:
+            log_message(get_text("scene_flow_no_record", path=rec_file_for(frame_index.folder)))
+
+    pending = {}
+    missing_stats = 0
+    for frame, paths in sorted(frames.items()):
+        sources = {stream: source_fingerprint(path) for stream, path in paths.items()}
+        if frame in transforms:
+            sources['flow'] = transforms[frame]
+        if not manifest.is_current(frame, sources, config_hash):
+            pending[frame] = (paths, sources)
+        elif depth_stats is not None and 'depth' in paths and frame not in depth_stats.rows:
+            pending[frame] = (paths, sources)
+            missing_stats += 1
+    if missing_stats:
+        log_message(get_text("depth_stats_missing", count=missing_stats))
+    if len(pending) < len(frames):
+        log_message(get_text("frames_up_to_date", skipped=len(frames) - len(pending), pending=len(pending)))
+
+    run_telemetry.info.update(source=os.path.abspath(source_for_processing), start=start_idx, end=end_idx,
+                              frames=len(frames), processed_frames=len(pending), workers=get_worker_num(settings),
+                              output_format=get_map_format(settings), subsample=get_subsample_mode(settings),
+                              depth_type=get_depth_types(settings)[0], depth_output=get_depth_types(settings)[1],
+                              point_cloud=get_point_cloud_format(settings), depth_stats=bool(stats_bins),
+                              pyramid=list(get_pyramid_scales(settings)),
+                              scene_flow=bool(settings.get('Scene_Flow', False)),
+                              dedupe=bool(settings.get('Dedupe_Frames', False)))
+
+    # 讀取、計算、寫入以有界佇列串接成管線同時進行；影格各自獨立，再分配到多個行程平行處理。
+    # 影像不需轉換，優先以硬連結/reflink 放入 ProcessData；原始深度圖只讀取一次，同時輸出 DepthGT 與 Disparity
+    config = FrameConfig.from_settings(settings, processed_data_folder, get_stage_mode(settings))
+    make_scale_folders(processed_data_folder, config.pyramid_scales)
+    worker_num = get_worker_num(settings)
+    log_message(get_text("depth_workers", workers=worker_num))
+    tasks = [(frame, paths) for frame, (paths, _) in pending.items()]
+    produced = {'Img0': 0, 'Img1': 0, 'Seg': 0, 'DepthGT': 0}
+
+    def record_shard(results):
+        # 每批影格完成就寫入清單，中斷後可從這裡繼續
+        for frame, outputs in results:
+            manifest.record(frame, pending[frame][1], config_hash, outputs)
+            for name in outputs:
+                prefix = name.split('_', 1)[0]
+                if prefix in produced:
+                    produced[prefix] += 1
+
+    try:
+        converted, errors, stage_counts = run_frame_conversion(tasks, config, worker_num,
+                                                               progress_callback=report_progress,
+                                                               shard_callback=record_shard,
+                                                               telemetry=run_telemetry,
+                                                               should_stop=processing_cancelled,
+                                                               depth_stats=depth_stats,
+                                                               flow_transforms=transforms)
+    finally:
+        manifest.close()
+        if depth_stats is not None:
+            # 只保留影格清單中已完成的影格（寫入失敗或已移除的影格不列入）
+            depth_stats.prune(manifest.records)
+            log_message(get_text("depth_stats_saved", count=depth_stats.save(stats_path), path=stats_path))
+    for file_path, error in errors:
+        log_message(get_text("file_processing_error", file=file_path, error=error))
+    if processing_cancelled():
+        # 已完成的影格都已記錄在清單中，未處理的影格下次執行時會被視為待處理
+        log_message(get_text("processing_cancelled", done=converted,
+                             remaining=len(tasks) - converted - len(errors)), update_status=True)
+        return None
+
+    log_message(get_text("processed_img_left", count=produced['Img0']))
+    log_message(get_text("processed_img_right", count=produced['Img1']))
+    log_message(get_text("processed_img_seg", count=produced['Seg']))
+    log_message(get_text("staged_files", summary=format_stage_counts(stage_counts)))
+    log_message(get_text("processed_pfm_depth", count=produced['DepthGT'], depth=max_depth))
+    log_message(get_text("processed_disparity", count=produced['DepthGT']))
 
     # 如果 input_source != "local"，則直接從 AirSim 資料夾處理，不影響 RawData
 
-    return True
+    # 有影格處理失敗時回傳 False（仍繼續複製結果），命令列模式據此決定結束代碼
+    return not errors
 
-def depth_to_disparity(depth_image_path, disparity_image_path, focal_length, baseline, max_depth=100.0):
+def report_alignment(frame_index):
+    """
+    記錄串流對齊的方式；以錄製檔對齊時列出缺少串流的行（最多 ALIGN_REPORT_LIMIT 行）與未被錄製檔引用的檔案數。
     """
-    將深度 PFM 檔案轉換為視差 PFM 檔案。
+    if frame_index.rec_rows is None:
+        log_message(get_text("align_positional"))
+        return
+    log_message(get_text("align_rec", frames=frame_index.frame_count, rows=len(frame_index.rec_rows)))
+    if frame_index.incomplete:
+        log_message(get_text("align_incomplete", count=len(frame_index.incomplete)))
+        for timestamp, missing in frame_index.incomplete[:ALIGN_REPORT_LIMIT]:
+            log_message(get_text("align_incomplete_row", timestamp=timestamp, streams=', '.join(missing)))
+    if frame_index.unreferenced:
+        log_message(get_text("align_unreferenced", count=frame_index.unreferenced))
+    run_telemetry.info.update(aligned_by='airsim_rec', incomplete_rows=len(frame_index.incomplete),
+                              unreferenced_files=frame_index.unreferenced)
+
+def apply_frame_filters(frames, frame_index, start_idx, settings, max_depth):
+    """
+    依 Subsample_Mode 與 Dedupe_Frames 設定篩選 {影格編號: 路徑}，有篩選時回傳重新連續編號的結果。
+    """
+    mode = get_subsample_mode(settings)
+    dedupe = settings.get('Dedupe_Frames', False)
+    if mode == 'none' and not dedupe:
+        return frames
+
+    kept = sorted(frames.items())
+    if mode != 'none':
+        rec_rows = frame_index.rec_rows or []
+        if mode == 'motion' and not rec_rows:
+            log_message(get_text("subsample_no_record", path=rec_file_for(frame_index.folder)))
+        with run_telemetry.measure('subsample', frames=len(kept)):
+            kept, missing = subsample_frames(kept, mode, settings.get('Subsample_Stride', 1),
+                                             float(settings.get('Subsample_FPS', 0)),
+                                             float(settings.get('Subsample_Min_Translation', 0)),
+                                             float(settings.get('Subsample_Min_Rotation', 0)), rec_rows)
+        log_message(get_text("subsample_result", mode=mode, kept=len(kept), total=len(frames)))
+        if missing:
+            log_message(get_text("subsample_missing_pose", count=missing))
+
+    if dedupe:
+        with run_telemetry.measure('dedupe', frames=len(kept)):
+            kept, dropped = dedupe_frames(kept, float(settings.get('Dedupe_Image_Threshold', 2.0)),
+                                          float(settings.get('Dedupe_Depth_Threshold', 0.01)), max_depth)
+        log_message(get_text("dedupe_result", kept=len(kept), dropped=dropped))
+    return renumber_frames(kept, start_idx)
+
+def get_config_hash(settings):
+    """會影響輸出內容的設定雜湊，用於判斷影格是否需要重新處理"""
+    focal_length, baseline_meters, max_depth = get_camera_params(settings)
+    depth_type, depth_output = get_depth_types(settings)
+    return settings_hash({'focal_length': focal_length, 'baseline': baseline_meters, 'max_depth': max_depth,
+                          'format': get_map_format(settings), 'fov': settings.get('FOV_degrees', 90),
+                          'depth_type': depth_type, 'depth_output': depth_output,
+                          'point_cloud': get_point_cloud_format(settings),
+                          'right_disparity': bool(settings.get('Right_Disparity', False)),
+                          'pyramid': list(get_pyramid_scales(settings)),
+                          'scene_flow': bool(settings.get('Scene_Flow', False))})
+
+def wait_with_events(seconds):
     """
+    等待指定秒數；在主執行緒中持續處理 Qt 事件讓視窗保持回應，收到取消要求時提前結束。
+    """
+    end_time = time.time() + seconds
+    while time.time() < end_time and not processing_cancelled():
+        if QApplication.instance() is not None and threading.current_thread() is threading.main_thread():
+            QApplication.processEvents()
+        time.sleep(0.05)
+
+def poll_ready_groups(images_folder, seen_keys, last_sizes):
+    """
+    沒有 airsim_rec.txt 時的備援：以檔名尾端的時間戳記分組，
+    四個串流都存在且檔案大小與上次輪詢相同（已寫完）的組別才回傳。
+    """
+    groups = {}
+    sizes = {}
+    with os.scandir(images_folder) as entries:
+        for entry in entries:
+            stream = classify_stream(entry.name)
+            if stream is None:
+                continue
+            try:
+                key = frame_key(entry.name)
+            except ValueError:
+                # 檔名尾端不是時間戳記的檔案略過（與建立影格索引時相同）
+                continue
+            if key in seen_keys:
+                continue
+            groups.setdefault(key, {})[stream] = entry.name
+            sizes[entry.name] = entry.stat().st_size
+
+    ready = []
+    for key in sorted(groups):
+        names = groups[key]
+        if all(stream in names for stream in STREAMS) and all(last_sizes.get(name) == sizes[name] for name in names.values()):
+            ready.append(names)
+            seen_keys.add(key)
+    last_sizes.clear()
+    last_sizes.update(sizes)
+    return ready
+
+def follow_recording(images_folder, processed_data_folder, settings):
+    """
+    跟隨錄製中的 AirSim 資料夾：每組 (left_0, right_0, left_5, pfm) 四個檔案都出現後立即轉換、
+    放置並計算視差，錄製結束時資料集也已完成。超過 Follow_Idle_Timeout 秒沒有新影格時視為錄製結束。
+    處理失敗的影格（例如讀到尚未寫完的檔案）留到下次輪詢重試，重試 Follow_Retries 次後才記錄為錯誤。
+    """
+    log_message(get_text("following_recording", folder=images_folder), update_status=True)
+    os.makedirs(processed_data_folder, exist_ok=True)
+
+    global run_telemetry
+    run_telemetry = Telemetry()
+    run_telemetry.info.update(source=os.path.abspath(images_folder), follow=True)
+    config = FrameConfig.from_settings(settings, processed_data_folder, get_stage_mode(settings))
+    make_scale_folders(processed_data_folder, config.pyramid_scales)
+    if config.scene_flow:
+        log_message(get_text("scene_flow_follow"))
+    config_hash = get_config_hash(settings)
+    stage_counts = {}
+    depth_stats = None
+    if config.depth_stats_bins:
+        stats_path = os.path.join(processed_data_folder, DEPTH_STATS_NAME)
+        depth_stats = DepthStats.load(stats_path, config.depth_stats_bins, config.max_depth)
+    poll_seconds = float(settings.get('Follow_Poll_Seconds', 1))
+    idle_timeout = float(settings.get('Follow_Idle_Timeout', 60))
+    retry_limit = settings.get('Follow_Retries', 3)
+    retry_limit = retry_limit if isinstance(retry_limit, int) and retry_limit >= 0 else 3
+
+    # 重新跟隨同一個錄製時，已處理過的影格沿用原本的編號
+    manifest = FrameManifest(processed_data_folder)
+    known_frames = {record['sources']['depth']['path']: frame
+                    for frame, record in manifest.records.items() if 'depth' in record['sources']}
+    next_frame = max(manifest.records, default=0) + 1
+
+    rec_path = rec_file_for(images_folder)
+    tail = RecordTail(rec_path)
+    seen_keys = set()
+    last_sizes = {}
+    waiting = []
+    processed = 0
+    last_activity = time.time()
+
     try:
-        depth_image = read_pfm(depth_image_path)
-        
-        # 限制最小深度值
-        depth_image[depth_image < 1e-6] = 1e-6
-        
-        # 限制最大深度值
-        depth_image[depth_image > max_depth] = max_depth
+        while not processing_cancelled():
+            if os.path.exists(rec_path):
+                new_groups = tail.poll()
+            else:
+                new_groups = poll_ready_groups(images_folder, seen_keys, last_sizes)
 
-        # 使用相機內參計算視差圖
-        disparity_image = (focal_length * baseline) / depth_image
-        
-        write_pfm(disparity_image_path, disparity_image)
-    except Exception as e:
-        log_message(get_text("file_processing_error", file=depth_image_path, error=e))
+            # 依錄製順序分配影格編號，等四個檔案都存在後才處理
+            for names in new_groups:
+                if not all(stream in names for stream in STREAMS):
+                    continue
+                paths = {stream: os.path.join(images_folder, name) for stream, name in names.items()}
+                frame = known_frames.get(os.path.abspath(paths['depth']))
+                if frame is None:
+                    frame = next_frame
+                    next_frame += 1
+                waiting.append((frame, paths, 0))
+
+            still_waiting = []
+            for frame, paths, attempts in waiting:
+                if not all(os.path.exists(path) for path in paths.values()):
+                    still_waiting.append((frame, paths, attempts))
+                    continue
+                sources = {stream: source_fingerprint(path) for stream, path in paths.items()}
+                if manifest.is_current(frame, sources, config_hash) and (depth_stats is None or frame in depth_stats.rows):
+                    continue
+                try:
+                    outputs = process_frame(frame, paths, config, stage_counts, run_telemetry, depth_stats)
+                    manifest.record(frame, sources, config_hash, outputs)
+                    processed += 1
+                    if processed % 50 == 0:
+                        log_message(get_text("follow_progress", count=processed))
+                except Exception as e:
+                    if attempts < retry_limit:
+                        log_message(get_text("follow_retry", frame=frame, attempt=attempts + 1, limit=retry_limit,
+                                             error=e))
+                        still_waiting.append((frame, paths, attempts + 1))
+                    else:
+                        log_message(get_text("file_processing_error", file=paths['depth'], error=e))
+            waiting = still_waiting
 
-def copy_to_results():
+            if new_groups:
+                last_activity = time.time()
+            elif time.time() - last_activity > idle_timeout:
+                break
+            wait_with_events(poll_seconds)
+    finally:
+        manifest.close()
+        if depth_stats is not None:
+            depth_stats.prune(manifest.records)
+            log_message(get_text("depth_stats_saved", count=depth_stats.save(stats_path), path=stats_path))
+
+    if processing_cancelled():
+        log_message(get_text("follow_cancelled"))
+    else:
+        log_message(get_text("follow_finished", count=processed, timeout=idle_timeout))
+    log_message(get_text("staged_files", summary=format_stage_counts(stage_counts)))
+    return True
+
+def stage_file(src, dst, stage_mode, stage_counts):
+    """
+    放置一個不需轉換的檔案，並依使用的方法（hardlink / reflink / copy ...）累計數量。
+    """
+    method = materialize(src, dst, stage_mode)
+    stage_counts[method] = stage_counts.get(method, 0) + 1
+    return method
+
+def is_same_file(src, dst):
+    """
+    dst 與 src 是同一個檔案（硬連結），或大小相同且不比 src 舊時視為已是最新。
+    """
+    if not os.path.exists(dst):
+        return False
+    if os.path.samefile(src, dst):
+        return True
+    src_stat = os.stat(src)
+    dst_stat = os.stat(dst)
+    return src_stat.st_size == dst_stat.st_size and dst_stat.st_mtime_ns >= src_stat.st_mtime_ns
+
+def format_stage_counts(stage_counts):
+    """將各放置方法的數量格式化為日誌文字"""
+    return ', '.join(f"{method}={count}" for method, count in sorted(stage_counts.items())) or '-'
+
+def copy_to_results(settings=None):
     """
     將處理後的檔案（除了 Seg）複製到第二個輸出資料夾 (Results\\Img)
     """
-    settings = load_settings()
+    if settings is None:
+        settings = load_settings()
     
     source_folder_for_copy = settings.get('output_folder_Seg', 'ProcessData')
     output_folder_for_non_seg = settings.get('output_folder', 'Results\\Img')
@@ -996,165 +1613,306 @@ def copy_to_results():
         log_message(get_text("source_folder_not_exist", folder=source_folder_for_copy))
         return
     
-    if not os.path.exists(output_folder_for_non_seg):
-        os.makedirs(output_folder_for_non_seg)
-        log_message(get_text("result_folder_created", folder=output_folder_for_non_seg))
-    else:
-        log_message(get_text("clearing_result_folder", folder=output_folder_for_non_seg), update_status=True)
-        for filename in os.listdir(output_folder_for_non_seg):
-            file_path = os.path.join(output_folder_for_non_seg, filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path)
-            except Exception as e:
-                log_message(get_text("delete_file_failed", file=filename, error=e))
-    
+    map_ext = MAP_FORMATS[get_map_format(settings)][0]
     file_types_without_seg = [
-        ("DepthGT_*.pfm", "Depth_"),
-        ("Disparity_*.pfm", "Disparity_"),
+        (f"DepthGT_*{map_ext}", "Depth_"),
+        (f"Disparity_*{map_ext}", "Disparity_"),
         ("Img0_*.png", "Img0_"),
         ("Img1_*.png", "Img1_")
     ]
+    if settings.get('Right_Disparity', False):
+        file_types_without_seg += [(f"DisparityR_*{map_ext}", "DisparityR_"), ("Occlusion_*.png", "Occlusion_")]
+    if settings.get('Scene_Flow', False):
+        file_types_without_seg += [("Flow_*.npy", "Flow_"), ("SceneFlow_*.npy", "SceneFlow_")]
+    point_cloud = get_point_cloud_format(settings)
+    if point_cloud != 'none':
+        file_types_without_seg.append((f"Points_*{POINT_CLOUD_FORMATS[point_cloud][0]}", "Points_"))
     
-    total_copied = 0
+    if not os.path.exists(output_folder_for_non_seg):
+        os.makedirs(output_folder_for_non_seg)
+        log_message(get_text("result_folder_created", folder=output_folder_for_non_seg))
     
-    log_message(get_text("copying_files", folder=output_folder_for_non_seg), update_status=True)
+    source_files = {}
     for pattern, prefix in file_types_without_seg:
-        import glob
         files = glob.glob(os.path.join(source_folder_for_copy, pattern))
         log_message(get_text("files_found_pattern", folder=source_folder_for_copy, pattern=pattern, count=len(files)))
         files.sort(key=lambda x: int(x.split('_')[-1].split('.')[0]))
-        
         for file_path in files:
-            filename = os.path.basename(file_path)
-            dest_path = os.path.join(output_folder_for_non_seg, filename)
-            try:
-                shutil.copy2(file_path, dest_path)
-                total_copied += 1
-            except Exception as e:
-                log_message(get_text("copy_file_failed", file=filename, error=e))
+            source_files[os.path.basename(file_path)] = file_path
+    # 多解析度金字塔的 Scale<倍率>/ 子資料夾保留相同的結構
+    pyramid_folders = [scale_folder(scale) for scale in get_pyramid_scales(settings)]
+    pyramid_patterns = ([f"{prefix}_*.png" for _, prefix in PYRAMID_IMAGES]
+                        + [f"{prefix}_*{map_ext}" for prefix in PYRAMID_MAPS])
+    for folder in pyramid_folders:
+        os.makedirs(os.path.join(output_folder_for_non_seg, folder), exist_ok=True)
+        for pattern in pyramid_patterns:
+            files = glob.glob(os.path.join(source_folder_for_copy, folder, pattern))
+            log_message(get_text("files_found_pattern", folder=os.path.join(source_folder_for_copy, folder),
+                                 pattern=pattern, count=len(files)))
+            for file_path in files:
+                source_files[f"{folder}/{os.path.basename(file_path)}"] = file_path
+    # 深度統計 sidecar 與影格檔一起放到結果資料夾
+    stats_path = os.path.join(source_folder_for_copy, DEPTH_STATS_NAME)
+    if get_depth_stats_bins(settings) and os.path.exists(stats_path):
+        source_files[DEPTH_STATS_NAME] = stats_path
     
+    # 只刪除不再需要的結果檔，與來源相同的檔案保留不動
+    log_message(get_text("syncing_result_folder", folder=output_folder_for_non_seg), update_status=True)
+    for filename in os.listdir(output_folder_for_non_seg):
+        file_path = os.path.join(output_folder_for_non_seg, filename)
+        if filename in pyramid_folders and os.path.isdir(file_path):
+            for name in os.listdir(file_path):
+                if f"{filename}/{name}" not in source_files:
+                    try:
+                        os.remove(os.path.join(file_path, name))
+                    except Exception as e:
+                        log_message(get_text("delete_file_failed", file=f"{filename}/{name}", error=e))
+            continue
+        try:
+            if filename not in source_files:
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+                elif os.path.isdir(file_path):
+                    shutil.rmtree(file_path)
+        except Exception as e:
+            log_message(get_text("delete_file_failed", file=filename, error=e))
+    
+    total_copied = 0
+    up_to_date = 0
+    stage_mode = get_stage_mode(settings)
+    stage_counts = {}
+    
+    global run_telemetry
+    if run_telemetry is None:
+        run_telemetry = Telemetry()
+    
+    log_message(get_text("copying_files", folder=output_folder_for_non_seg), update_status=True)
+    for filename, file_path in source_files.items():
+        dest_path = os.path.join(output_folder_for_non_seg, filename)
+        if is_same_file(file_path, dest_path):
+            up_to_date += 1
+            continue
+        try:
+            copy_start = time.perf_counter()
+            method = stage_file(file_path, dest_path, stage_mode, stage_counts)
+            copied = os.path.getsize(file_path) if method in ('copy', 'copy_file_range') else 0
+            run_telemetry.add('results_copy', time.perf_counter() - copy_start, 1, copied, copied)
+            total_copied += 1
+        except Exception as e:
+            log_message(get_text("copy_file_failed", file=filename, error=e))
+    
+    if up_to_date:
+        log_message(get_text("results_up_to_date", count=up_to_date))
     log_message(get_text("files_copied", count=total_copied, folder=output_folder_for_non_seg))
+    log_message(get_text("staged_files", summary=format_stage_counts(stage_counts)))
+
+    export_results(settings, output_folder_for_non_seg)
+
+    # 效能報告與 Results/Info.txt 放在同一個資料夾
+    write_run_report(report_path_for(output_folder_for_non_seg), results_folder=output_folder_for_non_seg)
+
+def export_results(settings, results_folder):
+    """
+    Export_Layout 有設定時，將結果資料夾匯出為 SceneFlow / KITTI 結構（Export_Folder）與 train/val 分割檔。
+    """
+    layout = get_export_layout(settings)
+    if layout == 'none':
+        return
+    export_folder = settings.get('Export_Folder', 'Results/Export')
+    log_message(get_text("export_start", layout=layout, folder=export_folder), update_status=True)
+    summary = export_dataset(results_folder, export_folder, layout, float(settings.get('Export_Val_Ratio', 0.1)),
+                             get_stage_mode(settings), get_worker_num(settings), run_telemetry)
+    for file_path, error in summary['errors']:
+        log_message(get_text("copy_file_failed", file=file_path, error=error))
+    log_message(get_text("export_done", frames=summary['frames'], exported=summary['exported'],
+                         up_to_date=summary['up_to_date'], summary=format_stage_counts(summary['methods']),
+                         train=summary['train'], val=summary['val']))
+
+def parse_arguments(argv):
+    """命令列模式的參數，未指定的參數沿用 Settings.txt"""
+    parser = argparse.ArgumentParser(
+        prog='DataGenerator.py',
+        description='不開啟視窗，直接由命令列產生資料集 / Generate the dataset headlessly from the command line')
+    parser.add_argument('--source', help='AirSim 錄製的 images 資料夾 / AirSim images folder')
+    parser.add_argument('--start', type=int, default=1, help='起始影格（從 1 開始）/ first frame (1-based)')
+    parser.add_argument('--end', type=int, help='結束影格，預設為最後一張 / last frame, defaults to the last one')
+    parser.add_argument('--max-depth', type=float, help='MaxDepth')
+    parser.add_argument('--fov', type=float, help='FOV_degrees')
+    parser.add_argument('--width', type=int, help='image_width')
+    parser.add_argument('--height', type=int, help='image_height')
+    parser.add_argument('--baseline', type=float, help='baseline_meters')
+    parser.add_argument('--workers', type=int, help='Worker_Num（0 = 全部 CPU 核心 / all cores）')
+    parser.add_argument('--format', choices=sorted(MAP_FORMATS), help='Output_Format')
+    parser.add_argument('--depth-type', choices=('auto',) + DEPTH_TYPES, help='Depth_Type')
+    parser.add_argument('--depth-output', choices=DEPTH_TYPES, help='Depth_Output')
+    parser.add_argument('--point-cloud', choices=('none',) + tuple(POINT_CLOUD_FORMATS),
+                        help='Point_Cloud：輸出每個影格的點雲 / export per-frame point clouds')
+    parser.add_argument('--right-disparity', action='store_true', default=None,
+                        help='Right_Disparity：輸出右視角視差與遮擋遮罩 / also write DisparityR_* and Occlusion_*.png')
+    parser.add_argument('--depth-stats', action='store_true', default=None,
+                        help='Depth_Stats：記錄每個影格的深度統計到 DepthStats.npz / write per-frame depth statistics')
+    parser.add_argument('--pyramid', type=int, nargs='+', metavar='SCALE',
+                        help='Pyramid_Scales：另外輸出縮小 SCALE 倍的 Img0/Img1/DepthGT/Disparity 到 Scale<SCALE>/ / '
+                             'also write downscaled copies into Scale<SCALE>/ subfolders')
+    parser.add_argument('--scene-flow', action='store_true', default=None,
+                        help='Scene_Flow：由深度與 airsim_rec.txt 位姿輸出光流 Flow_* 與場景流 SceneFlow_* / '
+                             'write optical and scene flow to the next frame')
+    parser.add_argument('--stride', type=int, help='每 k 張取一張 / keep every k-th frame (Subsample_Mode=stride)')
+    parser.add_argument('--target-fps', type=float, help='依目標頻率抽樣 / subsample to this rate (Subsample_Mode=fps)')
+    parser.add_argument('--min-translation', type=float,
+                        help='相機移動至少幾公尺才保留 / keep a frame after this many meters (Subsample_Mode=motion)')
+    parser.add_argument('--min-rotation', type=float,
+                        help='相機旋轉至少幾度才保留 / keep a frame after this many degrees (Subsample_Mode=motion)')
+    parser.add_argument('--dedupe', action='store_true', default=None,
+                        help='移除近似重複的影格並重新編號 / drop near-duplicate frames (Dedupe_Frames)')
+    parser.add_argument('--output', help='output_folder_Seg（ProcessData）')
+    parser.add_argument('--results', help='output_folder（Results\\Img）')
+    parser.add_argument('--skip-results', action='store_true', help='不複製到結果資料夾 / do not sync the results folder')
+    parser.add_argument('--export', choices=EXPORT_LAYOUTS,
+                        help='Export_Layout：將結果匯出為 SceneFlow / KITTI 結構 / export the results as a standard layout')
+    parser.add_argument('--export-folder', help='Export_Folder（Results/Export）')
+    parser.add_argument('--val-ratio', type=float, help='Export_Val_Ratio：列入 val.txt 的影格比例 / fraction of frames in val.txt')
+    parser.add_argument('--follow', action='store_true', help='即時跟隨錄製中的資料夾 / follow a live recording')
+    parser.add_argument('--shard', help='只處理第 K 個分片，共 N 個（K/N），輸出到 <output>_shardKofN / '
+                                            'process shard K of N into <output>_shardKofN')
+    parser.add_argument('--merge', nargs='+', metavar='FOLDER',
+                        help='檢查並合併分片資料夾到結果資料夾 / check and merge shard folders into the results folder')
+    parser.add_argument('--json', action='store_true', help='以 JSON Lines 輸出日誌與進度 / emit JSON lines')
+    parser.add_argument('--lang', choices=['zh', 'en'], help='日誌語言 / log language')
+    return parser.parse_args(argv)
+
+def run_headless(argv):
+    """
+    命令列批次模式：不建立任何 Qt 視窗，日誌與進度輸出到 stdout。
+    回傳結束代碼：0 = 成功，1 = 失敗或有影格處理失敗。
+    """
+    global headless_output
+    args = parse_arguments(argv)
+    headless_output = 'json' if args.json else 'text'
+    if args.lang:
+        os.environ['AIRSIM_LANGUAGE'] = args.lang
+
+    settings = load_settings()
+    for arg_name, key in CLI_SETTING_KEYS:
+        value = getattr(args, arg_name)
+        if value is not None:
+            settings[key] = value
+    if args.stride is not None:
+        settings['Subsample_Mode'] = 'stride'
+    elif args.target_fps is not None:
+        settings['Subsample_Mode'] = 'fps'
+    elif args.min_translation is not None or args.min_rotation is not None:
+        settings['Subsample_Mode'] = 'motion'
+        # 只指定其中一個門檻時，另一個不列入判斷
+        settings['Subsample_Min_Translation'] = args.min_translation if args.min_translation is not None else float('inf')
+        settings['Subsample_Min_Rotation'] = args.min_rotation if args.min_rotation is not None else float('inf')
+
+    def finish(exit_code):
+        if headless_output == 'json':
+            emit_event('finished', exit_code=exit_code, seconds=round(time.time() - start_time, 2))
+        return exit_code
+
+    start_time = time.time()
+    if args.merge:
+        return finish(run_merge(args.merge, settings))
+    if not args.source:
+        log_message(get_text("cli_source_required"))
+        return finish(1)
+    if not os.path.isdir(args.source):
+        log_message(get_text("cli_source_invalid", folder=args.source))
+        return finish(1)
+
+    try:
+        if args.follow:
+            result = process_raw_data(input_source=FOLLOW_PREFIX + args.source, settings=settings)
+        else:
+            max_count = get_frame_index(args.source).frame_count
+            end_idx = max_count if args.end is None else min(args.end, max_count)
+            if args.start < 1 or args.start > end_idx:
+                log_message(get_text("cli_invalid_range", start=args.start, end=end_idx, count=max_count))
+                return finish(1)
+            if args.shard:
+                # 分片模式：各節點只處理自己的範圍到獨立的資料夾，結果資料夾由 --merge 產生
+                shard, shards = parse_shard(args.shard)
+                if settings.get('Dedupe_Frames', False) or get_subsample_mode(settings) != 'none':
+                    log_message(get_text("dedupe_shard_disabled"))
+                    settings['Dedupe_Frames'] = False
+                    settings['Subsample_Mode'] = 'none'
+                shard_start, shard_end = shard_ranges(args.start, end_idx, shards)[shard - 1]
+                # 指定 --output 時也加上分片後綴，各分片才不會寫入同一個資料夾而互相刪除影格
+                settings['output_folder_Seg'] = shard_folder(settings.get('output_folder_Seg', 'ProcessData'), shard, shards)
+                folder = settings.get('output_folder_Seg', 'ProcessData')
+                if shard_start > shard_end:
+                    log_message(get_text("shard_empty", shard=shard, shards=shards))
+                    os.makedirs(folder, exist_ok=True)
+                    result = True
+                else:
+                    log_message(get_text("shard_range", shard=shard, shards=shards, start=shard_start,
+                                         end=shard_end, folder=folder), update_status=True)
+                    result = process_raw_data(input_source=args.source, frame_range=(shard_start, shard_end),
+                                              settings=settings)
+                write_shard_info(folder, shard, shards, shard_start, shard_end, args.source, max_count)
+                write_run_report(os.path.join(folder, REPORT_NAME))
+                args.skip_results = True
+            else:
+                result = process_raw_data(input_source=args.source, frame_range=(args.start, end_idx), settings=settings)
+
+        if not args.skip_results:
+            log_message(get_text("cli_copying_results"), update_status=True)
+            copy_to_results(settings)
+    except Exception as e:
+        log_message(get_text("cli_processing_error", error=e))
+        return finish(1)
+
+    seconds = round(time.time() - start_time, 1)
+    if result:
+        log_message(get_text("cli_finished", seconds=seconds))
+        return finish(0)
+    log_message(get_text("cli_finished_with_errors", seconds=seconds))
+    return finish(1)
+
+def run_merge(folders, settings):
+    """
+    檢查分片資料夾沒有缺漏或重疊後，依原本的影格編號合併到結果資料夾（Seg 除外）。
+    回傳結束代碼。
+    """
+    log_message(get_text("merge_checking", count=len(folders)), update_status=True)
+    check = check_shards(folders)
+    for problem in check.problems:
+        log_message(get_text("merge_problem", problem=problem))
+    for frame, shard_folders in sorted(check.overlaps.items()):
+        log_message(get_text("merge_overlap", frame=frame, folders=', '.join(shard_folders)))
+    if check.gaps:
+        shown = ', '.join(str(frame) for frame in check.gaps[:20]) + (' ...' if len(check.gaps) > 20 else '')
+        log_message(get_text("merge_gaps", count=len(check.gaps), frames=shown))
+    if check.start is not None:
+        log_message(get_text("merge_range", start=check.start, end=check.end, frames=len(check.frames)))
+    if not check.ok or not check.frames:
+        log_message(get_text("merge_aborted"))
+        return 1
+
+    results_folder = settings.get('output_folder', 'Results\\Img')
+    staged, up_to_date, stage_counts = merge_shards(check, results_folder, get_stage_mode(settings))
+    log_message(get_text("merge_done", staged=staged, up_to_date=up_to_date, folder=results_folder))
+    log_message(get_text("staged_files", summary=format_stage_counts(stage_counts)))
+    export_results(settings, results_folder)
+    return 0
 
 if __name__ == '__main__':
+    # 帶有參數時以命令列批次模式執行，不需要顯示器
+    if len(sys.argv) > 1:
+        sys.exit(run_headless(sys.argv[1:]))
+
     # 創建 QApplication
     app = QApplication.instance()
     if app is None:
         app = QApplication(sys.argv)
     
-    # 創建並顯示進度視窗
+    # 創建並顯示進度視窗，事件循環開始後再選擇輸入源並啟動背景處理
     progress_window = DataGeneratorProgressWindow()
     globals()['progress_window'] = progress_window
     progress_window.show()
-    
-    # 設定總步驟數（大致估計）
-    progress_window.set_progress_range(0, 100)
-    progress_window.update_progress(0, 100)
-    
-    try:
-        raw_data_folder = "RawData"
-        progress_window.update_progress(5, 100)
-        
-        if os.path.exists(raw_data_folder):
-            all_files = os.listdir(raw_data_folder)
-            # 檢查是否有符合新格式的圖片檔案
-            img_left_files = [f for f in all_files if ('_left_0' in f and f.startswith('img_') and f.endswith('.png'))]
-            img_right_files = [f for f in all_files if ('_right_0' in f and f.startswith('img_') and f.endswith('.png'))]
-            img_seg_files = [f for f in all_files if ('_left_5' in f and f.startswith('img_') and f.endswith('.png'))]
-            img_files = img_left_files + img_right_files + img_seg_files
-            pfm_files = [f for f in all_files if f.endswith('.pfm')]
-            
-            if img_files or pfm_files:
-                log_message(get_text("rawdata_found_files", img_count=len(img_files), pfm_count=len(pfm_files)), update_status=True)
-                progress_window.update_progress(10, 100)
-                
-                process_result = process_raw_data()
-                if process_result is None:
-                    log_message(get_text("program_ended"))
-                    progress_window.close_btn.setEnabled(True)
-                    app.exec_()
-                    sys.exit(0)
-                    
-                progress_window.update_progress(60, 100)
-            else:
-                log_message(get_text("rawdata_no_files"), update_status=True)
-                progress_window.update_progress(10, 100)
-                
-                process_result = process_raw_data()
-                if process_result is None:
-                    log_message(get_text("program_ended"))
-                    progress_window.close_btn.setEnabled(True)
-                    app.exec_()
-                    sys.exit(0)
-                    
-                progress_window.update_progress(60, 100)
-        else:
-            log_message(get_text("rawdata_not_found"), update_status=True)
-            progress_window.update_progress(10, 100)
-            
-            process_result = process_raw_data()
-            if process_result is None:
-                log_message(get_text("program_ended"))
-                progress_window.close_btn.setEnabled(True)
-                app.exec_()
-                sys.exit(0)
-                
-            progress_window.update_progress(60, 100)
-        
-        log_message(get_text("starting_pfm_conversion"), update_status=True)
-        progress_window.update_progress(65, 100)
-        
-        # 從設定檔案讀取相機參數
-        settings = load_settings()
-        FOV_degrees = settings.get('FOV_degrees', 90)
-        image_width = settings.get('image_width', 640)
-        image_height = settings.get('image_height', 480)
-        baseline_meters = settings.get('baseline_meters', 1.0)
-        max_depth = settings.get('MaxDepth', 100.0)  # 添加 MaxDepth 參數
-
-        log_message(get_text("camera_params", fov=FOV_degrees, width=image_width, height=image_height, baseline=baseline_meters, depth=max_depth))
-        progress_window.update_progress(70, 100)
-
-        focal_length = (image_width / 2) / np.tan(np.deg2rad(FOV_degrees / 2))
-
-        input_folder = "ProcessData"
-        output_folder = "ProcessData"
-
-        pfm_files = [f for f in os.listdir(input_folder) if f.startswith('DepthGT_') and f.endswith(".pfm")]
-        pfm_files.sort(key=lambda x: int(x.split('_')[-1].split('.')[0]))
-        
-        progress_window.update_progress(75, 100)
-
-        for index, filename in enumerate(pfm_files):
-            input_path = os.path.join(input_folder, filename)
-            
-            new_filename = f"Disparity_{index + 1}.pfm"
-            output_path = os.path.join(output_folder, new_filename)
-            depth_to_disparity(input_path, output_path, focal_length, baseline_meters, max_depth)
-            
-            # 更新進度
-            pfm_progress = 75 + int((index + 1) / len(pfm_files) * 15)
-            progress_window.update_progress(pfm_progress, 100)
-            
-        pfm_complete_msg = f"✅ 已處理 {len(pfm_files)} 個 '.pfm' 檔案，完成深度到視差轉換。" if progress_window.current_language == "zh" else f"✅ Processed {len(pfm_files)} '.pfm' files, completed depth to disparity conversion."
-        log_message(pfm_complete_msg)
-        progress_window.update_progress(90, 100)
-        
-        copy_msg = "🔄 開始複製檔案到結果資料夾..." if progress_window.current_language == "zh" else "🔄 Starting to copy files to results folder..."
-        log_message(copy_msg, update_status=True)
-        copy_to_results()
-        progress_window.update_progress(100, 100)
-        
-        complete_msg = "🎉 所有處理完成！" if progress_window.current_language == "zh" else "🎉 All processing completed!"
-        log_message(complete_msg, update_status=True)
-        progress_window.processing_complete()
-        
-    except Exception as e:
-        error_msg = f"⚠️ 處理過程中發生錯誤：{e}" if progress_window.current_language == "zh" else f"⚠️ Error occurred during processing: {e}"
-        log_message(error_msg)
-        progress_window.close_btn.setEnabled(True)
+    QTimer.singleShot(0, progress_window.start_processing)
     
     # 執行 QApplication 事件循環
-    app.exec_()
\ No newline at end of file
+    sys.exit(app.exec_())
@@ -0,0 +1,161 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PFM_Codec import MAP_FORMATS, read_map, find_map
+from File_Stager import materialize
+
+# 匯出的資料集結構：none = 不匯出，sceneflow = left/ right/ disparity/ depth/，
+# kitti = training/image_2 image_3 disp_occ_0（16-bit PNG，數值×256）
+EXPORT_LAYOUTS = ('none', 'sceneflow', 'kitti')
+
+# 各結構的輸出：(結果資料夾中的前綴, 匯出的子資料夾, 檔名樣式, 深度圖/視差圖的格式；影像為 None)
+LAYOUT_ENTRIES = {
+    'sceneflow': (
+        ('Img0', 'left', '{frame:06d}.png', None),
+        ('Img1', 'right', '{frame:06d}.png', None),
+        ('Disparity', 'disparity', '{frame:06d}.pfm', 'pfm'),
+        ('DepthGT', 'depth', '{frame:06d}.pfm', 'pfm'),
+    ),
+    'kitti': (
+        ('Img0', 'training/image_2', '{frame:06d}_10.png', None),
+        ('Img1', 'training/image_3', '{frame:06d}_10.png', None),
+        ('Disparity', 'training/disp_occ_0', '{frame:06d}_10.png', 'png16'),
+    ),
+}
+
+# 分割檔：每行為一個影格的 左影像 右影像 視差 相對路徑；三者都有的影格才列入
+SPLIT_FILES = ('train.txt', 'val.txt')
+SPLIT_PREFIXES = ('Img0', 'Img1', 'Disparity')
+
+def get_export_layout(settings):
+    """讀取 Export_Layout 設定：none / sceneflow / kitti"""
+    value = str(settings.get('Export_Layout', 'none')).lower()
+    return value if value in EXPORT_LAYOUTS else 'none'
+
+def result_frames(results_folder):
+    """結果資料夾中有 Img0 的影格編號（排序後）"""
+    frames = []
+    for name in os.listdir(results_folder):
+        match = re.fullmatch(r'Img0_(\d+)\.png', name)
+        if match:
+            frames.append(int(match.group(1)))
+    return sorted(frames)
+
+def plan_export(results_folder, layout, frames):
+    """
+    列出匯出的工作 [(來源路徑, 匯出相對路徑, 需要轉換的格式或 None)] 與每個影格的相對路徑 {影格: {前綴: 路徑}}。
+    深度圖/視差圖已是目標格式時直接連結，否則標記為需要轉換；結果資料夾中沒有的輸出略過。
+    """
+    jobs = []
+    frame_files = {}
+    for frame in frames:
+        files = {}
+        for prefix, folder, pattern, map_format in LAYOUT_ENTRIES[layout]:
+            if map_format is None:
+                src = os.path.join(results_folder, f'{prefix}_{frame}.png')
+                if not os.path.exists(src):
+                    continue
+                convert = None
+            else:
+                src = find_map(results_folder, f'{prefix}_{frame}')
+                if src is None:
+                    continue
+                convert = None if os.path.splitext(src)[1].lower() == MAP_FORMATS[map_format][0] else map_format
+            rel_path = f'{folder}/{pattern.format(frame=frame)}'
+            jobs.append((src, rel_path, convert))
+            files[prefix] = rel_path
+        frame_files[frame] = files
+    return jobs, frame_files
+
+def is_current(src, dst, convert):
+    """連結的檔案與來源為同一個檔案，轉換的檔案不比來源舊時視為已是最新"""
+    if not os.path.exists(dst):
+        return False
+    if convert is None:
+        return os.path.samefile(src, dst)
+    return os.stat(dst).st_mtime_ns >= os.stat(src).st_mtime_ns
+
+def export_file(src, dst, convert, stage_mode='link'):
+    """
+    匯出一個檔案，回傳使用的方法：不需轉換時以 materialize 連結/複製，
+    否則讀入後以目標格式寫出（先寫暫存檔再取代），回傳 'convert'。
+    """
+    if convert is None:
+        return materialize(src, dst, stage_mode)
+    tmp_path = dst + '.tmp'
+    MAP_FORMATS[convert][1](tmp_path, read_map(src))
+    os.replace(tmp_path, dst)
+    return 'convert'
+
+def write_splits(export_folder, frame_files, val_ratio):
+    """
+    依影格順序將最後 val_ratio 比例的影格列為 val（連續的錄製畫面不會同時出現在 train 與 val），其餘為 train。
+    回傳 (train 數量, val 數量)。
+    """
+    frames = [frame for frame in sorted(frame_files) if all(prefix in frame_files[frame] for prefix in SPLIT_PREFIXES)]
+    val_count = min(len(frames), int(round(len(frames) * max(0.0, val_ratio))))
+    splits = (frames[:len(frames) - val_count], frames[len(frames) - val_count:])
+    for name, split in zip(SPLIT_FILES, splits):
+        tmp_path = os.path.join(export_folder, name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for frame in split:
+                f.write(' '.join(frame_files[frame][prefix] for prefix in SPLIT_PREFIXES) + '\n')
+        os.replace(tmp_path, os.path.join(export_folder, name))
+    return len(splits[0]), len(splits[1])
+
+def export_dataset(results_folder, export_folder, layout, val_ratio=0.1, stage_mode='link', workers=4,
+                   telemetry=None):
+    """
+    將結果資料夾（Img0_N.png、Img1_N.png、DepthGT_N、Disparity_N）匯出為 layout 指定的資料夾結構與分割檔。
+    影像與格式相同的檔案以硬連結/reflink 放置，需要轉換格式的檔案交給 workers 個執行緒平行寫出
+    （PNG 編碼與檔案 I/O 會釋放 GIL）。已是最新的檔案略過，結構中不再需要的舊檔會被刪除。
+    回傳 {'frames', 'exported', 'up_to_date', 'methods', 'errors', 'train', 'val'}。
+    """
+    frames = result_frames(results_folder)
+    jobs, frame_files = plan_export(results_folder, layout, frames)
+    wanted = {rel_path for _, rel_path, _ in jobs}
+    folders = sorted({folder for _, folder, _, _ in LAYOUT_ENTRIES[layout]})
+    for folder in folders:
+        path = os.path.join(export_folder, folder)
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if f'{folder}/{name}' not in wanted and os.path.isfile(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+
+    pending = []
+    up_to_date = 0
+    for src, rel_path, convert in jobs:
+        dst = os.path.join(export_folder, rel_path)
+        if is_current(src, dst, convert):
+            up_to_date += 1
+        else:
+            pending.append((src, dst, convert))
+
+    methods = {}
+    errors = []
+
+    def run(job):
+        src, dst, convert = job
+        start = time.perf_counter()
+        method = export_file(src, dst, convert, stage_mode)
+        if telemetry is not None:
+            # 硬連結/reflink 不會實際搬移資料，只有複製與轉換計入讀寫的 bytes
+            moved = method in ('copy', 'copy_file_range', 'convert')
+            telemetry.add('export', time.perf_counter() - start, 0,
+                          os.path.getsize(src) if moved else 0, os.path.getsize(dst) if moved else 0)
+        return method
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for job, future in [(job, executor.submit(run, job)) for job in pending]:
+            try:
+                method = future.result()
+                methods[method] = methods.get(method, 0) + 1
+            except Exception as e:
+                errors.append((job[0], str(e)))
+    if telemetry is not None:
+        telemetry.add('export', frames=len(frames))
+
+    train, val = write_splits(export_folder, frame_files, val_ratio)
+    return {'frames': len(frames), 'exported': len(pending) - len(errors), 'up_to_date': up_to_date,
+            'methods': methods, 'errors': errors, 'train': train, 'val': val}
@@ -0,0 +1,133 @@
+import os
+import threading
+import numpy as np
+
+# 資料集的深度統計 sidecar 檔名，放在 ProcessData 與結果資料夾中
+DEPTH_STATS_NAME = 'DepthStats.npz'
+
+# 每個影格記錄的百分位數
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+# 深度限制的下限（與 depth_batch_kernel 相同）
+MIN_DEPTH = 1e-6
+
+def get_depth_stats_bins(settings):
+    """
+    讀取 Depth_Stats 與 Depth_Stats_Bins 設定，回傳直方圖的區間數；0 代表不記錄深度統計。
+    """
+    if not settings.get('Depth_Stats', False):
+        return 0
+    bins = settings.get('Depth_Stats_Bins', 64)
+    return bins if isinstance(bins, int) and bins > 0 else 64
+
+def depth_stats_batch(depth_stack, max_depth, bins=64):
+    """
+    對已限制在 [1e-6, max_depth] 的 (N, H, W) 平面深度堆疊一次計算每個影格的統計，回傳 {欄位: 以 N 開頭的陣列}：
+    min / max / mean、percentiles (N, P)、clamp_low / clamp_high（被限制在下限 / max_depth 的像素比例）、
+    histogram (N, bins)：[0, max_depth] 等寬區間的像素數。
+    """
+    n = len(depth_stack)
+    flat = depth_stack.reshape(n, -1)
+    # 以 float32 比較，與緩衝區中限制後的值完全相同
+    low = np.float32(MIN_DEPTH)
+    high = np.float32(max_depth)
+    # 各影格的區間索引加上 i * bins 的偏移，整批以一次 bincount 完成
+    index = (flat * np.float32(bins / max_depth)).astype(np.int64)
+    np.clip(index, 0, bins - 1, out=index)
+    index += (np.arange(n, dtype=np.int64) * bins)[:, np.newaxis]
+    histogram = np.bincount(index.ravel(), minlength=n * bins).reshape(n, bins)
+    return {
+        'min': flat.min(axis=1),
+        'max': flat.max(axis=1),
+        'mean': flat.mean(axis=1, dtype=np.float64).astype(np.float32),
+        'percentiles': np.percentile(flat, PERCENTILES, axis=1).T.astype(np.float32),
+        'clamp_low': np.count_nonzero(flat <= low, axis=1) / np.float32(flat.shape[1]),
+        'clamp_high': np.count_nonzero(flat >= high, axis=1) / np.float32(flat.shape[1]),
+        'histogram': histogram.astype(np.uint32),
+    }
+
+class DepthStats:
+    """
+    各影格的深度統計 {影格編號: {欄位: 值}}，可在多個執行緒中同時記錄；
+    子行程以 to_dict() 回傳，再由主行程 merge()，寫檔時才依影格編號排成欄位式的 NPZ。
+    """
+    def __init__(self, bins=64, max_depth=100.0):
+        self.bins = bins
+        self.max_depth = max_depth
+        self.rows = {}
+        self._lock = threading.Lock()
+
+    def add_batch(self, frames, stats):
+        """記錄 depth_stats_batch 的結果，frames 為與堆疊順序相同的影格編號"""
+        with self._lock:
+            for j, frame in enumerate(frames):
+                self.rows[frame] = {key: value[j] for key, value in stats.items()}
+
+    def merge(self, rows):
+        with self._lock:
+            self.rows.update(rows)
+
+    def to_dict(self):
+        with self._lock:
+            return dict(self.rows)
+
+    def prune(self, frames):
+        """只保留 frames 中的影格（例如影格清單中已完成的影格）"""
+        with self._lock:
+            self.rows = {frame: row for frame, row in self.rows.items() if frame in frames}
+
+    @classmethod
+    def load(cls, path, bins=None, max_depth=None):
+        """
+        讀取既有的 sidecar；檔案不存在、無法讀取，或區間數 / max_depth 與指定的不同時回傳空的統計。
+        """
+        stats = cls(bins or 64, 100.0 if max_depth is None else max_depth)
+        if not os.path.exists(path):
+            return stats
+        try:
+            columns = read_depth_stats(path)
+            file_bins = columns['histogram'].shape[1]
+            file_max_depth = float(columns['max_depth'])
+        except Exception:
+            # 損毀或舊格式的檔案視為沒有統計，缺少的影格會重新處理
+            return stats
+        if (bins is not None and bins != file_bins) or (max_depth is not None and float(max_depth) != file_max_depth):
+            return stats
+        stats.bins, stats.max_depth = file_bins, file_max_depth
+        keys = ('min', 'max', 'mean', 'percentiles', 'clamp_low', 'clamp_high', 'histogram')
+        for i, frame in enumerate(columns['frame'].tolist()):
+            stats.rows[frame] = {key: columns[key][i] for key in keys}
+        return stats
+
+    def save(self, path):
+        """
+        依影格編號排序後寫成欄位式的壓縮 NPZ（先寫暫存檔再取代）：
+        frame (M,)、min / max / mean / clamp_low / clamp_high (M,)、percentiles (M, P)、histogram (M, bins)，
+        以及 percentile_levels、histogram_edges、max_depth。回傳影格數。
+        """
+        with self._lock:
+            frames = sorted(self.rows)
+            rows = [self.rows[frame] for frame in frames]
+        columns = {'frame': np.array(frames, dtype=np.int64)}
+        for key, dtype, shape in (('min', np.float32, ()), ('max', np.float32, ()), ('mean', np.float32, ()),
+                                  ('percentiles', np.float32, (len(PERCENTILES),)),
+                                  ('clamp_low', np.float32, ()), ('clamp_high', np.float32, ()),
+                                  ('histogram', np.uint32, (self.bins,))):
+            column = np.empty((len(rows),) + shape, dtype=dtype)
+            for i, row in enumerate(rows):
+                column[i] = row[key]
+            columns[key] = column
+        columns['percentile_levels'] = np.array(PERCENTILES, dtype=np.float32)
+        columns['histogram_edges'] = np.linspace(0, self.max_depth, self.bins + 1, dtype=np.float32)
+        columns['max_depth'] = np.float64(self.max_depth)
+        tmp_path = path + '.tmp'
+        # 以檔案物件寫入，避免 np.savez 自動加上副檔名
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **columns)
+        os.replace(tmp_path, path)
+        return len(frames)
+
+def read_depth_stats(path):
+    """讀取 sidecar 為 {欄位: 陣列}，供檢視器、匯出或檢查腳本使用"""
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
@@ -0,0 +1,174 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+from datetime import datetime
+from Airsim_Record import REC_FILE_NAME
+from Camera_Model import focal_length_px, ray_cosine_grid
+
+# 與 Airsim settings/settings.json 的 Recording.Cameras 相同：(相機名稱, ImageType, 副檔名)
+CAMERAS = (('front_left', 0, 'png'), ('front_right', 0, 'png'), ('front_left', 5, 'png'), ('front_left', 1, 'pfm'))
+
+# 錄製的深度類型：planar = DepthPlanar (ImageType 1)，perspective = DepthPerspective (ImageType 2)，
+# mixed = 兩者逐影格交替（用來檢查同一批次中混合兩種深度的處理）
+DEPTH_TYPES = ('planar', 'perspective', 'mixed')
+
+# AirSim PhysXCar 錄製檔的欄位
+REC_COLUMNS = ('VehicleName', 'TimeStamp', 'POS_X', 'POS_Y', 'POS_Z', 'Q_W', 'Q_X', 'Q_Y', 'Q_Z',
+               'Throttle', 'Steering', 'Brake', 'Gear', 'Handbrake', 'RPM', 'Speed', 'ImageFile')
+
+# 分割圖中物件的顏色（BGR）
+SEG_COLORS = ((128, 64, 128), (70, 70, 70), (0, 220, 220), (142, 0, 0), (60, 20, 220))
+
+def render_scene(width, height, fov_degrees, max_depth, rng, obstacles=4):
+    """
+    產生一組相互一致的合成場景：平面地面 + 天空 + 幾個方塊障礙物。
+    回傳 (左影像, 右影像, 分割圖, 平面深度)，深度單位為公尺（DepthPlanar）。
+    """
+    focal = focal_length_px(width, fov_degrees)
+    cy = height / 2
+    rows = np.arange(height, dtype=np.float32)[:, np.newaxis] - cy + 0.5
+    camera_height = 1.5
+
+    # 地平線以下為地面，深度 = f * h / (y - cy)；地平線以上為天空
+    depth = np.full((height, width), 1000.0, dtype=np.float32)
+    ground = np.broadcast_to(rows > 0, (height, width))
+    ground_depth = focal * camera_height / np.maximum(rows, 1e-3)
+    depth = np.where(ground, np.broadcast_to(ground_depth, (height, width)), depth).astype(np.float32)
+    seg = np.zeros((height, width, 3), dtype=np.uint8)
+    seg[ground] = SEG_COLORS[0]
+    seg[~ground] = SEG_COLORS[1]
+
+    for i in range(obstacles):
+        z = float(rng.uniform(4.0, max_depth * 0.8))
+        half = int(rng.uniform(0.5, 2.0) * focal / z)
+        cx = int(rng.uniform(0.1, 0.9) * width)
+        bottom = int(min(height - 1, cy + focal * camera_height / z))
+        top = max(0, bottom - 2 * half)
+        left, right = max(0, cx - half), min(width, cx + half)
+        region = depth[top:bottom, left:right]
+        closer = region > z
+        region[closer] = z
+        seg[top:bottom, left:right][closer] = SEG_COLORS[2 + i % (len(SEG_COLORS) - 2)]
+
+    # 影像以距離做陰影並加上雜訊；右影像依視差水平平移
+    shade = np.clip(255.0 * (1.0 - np.minimum(depth, max_depth) / (max_depth * 1.2)), 0, 255)
+    noise = rng.normal(0, 6, (height, width, 3))
+    left = np.clip(seg.astype(np.float32) * 0.6 + shade[..., np.newaxis] * 0.4 + noise, 0, 255).astype(np.uint8)
+    disparity = (focal * 0.2 / np.maximum(depth, 1e-3)).astype(np.int32)
+    columns = np.clip(np.arange(width)[np.newaxis, :] + disparity, 0, width - 1)
+    right = np.take_along_axis(left, np.broadcast_to(columns[..., np.newaxis], left.shape), axis=1)
+    return left, right, seg, depth
+
+def encode_pfm(depth):
+    """將深度圖編碼為 little-endian PFM 位元組"""
+    header = f'Pf\n{depth.shape[1]} {depth.shape[0]}\n-1.0\n'.encode('ascii')
+    return header + np.ascontiguousarray(depth, dtype='<f4').tobytes()
+
+def build_variants(count, width, height, fov_degrees, max_depth, seed):
+    """
+    預先編碼 count 組不同的場景，之後依序重複使用，產生大量影格時只需寫檔。
+    每組為 {ImageType 與相機: 檔案位元組}；深度同時編碼為 DepthPlanar (1) 與 DepthPerspective (2)。
+    """
+    rng = np.random.default_rng(seed)
+    params = [cv2.IMWRITE_PNG_COMPRESSION, 3]
+    cosine = ray_cosine_grid(width, height, fov_degrees)
+    variants = []
+    for _ in range(count):
+        left, right, seg, depth = render_scene(width, height, fov_degrees, max_depth, rng)
+        variants.append({
+            ('front_left', 0): cv2.imencode('.png', left, params)[1].tobytes(),
+            ('front_right', 0): cv2.imencode('.png', right, params)[1].tobytes(),
+            ('front_left', 5): cv2.imencode('.png', seg, params)[1].tobytes(),
+            ('front_left', 1): encode_pfm(depth),
+            ('front_left', 2): encode_pfm(depth / cosine),
+        })
+    return variants
+
+def depth_camera(index, depth_type):
+    """第 index 個影格的深度串流 (相機名稱, ImageType, 副檔名)"""
+    perspective = depth_type == 'perspective' or (depth_type == 'mixed' and index % 2 == 1)
+    return ('front_left', 2 if perspective else 1, 'pfm')
+
+def pose_at(index, fps, speed):
+    """
+    以固定速度沿圓弧前進的車輛位置與姿態（NED 座標，只有 yaw），回傳 (x, y, z, qw, qx, qy, qz, 偏航角)。
+    圓弧的弦長為 2R·sin(yaw/2)，方向為 yaw/2。
+    """
+    t = index / fps
+    yaw_rate = 0.05
+    yaw = yaw_rate * t
+    chord = 2 * (speed / yaw_rate) * np.sin(yaw / 2)
+    x = chord * np.cos(yaw / 2)
+    y = chord * np.sin(yaw / 2)
+    return x, y, 0.0, np.cos(yaw / 2), 0.0, 0.0, np.sin(yaw / 2), yaw
+
+def write_recording(output_root, frames, width=640, height=480, fov_degrees=90, max_depth=100.0,
+                    fps=30.0, vehicle='PhysXCar', variants=16, seed=0, folder_name=None, progress=None,
+                    depth_type='planar'):
+    """
+    在 output_root 下建立 AirSim 格式的錄製資料夾（<時間>/images 與 airsim_rec.txt），回傳 images 資料夾路徑。
+    depth_type 為 DEPTH_TYPES 之一，決定每個影格寫出 DepthPlanar 或 DepthPerspective。
+    """
+    folder_name = folder_name or datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+    record_folder = os.path.join(output_root, folder_name)
+    images_folder = os.path.join(record_folder, 'images')
+    os.makedirs(images_folder, exist_ok=True)
+
+    encoded = build_variants(max(1, variants), width, height, fov_degrees, max_depth, seed)
+    start_ms = int(time.time() * 1000)
+    speed = 8.0
+
+    with open(os.path.join(record_folder, REC_FILE_NAME), 'w', encoding='utf-8', newline='\n') as rec:
+        rec.write('\t'.join(REC_COLUMNS) + '\n')
+        for index in range(frames):
+            timestamp_ms = start_ms + int(round(index * 1000.0 / fps))
+            # AirSim 檔名使用奈秒時間戳記，錄製檔的 TimeStamp 欄位為毫秒
+            timestamp_ns = timestamp_ms * 1000000
+            variant = encoded[index % len(encoded)]
+            names = []
+            for camera, image_type, ext in CAMERAS[:3] + (depth_camera(index, depth_type),):
+                name = f'img_{vehicle}_{camera}_{image_type}_{timestamp_ns}.{ext}'
+                with open(os.path.join(images_folder, name), 'wb') as f:
+                    f.write(variant[(camera, image_type)])
+                names.append(name)
+            x, y, z, qw, qx, qy, qz, yaw = pose_at(index, fps, speed)
+            row = (vehicle, timestamp_ms, f'{x:.6f}', f'{y:.6f}', f'{z:.6f}', f'{qw:.6f}', f'{qx:.6f}',
+                   f'{qy:.6f}', f'{qz:.6f}', '0.5', f'{0.05 * np.sin(yaw):.4f}', '0', '1', '0', '1500',
+                   f'{speed:.3f}', ';'.join(names))
+            rec.write('\t'.join(str(value) for value in row) + '\n')
+            if progress and (index + 1) % 1000 == 0:
+                progress(index + 1, frames)
+    return images_folder
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='Fake_Recording.py',
+        description='產生假的 AirSim 錄製資料（不需要 UE4）/ Write a synthetic AirSim recording without UE4')
+    parser.add_argument('--output', default='FakeRecordings', help='輸出資料夾 / output folder')
+    parser.add_argument('--frames', type=int, default=1000, help='影格數 / number of frames')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--fov', type=float, default=90.0)
+    parser.add_argument('--max-depth', type=float, default=100.0)
+    parser.add_argument('--fps', type=float, default=30.0, help='錄製頻率 / recording rate')
+    parser.add_argument('--vehicle', default='PhysXCar')
+    parser.add_argument('--variants', type=int, default=16, help='不同場景的數量 / distinct scenes to cycle through')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--name', help='錄製資料夾名稱，預設為目前時間 / recording folder name')
+    parser.add_argument('--depth-type', choices=DEPTH_TYPES, default='planar',
+                        help='深度類型，mixed = 逐影格交替 / depth image type, mixed alternates per frame')
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    images_folder = write_recording(args.output, args.frames, args.width, args.height, args.fov, args.max_depth,
+                                    args.fps, args.vehicle, args.variants, args.seed, args.name,
+                                    progress=lambda done, total: print(f'{done}/{total}', flush=True),
+                                    depth_type=args.depth_type)
+    print(f'{args.frames} frames -> {images_folder} ({time.time() - start:.1f}s)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,64 @@
+import os
+import sys
+import shutil
+
+# Linux FICLONE ioctl（btrfs / XFS / overlayfs 等支援 reflink 的檔案系統）
+FICLONE = 0x40049409
+
+# 已知在某組 (來源裝置, 目標資料夾) 上無法使用的方法，避免每個檔案都重試失敗的系統呼叫
+_unsupported = {}
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+def _copy_file_range(src, dst):
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+            if copied == 0:
+                raise OSError('copy_file_range 未複製任何資料')
+            remaining -= copied
+
+def _available_methods():
+    methods = [('hardlink', os.link)]
+    if sys.platform.startswith('linux'):
+        methods.append(('reflink', _reflink))
+    if hasattr(os, 'copy_file_range'):
+        methods.append(('copy_file_range', _copy_file_range))
+    return methods
+
+def materialize(src, dst, mode='link'):
+    """
+    將 src 放到 dst，回傳實際使用的方法名稱。
+    mode='link' 時依序嘗試硬連結、reflink、copy_file_range，都不支援時才完整複製；
+    mode='copy' 時一律完整複製。已存在的 dst 會先刪除，避免寫穿到共用同一份資料的檔案。
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    if mode == 'link':
+        key = (os.stat(src).st_dev, os.path.dirname(os.path.abspath(dst)))
+        failed = _unsupported.setdefault(key, set())
+        for name, method in _available_methods():
+            if name in failed:
+                continue
+            try:
+                method(src, dst)
+                return name
+            except OSError:
+                failed.add(name)
+                if os.path.lexists(dst):
+                    os.remove(dst)
+
+    shutil.copyfile(src, dst)
+    return 'copy'
+
+def get_stage_mode(settings):
+    """
+    讀取 Stage_Mode 設定（link / copy），預設為 link。
+    """
+    mode = str(settings.get('Stage_Mode', 'link')).lower()
+    return mode if mode in ('link', 'copy') else 'link'
@@ -0,0 +1,651 @@
+import os
+import time
+import queue
+import threading
+import contextlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PFM_Codec import (read_pfm, write_pfm, write_mask_png, write_image_png, write_npy16, MAP_FORMATS,
+                       get_map_format)
+from File_Stager import materialize
+from Run_Telemetry import Telemetry
+from Airsim_Record import depth_image_type
+from Camera_Model import focal_length_px, ray_cosine_grid
+from Point_Cloud import POINT_CLOUD_FORMATS, get_point_cloud_format, depth_to_points, read_color_image
+from Depth_Stats import DepthStats, depth_stats_batch, get_depth_stats_bins
+from Scene_Flow import flow_batch
+from Frame_Pyramid import (PYRAMID_IMAGES, get_pyramid_scales, pyramid_stacks, resize_image, read_image,
+                           scaled_prefix)
+
+# 不需轉換、直接放置的影像串流與輸出檔名前綴
+IMAGE_OUTPUTS = (('left', 'Img0'), ('right', 'Img1'), ('seg', 'Seg'))
+
+# 不依 Output_Format、固定格式寫出的輸出：遮罩為 8-bit PNG，光流 (H, W, 2) 與場景流 (H, W, 3) 為 float16 NPY
+MASK_OUTPUTS = {'Occlusion': ('.png', write_mask_png)}
+FLOW_OUTPUTS = {'Flow': ('.npy', write_npy16), 'SceneFlow': ('.npy', write_npy16)}
+FIXED_OUTPUTS = dict(MASK_OUTPUTS, **FLOW_OUTPUTS)
+
+# 右視角視差與左視角視差相差超過此值（像素）時，左影像的像素視為在右影像中被遮擋
+OCCLUSION_TOLERANCE = 0.5
+
+# 深度類型：planar = DepthPlanar（到相機平面的距離），perspective = DepthPerspective（沿射線到相機中心的距離）
+DEPTH_TYPES = ('planar', 'perspective')
+
+def get_camera_params(settings):
+    """
+    從設定計算焦距，回傳 (focal_length, baseline, max_depth)。
+    """
+    FOV_degrees = settings.get('FOV_degrees', 90)
+    image_width = settings.get('image_width', 640)
+    baseline_meters = settings.get('baseline_meters', 1.0)
+    max_depth = settings.get('MaxDepth', 100.0)
+    focal_length = focal_length_px(image_width, FOV_degrees)
+    return focal_length, baseline_meters, max_depth
+
+def get_worker_num(settings):
+    """
+    讀取 Worker_Num 設定，0 或未設定時使用全部 CPU 核心。
+    """
+    worker_num = settings.get('Worker_Num', 0)
+    if not isinstance(worker_num, int) or worker_num <= 0:
+        worker_num = os.cpu_count() or 1
+    return worker_num
+
+def get_depth_types(settings):
+    """
+    讀取 Depth_Type（錄製的深度類型，auto = 依檔名的 ImageType 判斷）與 Depth_Output（DepthGT 輸出的深度類型）。
+    """
+    depth_type = str(settings.get('Depth_Type', 'auto')).lower()
+    depth_output = str(settings.get('Depth_Output', 'planar')).lower()
+    return (depth_type if depth_type in DEPTH_TYPES else 'auto',
+            depth_output if depth_output in DEPTH_TYPES else 'planar')
+
+def is_perspective(paths, config):
+    """影格的原始深度圖是否為 DepthPerspective"""
+    if config.depth_type == 'auto':
+        return depth_image_type(os.path.basename(paths.get('depth', ''))) == 'perspective'
+    return config.depth_type == 'perspective'
+
+def measure(telemetry, stage, **counts):
+    """telemetry 為 None 時不計時"""
+    if telemetry is None:
+        return contextlib.nullcontext()
+    return telemetry.measure(stage, **counts)
+
+def depth_batch_kernel(depth_stack, focal_length, baseline, max_depth, depth_out, disparity_out, telemetry=None,
+                       to_planar=None, to_perspective=None, on_clamped=None):
+    """
+    對 (N, H, W) 深度堆疊一次完成深度限制與視差計算，結果直接寫入預先配置的 float32 緩衝區：
+    depth_out = clip(depth_stack, 1e-6, max_depth)，disparity_out = focal_length * baseline / depth_out。
+    depth_stack 可以就是 depth_out（就地處理）。
+    to_planar / to_perspective 為 ray_cosine_grid：原始深度為 DepthPerspective 時先乘上餘弦轉為平面深度，
+    視差一律由平面深度計算；需要輸出 DepthPerspective 時最後再除以餘弦。
+    on_clamped(depth_out) 在深度限制之後、轉回 DepthPerspective 之前呼叫，用來在同一次處理中記錄平面深度的統計。
+    """
+    frames = len(depth_out)
+    if to_planar is not None:
+        with measure(telemetry, 'depth_convert', frames=frames):
+            np.multiply(depth_stack, to_planar, out=depth_out)
+        depth_stack = depth_out
+    with measure(telemetry, 'depth_clamp', frames=frames):
+        np.clip(depth_stack, 1e-6, max_depth, out=depth_out)
+    if on_clamped is not None:
+        on_clamped(depth_out)
+    with measure(telemetry, 'disparity', frames=frames):
+        np.divide(focal_length * baseline, depth_out, out=disparity_out)
+    if to_perspective is not None:
+        with measure(telemetry, 'depth_convert', frames=frames):
+            np.divide(depth_out, to_perspective, out=depth_out)
+    return depth_out, disparity_out
+
+def right_view_kernel(disparity_stack, telemetry=None, tolerance=OCCLUSION_TOLERANCE):
+    """
+    將 (N, H, W) 左視角視差前向投影到右視角：左影像像素 x 對應右影像的 round(x - d)。
+    多個像素落在同一位置時以 np.maximum.at 保留最大視差（最近的表面，即 z-buffer），沒有像素落入的位置為 0（無效）。
+    回傳 (右視角視差 float32, 左視角遮擋遮罩 uint8)：遮罩 255 代表左影像的像素在右影像中看不到
+    （投影到畫面外，或視差比同一位置保留的視差小超過 tolerance）。
+    """
+    n, height, width = disparity_stack.shape
+    with measure(telemetry, 'right_view', frames=n):
+        target = np.rint(np.arange(width, dtype=np.float32) - disparity_stack).astype(np.int64)
+        inside = (target >= 0) & (target < width)
+        # 每一列在攤平陣列中的起點，讓整批影格一次散佈
+        target += (np.arange(n * height, dtype=np.int64) * width).reshape(n, height, 1)
+        flat_target = target[inside]
+        disparity_right = np.zeros(n * height * width, dtype=np.float32)
+        np.maximum.at(disparity_right, flat_target, disparity_stack[inside])
+        visible = np.zeros(disparity_stack.shape, dtype=bool)
+        visible[inside] = disparity_stack[inside] >= disparity_right[flat_target] - tolerance
+        occlusion = np.where(visible, 0, 255).astype(np.uint8)
+    return disparity_right.reshape(n, height, width), occlusion
+
+def conversion_grids(shape, perspective, config):
+    """
+    依原始深度類型與 Depth_Output 回傳 depth_batch_kernel 的 (to_planar, to_perspective)，不需轉換時為 None。
+    """
+    if not perspective and config.depth_output == 'planar':
+        return None, None
+    grid = ray_cosine_grid(shape[1], shape[0], config.fov)
+    return (grid if perspective else None), (grid if config.depth_output == 'perspective' else None)
+
+def flow_kernel(depth_stack, transforms, config, telemetry=None):
+    """
+    由限制後的 DepthGT 堆疊與各影格的相對運動計算光流與場景流；DepthGT 為 DepthPerspective 時先以餘弦轉回平面深度。
+    """
+    with measure(telemetry, 'scene_flow', frames=len(depth_stack)):
+        if config.depth_output == 'perspective':
+            depth_stack = depth_stack * ray_cosine_grid(depth_stack.shape[2], depth_stack.shape[1], config.fov)
+        return flow_batch(depth_stack, transforms, config.fov, config.max_depth)
+
+def pyramid_kernel(depth_stack, disparity_stack, config, telemetry=None):
+    """在記憶體中的整批結果上產生 Pyramid_Scales 各倍率的 DepthGT 與 Disparity，回傳 {金字塔前綴: (N, h, w)}"""
+    with measure(telemetry, 'pyramid', frames=len(depth_stack)):
+        return pyramid_stacks(depth_stack, disparity_stack, config.pyramid_scales)
+
+def stats_recorder(frames, config, depth_stats, telemetry=None):
+    """
+    回傳 depth_batch_kernel 的 on_clamped：將整批限制後的平面深度統計記錄到 depth_stats；不記錄時回傳 None。
+    """
+    if depth_stats is None or not config.depth_stats_bins:
+        return None
+
+    def on_clamped(depth_stack):
+        with measure(telemetry, 'depth_stats', frames=len(frames)):
+            depth_stats.add_batch(frames, depth_stats_batch(depth_stack, config.max_depth, config.depth_stats_bins))
+    return on_clamped
+
+class BufferPool:
+    """
+    每種解析度各有固定數量的 (深度, 視差) 批次緩衝區，計算執行緒取用、寫入執行緒寫完整批後歸還。
+    沒有空閒緩衝區時計算會等待寫入，記憶體用量因此固定；解析度交替出現時沿用各自的緩衝區，不會重新配置。
+    """
+    def __init__(self, batch_size, count=3):
+        self.batch_size = batch_size
+        self.count = count
+        self._lock = threading.Lock()
+        self._free = {}
+
+    def _queue(self, shape):
+        with self._lock:
+            if shape not in self._free:
+                free = queue.Queue()
+                for _ in range(self.count):
+                    free.put((np.empty((self.batch_size,) + shape, dtype=np.float32),
+                              np.empty((self.batch_size,) + shape, dtype=np.float32)))
+                self._free[shape] = free
+            return self._free[shape]
+
+    def acquire(self, shape):
+        return self._queue(shape).get()
+
+    def release(self, buffers):
+        self._queue(buffers[0].shape[1:]).put(buffers)
+
+class BatchToken:
+    """記錄一批影格中尚未寫完的數量，全部寫完時歸還緩衝區"""
+    def __init__(self, pool, buffers, size):
+        self.pool = pool
+        self.buffers = buffers
+        self.remaining = size
+        self._lock = threading.Lock()
+
+    def done(self):
+        with self._lock:
+            self.remaining -= 1
+            finished = self.remaining == 0
+        if finished:
+            self.pool.release(self.buffers)
+
+class FrameConfig:
+    """
+    影格轉換所需的參數，會傳遞到子行程，因此只保存可序列化的基本型別。
+    """
+    def __init__(self, output_folder, focal_length, baseline, max_depth, stage_mode='link',
+                 queue_size=8, io_threads=2, map_format='pfm', batch_size=8, fov=90.0,
+                 depth_type='auto', depth_output='planar', point_cloud='none', right_disparity=False,
+                 depth_stats_bins=0, pyramid_scales=(), scene_flow=False):
+        self.output_folder = output_folder
+        self.focal_length = focal_length
+        self.baseline = baseline
+        self.max_depth = max_depth
+        self.stage_mode = stage_mode
+        self.queue_size = queue_size
+        self.io_threads = io_threads
+        self.map_format = map_format
+        self.batch_size = batch_size
+        self.fov = fov
+        self.depth_type = depth_type
+        self.depth_output = depth_output
+        self.point_cloud = point_cloud
+        self.right_disparity = right_disparity
+        self.depth_stats_bins = depth_stats_bins
+        self.pyramid_scales = tuple(pyramid_scales)
+        self.scene_flow = scene_flow
+
+    @classmethod
+    def from_settings(cls, settings, output_folder, stage_mode='link'):
+        focal_length, baseline_meters, max_depth = get_camera_params(settings)
+        queue_size = settings.get('Pipeline_Queue_Size', 8)
+        io_threads = settings.get('Pipeline_IO_Threads', 2)
+        batch_size = settings.get('Batch_Size', 8)
+        depth_type, depth_output = get_depth_types(settings)
+        return cls(output_folder, focal_length, baseline_meters, max_depth, stage_mode,
+                   queue_size if isinstance(queue_size, int) and queue_size > 0 else 8,
+                   io_threads if isinstance(io_threads, int) and io_threads > 0 else 2,
+                   get_map_format(settings),
+                   batch_size if isinstance(batch_size, int) and batch_size > 0 else 8,
+                   settings.get('FOV_degrees', 90), depth_type, depth_output, get_point_cloud_format(settings),
+                   bool(settings.get('Right_Disparity', False)), get_depth_stats_bins(settings),
+                   get_pyramid_scales(settings), bool(settings.get('Scene_Flow', False)))
+
+def write_output(file_path, data, writer=write_pfm):
+    """
+    先寫入暫存檔再取代目標檔案：中斷時不會留下寫到一半的輸出，
+    也不會寫穿到與 Results 共用同一份資料的硬連結。
+    """
+    tmp_path = file_path + '.tmp'
+    writer(tmp_path, data)
+    os.replace(tmp_path, file_path)
+
+def read_frame(paths, telemetry=None):
+    """
+    讀取階段：將原始深度圖完整讀入記憶體（沒有深度圖時回傳 None）。
+    深度圖必須是單通道（Pf）的 (H, W) 陣列，否則拋出例外，由呼叫端記錄為此影格的錯誤。
+    """
+    if 'depth' not in paths:
+        return None
+    with measure(telemetry, 'depth_read', frames=1, bytes_read=os.path.getsize(paths['depth'])):
+        depth = read_pfm(paths['depth'], mmap=False)
+    if depth.ndim != 2:
+        raise Exception(f'深度圖必須是單通道的 PFM，實際形狀為 {depth.shape}：{os.path.basename(paths["depth"])}')
+    return depth
+
+def compute_frame(depth, config, telemetry=None, perspective=False, frame=None, depth_stats=None, flow_transform=None):
+    """
+    計算階段：回傳 {輸出前綴: 陣列}。
+    原始深度圖只讀取一次，同時產生限制後的 DepthGT 與 Disparity（Right_Disparity 開啟時另有 DisparityR 與 Occlusion，
+    Pyramid_Scales 有設定時另有各倍率的縮小結果，Scene_Flow 開啟且有 flow_transform 時另有 Flow 與 SceneFlow）；
+    傳入 depth_stats 時一併記錄此影格的深度統計。
+    """
+    if depth is None:
+        return {}
+    depth_out = np.empty((1,) + depth.shape, dtype=np.float32)
+    disparity_out = np.empty_like(depth_out)
+    to_planar, to_perspective = conversion_grids(depth.shape, perspective, config)
+    depth_batch_kernel(depth[np.newaxis], config.focal_length, config.baseline, config.max_depth,
+                       depth_out, disparity_out, telemetry, to_planar, to_perspective,
+                       stats_recorder([frame], config, depth_stats, telemetry))
+    maps = {'DepthGT': depth_out[0], 'Disparity': disparity_out[0]}
+    if config.right_disparity:
+        disparity_right, occlusion = right_view_kernel(disparity_out, telemetry)
+        maps.update(DisparityR=disparity_right[0], Occlusion=occlusion[0])
+    if config.scene_flow and flow_transform is not None:
+        flow, scene_flow = flow_kernel(depth_out, [flow_transform], config, telemetry)
+        maps.update(Flow=flow[0], SceneFlow=scene_flow[0])
+    if config.pyramid_scales:
+        for prefix, stack in pyramid_kernel(depth_out, disparity_out, config, telemetry).items():
+            maps[prefix] = stack[0]
+    return maps
+
+def split_batch(items):
+    """
+    將一批 [(影格, 路徑, 深度)] 依解析度分組（保持各組第一次出現的順序），沒有深度圖的影格自成一組。
+    每組交給 compute_batch 時只取用一個緩衝區：同一次呼叫取用多個緩衝區時，組數多於緩衝區數量就會永遠等待。
+    """
+    groups = {}
+    for item in items:
+        groups.setdefault(None if item[2] is None else item[2].shape, []).append(item)
+    return list(groups.values())
+
+def compute_batch(items, config, pool, telemetry=None, depth_stats=None, flow_transforms=None):
+    """
+    批次計算：將一批 [(影格, 路徑, 深度)] 中有深度圖的影格放入同一個 (N, H, W) 緩衝區，
+    以 depth_batch_kernel 一次處理（傳入 depth_stats 時同時記錄整批的深度統計）。
+    有深度圖的影格必須是相同解析度（以 split_batch 分組），因此每次呼叫最多取用一個緩衝區；
+    DepthPerspective 的影格在複製到緩衝區時逐一乘上餘弦轉為平面深度，兩種深度類型可以混合。
+    flow_transforms 為 {影格: 相對運動}，有值的影格一起計算光流與場景流。
+    回傳 [(影格, 路徑, 結果, BatchToken 或 None)]；發生例外時歸還取用的緩衝區後再拋出。
+    """
+    results = [(frame, paths, {}, None) for frame, paths, depth in items if depth is None]
+    group = [item for item in items if item[2] is not None]
+    if not group:
+        return results
+    shape = group[0][2].shape
+    if any(depth.shape != shape for _, _, depth in group):
+        raise ValueError('compute_batch 的影格必須是相同解析度，請先以 split_batch 分組')
+
+    depth_buffer, disparity_buffer = pool.acquire(shape)
+    try:
+        n = len(group)
+        # 各影格複製到堆疊中（DepthPerspective 同時轉為平面深度），再對整批就地限制並做一次除法
+        to_planar, to_perspective = conversion_grids(shape, True, config)
+        for j, (_, frame_paths, frame_depth) in enumerate(group):
+            if is_perspective(frame_paths, config):
+                with measure(telemetry, 'depth_convert', frames=1):
+                    np.multiply(frame_depth, to_planar, out=depth_buffer[j])
+            else:
+                with measure(telemetry, 'depth_clamp'):
+                    np.copyto(depth_buffer[j], frame_depth)
+        depth_batch_kernel(depth_buffer[:n], config.focal_length, config.baseline, config.max_depth,
+                           depth_buffer[:n], disparity_buffer[:n], telemetry, None, to_perspective,
+                           stats_recorder([frame for frame, _, _ in group], config, depth_stats, telemetry))
+        if config.right_disparity:
+            disparity_right, occlusion = right_view_kernel(disparity_buffer[:n], telemetry)
+        # 縮小的結果為新配置的陣列，不佔用批次緩衝區
+        flows = {}
+        if config.scene_flow and flow_transforms:
+            indices = [j for j, (frame, _, _) in enumerate(group) if frame in flow_transforms]
+            if indices:
+                flow, scene_flow = flow_kernel(depth_buffer[indices],
+                                               [flow_transforms[group[j][0]] for j in indices], config, telemetry)
+                flows = {j: (flow[k], scene_flow[k]) for k, j in enumerate(indices)}
+        pyramid = {}
+        if config.pyramid_scales:
+            pyramid = pyramid_kernel(depth_buffer[:n], disparity_buffer[:n], config, telemetry)
+    except Exception:
+        # 結果不會交給寫入執行緒，緩衝區也不會有人歸還，因此在這裡歸還
+        pool.release((depth_buffer, disparity_buffer))
+        raise
+    token = BatchToken(pool, (depth_buffer, disparity_buffer), n)
+    for j, (frame, paths, _) in enumerate(group):
+        maps = {'DepthGT': depth_buffer[j], 'Disparity': disparity_buffer[j]}
+        if config.right_disparity:
+            maps.update(DisparityR=disparity_right[j], Occlusion=occlusion[j])
+        if j in flows:
+            maps.update(Flow=flows[j][0], SceneFlow=flows[j][1])
+        for prefix, stack in pyramid.items():
+            maps[prefix] = stack[j]
+        results.append((frame, paths, maps, token))
+    return results
+
+def write_point_cloud(frame, paths, depth, config, telemetry=None):
+    """
+    由限制後的 DepthGT 產生點雲並以 Point_Cloud 設定的格式寫出（Points_<影格>.ply/.npy），顏色取自 Img0。
+    回傳輸出檔名。
+    """
+    ext, writer = POINT_CLOUD_FORMATS[config.point_cloud]
+    new_name = f'Points_{frame}{ext}'
+    output_path = os.path.join(config.output_folder, new_name)
+    start = time.perf_counter()
+    perspective = config.depth_output == 'perspective'
+    planar = depth * ray_cosine_grid(depth.shape[1], depth.shape[0], config.fov) if perspective else depth
+    image = read_color_image(paths['left']) if 'left' in paths else None
+    points, colors = depth_to_points(depth, config.fov, config.max_depth, planar, image, perspective)
+    write_output(output_path, points, lambda path, data: writer(path, data, colors))
+    if telemetry is not None:
+        telemetry.add('point_cloud', time.perf_counter() - start, 1, 0, os.path.getsize(output_path))
+    return new_name
+
+def write_image_pyramid(frame, paths, config, telemetry=None):
+    """
+    將 Img0 / Img1 解碼一次後以 INTER_AREA 縮小到各倍率，寫入 Scale<倍率>/ 子資料夾，回傳輸出檔名清單。
+    """
+    outputs = []
+    for stream, prefix in PYRAMID_IMAGES:
+        if stream not in paths:
+            continue
+        start = time.perf_counter()
+        image = read_image(paths[stream])
+        written = 0
+        for scale in config.pyramid_scales:
+            new_name = f'{scaled_prefix(scale, prefix)}_{frame}.png'
+            output_path = os.path.join(config.output_folder, new_name)
+            write_output(output_path, resize_image(image, scale), write_image_png)
+            written += os.path.getsize(output_path)
+            outputs.append(new_name)
+        if telemetry is not None:
+            # 影格數已由 pyramid_kernel 計入
+            telemetry.add('pyramid', time.perf_counter() - start, 0, os.path.getsize(paths[stream]), written)
+    return outputs
+
+def write_frame(frame, paths, maps, config, stage_counts, telemetry=None):
+    """
+    寫入階段：放置影像並以設定的格式寫出計算結果，回傳此影格的輸出檔名清單。
+    硬連結/reflink 不會實際搬移資料，只有完整複製才計入讀寫的 bytes。
+    """
+    ext, writer = MAP_FORMATS[config.map_format]
+    outputs = []
+    for stream, prefix in IMAGE_OUTPUTS:
+        if stream in paths:
+            new_name = f'{prefix}_{frame}.png'
+            start = time.perf_counter()
+            method = materialize(paths[stream], os.path.join(config.output_folder, new_name), config.stage_mode)
+            if telemetry is not None:
+                copied = os.path.getsize(paths[stream]) if method in ('copy', 'copy_file_range') else 0
+                telemetry.add(f'copy_{stream}', time.perf_counter() - start, 1, copied, copied)
+            stage_counts[method] = stage_counts.get(method, 0) + 1
+            outputs.append(new_name)
+    if config.pyramid_scales:
+        outputs += write_image_pyramid(frame, paths, config, telemetry)
+    for prefix, data in maps.items():
+        map_ext, map_writer = FIXED_OUTPUTS.get(prefix, (ext, writer))
+        new_name = f'{prefix}_{frame}{map_ext}'
+        output_path = os.path.join(config.output_folder, new_name)
+        start = time.perf_counter()
+        write_output(output_path, data, map_writer)
+        if telemetry is not None:
+            telemetry.add('write_maps', time.perf_counter() - start, 1, 0, os.path.getsize(output_path))
+        outputs.append(new_name)
+    if config.point_cloud != 'none' and 'DepthGT' in maps:
+        outputs.append(write_point_cloud(frame, paths, maps['DepthGT'], config, telemetry))
+    return outputs
+
+def process_frame(frame, paths, config, stage_counts, telemetry=None, depth_stats=None, flow_transform=None):
+    """依序執行讀取、計算、寫入三個階段處理單一影格"""
+    maps = compute_frame(read_frame(paths, telemetry), config, telemetry, is_perspective(paths, config),
+                         frame, depth_stats, flow_transform)
+    return write_frame(frame, paths, maps, config, stage_counts, telemetry)
+
+def _error_source(paths):
+    return paths.get('depth') or next(iter(paths.values()), '')
+
+def run_frame_pipeline(tasks, config, result_callback=None, telemetry=None, should_stop=None, depth_stats=None,
+                       flow_transforms=None):
+    """
+    以有界佇列串接的生產者/消費者管線處理 [(影格編號, {串流: 路徑}), ...]：
+    讀取執行緒預先讀入原始檔、計算執行緒將已讀好的影格組成批次做深度限制與視差、寫入執行緒寫出結果，三者同時進行；
+    佇列長度與批次緩衝區數量固定，因此記憶體用量不隨影格數增加。
+    result_callback(frame, outputs) 在呼叫端的執行緒中依完成順序呼叫。
+    should_stop() 回傳 True 後尚未開始讀取的影格會被略過（不算錯誤），已讀取的影格仍會完整寫出。
+    depth_stats 為 DepthStats 時在計算階段記錄每個影格的深度統計（寫入失敗的影格也可能留有紀錄）。
+    flow_transforms 為 {影格: 相對運動}（Scene_Flow 開啟時使用）。
+    回傳 (結果清單 [(影格, 輸出檔名)], 錯誤清單 [(檔案, 錯誤訊息)], 各放置方法數量)。
+    """
+    read_queue = queue.Queue()
+    compute_queue = queue.Queue(maxsize=config.queue_size)
+    write_queue = queue.Queue(maxsize=config.queue_size)
+    done_queue = queue.Queue()
+
+    def reader():
+        while True:
+            item = read_queue.get()
+            if item is None:
+                break
+            frame, paths = item
+            if should_stop is not None and should_stop():
+                continue
+            try:
+                depth = read_frame(paths, telemetry)
+            except Exception as e:
+                done_queue.put((False, frame, (_error_source(paths), str(e))))
+                continue
+            compute_queue.put((frame, paths, depth))
+
+    pool = BufferPool(config.batch_size)
+
+    def computer():
+        finished = False
+        while not finished:
+            item = compute_queue.get()
+            if item is None:
+                break
+            # 取出目前已讀好的影格（最多 batch_size 個）組成一批，不等待尚未讀完的影格
+            batch = [item]
+            while len(batch) < config.batch_size:
+                try:
+                    item = compute_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+            # 每組解析度分別計算並交給寫入執行緒後才計算下一組，同時最多只持有一個尚未交出的緩衝區
+            for group in split_batch(batch):
+                try:
+                    computed = compute_batch(group, config, pool, telemetry, depth_stats, flow_transforms)
+                except Exception:
+                    # 整組失敗時逐一重新計算，只有出錯的影格記錄為錯誤
+                    computed = []
+                    for frame, paths, depth in group:
+                        try:
+                            computed += compute_batch([(frame, paths, depth)], config, pool, telemetry, depth_stats,
+                                                      flow_transforms)
+                        except Exception as e:
+                            done_queue.put((False, frame, (_error_source(paths), str(e))))
+                for frame, paths, maps, token in computed:
+                    write_queue.put((frame, paths, maps, token))
+
+    def writer():
+        local_counts = {}
+        while True:
+            item = write_queue.get()
+            if item is None:
+                break
+            frame, paths, maps, token = item
+            try:
+                outputs = write_frame(frame, paths, maps, config, local_counts, telemetry)
+                done_queue.put((True, frame, outputs))
+            except Exception as e:
+                done_queue.put((False, frame, (_error_source(paths), str(e))))
+            finally:
+                if token is not None:
+                    token.done()
+        done_queue.put(('counts', None, local_counts))
+
+    readers = [threading.Thread(target=reader, daemon=True) for _ in range(config.io_threads)]
+    writers = [threading.Thread(target=writer, daemon=True) for _ in range(config.io_threads)]
+    compute_thread = threading.Thread(target=computer, daemon=True)
+
+    def shutdown():
+        # 讀取執行緒全部結束後依序關閉後面的階段
+        for thread in readers:
+            thread.join()
+        compute_queue.put(None)
+        compute_thread.join()
+        for _ in writers:
+            write_queue.put(None)
+
+    for thread in readers + writers + [compute_thread, threading.Thread(target=shutdown, daemon=True)]:
+        thread.start()
+    for task in tasks:
+        read_queue.put(task)
+    for _ in readers:
+        read_queue.put(None)
+
+    results = []
+    errors = []
+    stage_counts = {}
+    finished_writers = 0
+    while finished_writers < len(writers):
+        kind, frame, payload = done_queue.get()
+        if kind == 'counts':
+            finished_writers += 1
+            for method, count in payload.items():
+                stage_counts[method] = stage_counts.get(method, 0) + count
+        elif kind:
+            results.append((frame, payload))
+            if result_callback:
+                result_callback(frame, payload)
+        else:
+            errors.append(payload)
+    return results, errors, stage_counts
+
+def process_frame_shard(tasks, config, flow_transforms=None):
+    """
+    在子行程中以管線處理一個分片，回傳 (結果清單, 錯誤清單, 各放置方法數量, 各階段統計, 各影格深度統計)。
+    錯誤以字串收集後回傳。
+    """
+    telemetry = Telemetry()
+    depth_stats = DepthStats(config.depth_stats_bins, config.max_depth) if config.depth_stats_bins else None
+    results, errors, stage_counts = run_frame_pipeline(tasks, config, telemetry=telemetry, depth_stats=depth_stats,
+                                                       flow_transforms=flow_transforms)
+    return results, errors, stage_counts, telemetry.to_dict(), depth_stats.to_dict() if depth_stats else {}
+
+def split_shards(tasks, worker_num):
+    """
+    將任務切成連續的分片，分片數為工作行程數的數倍以平衡負載。
+    """
+    if not tasks:
+        return []
+    shard_count = min(len(tasks), worker_num * 4)
+    shard_size = -(-len(tasks) // shard_count)
+    return [tasks[i:i + shard_size] for i in range(0, len(tasks), shard_size)]
+
+def run_frame_conversion(tasks, config, worker_num=1, progress_callback=None, shard_callback=None, telemetry=None,
+                         should_stop=None, depth_stats=None, flow_transforms=None):
+    """
+    處理 [(影格編號, {串流: 路徑}), ...]。worker_num > 1 時以 ProcessPoolExecutor 分片平行處理，
+    每個子行程內部再以管線重疊讀取、計算與寫入；否則在目前行程內直接執行管線。
+    shard_callback 會收到每批完成的 [(影格, 輸出檔名), ...]；telemetry 會累計各階段（含子行程）的統計。
+    should_stop() 回傳 True 後不再開始新的影格：行程內略過尚未讀取的影格，行程池取消尚未開始的分片
+    （已在子行程中執行的分片會完成）。被略過的影格不計入成功或錯誤。
+    depth_stats 會累計各影格（含子行程）的深度統計；flow_transforms 只將分片內影格的相對運動傳給子行程。
+    回傳 (成功數量, 錯誤清單, 各放置方法數量)。
+    """
+    total = len(tasks)
+    converted = 0
+    errors = []
+    stage_counts = {}
+    done = 0
+
+    def collect(results, shard_errors, shard_counts, shard_size):
+        nonlocal converted, done
+        converted += len(results)
+        errors.extend(shard_errors)
+        for method, count in shard_counts.items():
+            stage_counts[method] = stage_counts.get(method, 0) + count
+        done += shard_size
+        if shard_callback and results:
+            shard_callback(results)
+        if progress_callback and shard_size:
+            progress_callback(done, total)
+
+    if worker_num <= 1 or total <= 1:
+        def frame_done(frame, outputs):
+            collect([(frame, outputs)], [], {}, 1)
+        _, pipeline_errors, pipeline_counts = run_frame_pipeline(tasks, config, frame_done, telemetry, should_stop,
+                                                                 depth_stats, flow_transforms)
+        collect([], pipeline_errors, pipeline_counts, len(pipeline_errors))
+    else:
+        shards = split_shards(tasks, worker_num)
+        with ProcessPoolExecutor(max_workers=min(worker_num, len(shards))) as executor:
+            futures = {}
+            for shard in shards:
+                shard_transforms = None
+                if flow_transforms:
+                    shard_transforms = {frame: flow_transforms[frame] for frame, _ in shard if frame in flow_transforms}
+                futures[executor.submit(process_frame_shard, shard, config, shard_transforms)] = shard
+            for future in as_completed(futures):
+                if should_stop is not None and should_stop():
+                    for pending in futures:
+                        pending.cancel()
+                if future.cancelled():
+                    continue
+                shard = futures[future]
+                try:
+                    results, shard_errors, shard_counts, shard_stats, shard_depth_stats = future.result()
+                    if telemetry is not None:
+                        telemetry.merge(shard_stats)
+                    if depth_stats is not None:
+                        depth_stats.merge(shard_depth_stats)
+                except Exception as e:
+                    # 整個分片失敗（例如子行程異常結束），將分片內每個影格都記錄為錯誤
+                    results, shard_counts = [], {}
+                    shard_errors = [(_error_source(paths), str(e)) for _, paths in shard]
+                collect(results, shard_errors, shard_counts, len(shard))
+
+    # 依原始影格順序排列錯誤，讓輸出與分片完成順序無關
+    order = {_error_source(paths): i for i, (_, paths) in enumerate(tasks)}
+    errors.sort(key=lambda error: order.get(error[0], total))
+    return converted, errors, stage_counts
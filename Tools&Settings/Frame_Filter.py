@@ -0,0 +1,147 @@
+import os
+import cv2
+import numpy as np
+from PFM_Codec import read_pfm
+from Airsim_Record import frame_key
+
+# 比較用的縮圖寬度（像素），深度圖以等間隔取樣到約此寬度
+SIGNATURE_WIDTH = 32
+
+# 抽樣模式：none = 全部，stride = 每 k 張取一張，fps = 目標頻率，motion = 相機移動/旋轉超過門檻才保留
+SUBSAMPLE_MODES = ('none', 'stride', 'fps', 'motion')
+
+def get_subsample_mode(settings):
+    """讀取 Subsample_Mode 設定，預設為 none"""
+    mode = str(settings.get('Subsample_Mode', 'none')).lower()
+    return mode if mode in SUBSAMPLE_MODES else 'none'
+
+def frame_records(frames, rec_rows):
+    """
+    以檔名對應每個影格在 airsim_rec.txt 中的紀錄，回傳 {影格編號: 紀錄}；找不到的影格不列入。
+    """
+    by_name = {}
+    for row in rec_rows:
+        for name in row['streams'].values():
+            by_name[name] = row
+    records = {}
+    for frame, paths in frames:
+        for stream in ('depth', 'left', 'right', 'seg'):
+            row = by_name.get(os.path.basename(paths[stream])) if stream in paths else None
+            if row is not None:
+                records[frame] = row
+                break
+    return records
+
+def filename_seconds(paths):
+    """
+    沒有錄製檔時由檔名尾端的時間戳記推算秒數：AirSim 檔名為奈秒，錄製檔欄位為毫秒。
+    """
+    key = frame_key(os.path.basename(next(iter(paths.values()))))
+    if key >= 10 ** 17:
+        return key / 1e9
+    if key >= 10 ** 14:
+        return key / 1e6
+    return key / 1e3
+
+def rotation_degrees(q1, q2):
+    """兩個四元數 (w, x, y, z) 之間的旋轉角度（度）"""
+    dot = abs(float(np.dot(q1, q2)) / (np.linalg.norm(q1) * np.linalg.norm(q2)))
+    return float(np.degrees(2 * np.arccos(min(1.0, dot))))
+
+def subsample_frames(frames, mode, stride=1, target_fps=0.0, min_translation=0.0, min_rotation=0.0, rec_rows=None):
+    """
+    依抽樣模式挑選影格，frames 為依順序排列的 [(影格編號, {串流: 路徑})]。
+    fps 模式優先使用錄製檔的 TimeStamp，沒有時使用檔名時間戳記；motion 模式需要錄製檔的位姿，
+    找不到位姿的影格一律保留。回傳 (保留的 [(影格, 路徑)], 沒有位姿的影格數)。
+    """
+    if mode == 'stride':
+        return frames[::max(1, int(stride))], 0
+
+    records = frame_records(frames, rec_rows or [])
+    kept = []
+    missing = 0
+    last = None
+    for frame, paths in frames:
+        row = records.get(frame)
+        if mode == 'fps' and target_fps > 0:
+            seconds = row['timestamp'] / 1e3 if row is not None else filename_seconds(paths)
+            # 允許半毫秒誤差，避免錄製間隔的捨入造成多跳一張
+            if last is None or seconds - last >= 1.0 / target_fps - 0.0005:
+                kept.append((frame, paths))
+                last = seconds
+        elif mode == 'motion':
+            if row is None:
+                missing += 1
+                kept.append((frame, paths))
+                continue
+            position = np.array(row['position'])
+            orientation = np.array(row['orientation'])
+            if (last is None or np.linalg.norm(position - last[0]) >= min_translation
+                    or rotation_degrees(orientation, last[1]) >= min_rotation):
+                kept.append((frame, paths))
+                last = (position, orientation)
+        else:
+            kept.append((frame, paths))
+    return kept, missing
+
+def frame_signature(paths, max_depth=100.0):
+    """
+    讀取影格的縮小特徵：左影像以 IMREAD_REDUCED_GRAYSCALE_8 直接解碼為 1/8 灰階，
+    深度圖以記憶體映射只取等間隔的像素。回傳 (灰階縮圖, 深度縮圖)，缺少的串流為 None。
+    """
+    gray = None
+    if 'left' in paths:
+        image = cv2.imread(paths['left'], cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if image is not None:
+            height = max(1, round(image.shape[0] * SIGNATURE_WIDTH / image.shape[1]))
+            gray = cv2.resize(image, (SIGNATURE_WIDTH, height), interpolation=cv2.INTER_AREA).astype(np.float32)
+    depth = None
+    if 'depth' in paths:
+        data = read_pfm(paths['depth'])
+        step = max(1, data.shape[1] // SIGNATURE_WIDTH)
+        depth = np.clip(np.array(data[::step, ::step], dtype=np.float32), 1e-6, max_depth)
+    return gray, depth
+
+def is_duplicate(signature, reference, image_threshold, depth_threshold):
+    """
+    與參考影格比較：灰階縮圖的平均絕對差 <= image_threshold（0~255），
+    且深度縮圖的平均相對差 <= depth_threshold 時視為重複。無法比較的串流不列入判斷。
+    """
+    gray, depth = signature
+    ref_gray, ref_depth = reference
+    compared = False
+    if gray is not None and ref_gray is not None and gray.shape == ref_gray.shape:
+        if float(np.mean(np.abs(gray - ref_gray))) > image_threshold:
+            return False
+        compared = True
+    if depth is not None and ref_depth is not None and depth.shape == ref_depth.shape:
+        if float(np.mean(np.abs(depth - ref_depth) / ref_depth)) > depth_threshold:
+            return False
+        compared = True
+    return compared
+
+def dedupe_frames(frames, image_threshold=2.0, depth_threshold=0.01, max_depth=100.0):
+    """
+    依影格順序移除與「上一個保留影格」幾乎相同的影格（車輛靜止時 AirSim 會持續錄下相同畫面）。
+    frames 為依順序排列的 [(影格編號, {串流: 路徑})]，回傳 (保留的 [(原編號, 路徑)], 移除數量)。
+    """
+    kept = []
+    dropped = 0
+    reference = None
+    for frame, paths in frames:
+        try:
+            signature = frame_signature(paths, max_depth)
+        except Exception:
+            # 無法讀取的影格交給後續轉換步驟回報錯誤
+            kept.append((frame, paths))
+            continue
+        if reference is not None and is_duplicate(signature, reference, image_threshold, depth_threshold):
+            dropped += 1
+            continue
+        kept.append((frame, paths))
+        reference = signature
+    return kept, dropped
+
+def renumber_frames(kept, start_idx):
+    """將保留的影格從 start_idx 起連續重新編號，回傳 {新編號: 路徑}"""
+    return {start_idx + i: paths for i, (_, paths) in enumerate(kept)}
@@ -0,0 +1,128 @@
+import os
+from Airsim_Record import STREAMS, classify_stream, frame_key, rec_file_for, read_rec_table
+
+# 資料夾絕對路徑 -> (資料夾 mtime, 錄製檔 mtime, FrameIndex)；新增或刪除檔案會改變資料夾 mtime，使快取失效
+_index_cache = {}
+
+class FrameIndex:
+    """
+    一次 os.scandir 建立的影格索引。
+    有 airsim_rec.txt 時，以錄製檔的每一行（同一時間點的 left / right / seg / depth 檔名）
+    與資料夾中的檔名做雜湊比對組成影格；串流掉格只會影響該行，不會讓之後的影格錯位。
+    沒有錄製檔時退回舊的方式：各串流依檔名尾端數字排序後，以相同位置配對為同一影格。
+    """
+    def __init__(self, folder, streams, rec_rows=None):
+        self.folder = folder
+        # {串流: [(數字, 檔名), ...]}，需要依位置配對時才排序
+        self.streams = streams
+        self.rec_rows = rec_rows
+        self._sorted = set()
+        self._aligned = None
+        self.incomplete = []
+        self.unreferenced = 0
+
+    def count(self, stream):
+        return len(self.streams.get(stream, []))
+
+    @property
+    def max_count(self):
+        return max((self.count(stream) for stream in STREAMS), default=0)
+
+    @property
+    def image_count(self):
+        return self.count('left') + self.count('right') + self.count('seg')
+
+    @property
+    def frame_count(self):
+        """可處理的影格數：有錄製檔時為完整的行數，否則為最多檔案的串流數量"""
+        if self.rec_rows is not None:
+            return len(self.aligned())
+        return self.max_count
+
+    def sorted_items(self, stream):
+        items = self.streams.get(stream, [])
+        if stream not in self._sorted:
+            items.sort()
+            self._sorted.add(stream)
+        return items
+
+    def files(self, stream):
+        """串流中排序後的檔名清單"""
+        return [name for _, name in self.sorted_items(stream)]
+
+    def aligned(self):
+        """
+        以錄製檔對齊的影格清單 [{串流: 檔名}]，依錄製順序排列。
+        資料夾中有檔案的串流都必須出現在該行且檔案存在，否則該行列入 incomplete：[(TimeStamp, [缺少的串流])]。
+        """
+        if self._aligned is None:
+            on_disk = {stream: {name for _, name in items} for stream, items in self.streams.items() if items}
+            aligned = []
+            incomplete = []
+            referenced = 0
+            for row in self.rec_rows or []:
+                names = {}
+                missing = []
+                for stream, files in on_disk.items():
+                    name = row['streams'].get(stream)
+                    if name is not None and name in files:
+                        names[stream] = name
+                    else:
+                        missing.append(stream)
+                referenced += len(names)
+                if missing:
+                    incomplete.append((row['timestamp'], missing))
+                elif names:
+                    aligned.append(names)
+            self._aligned = aligned
+            self.incomplete = incomplete
+            self.unreferenced = sum(len(files) for files in on_disk.values()) - referenced
+        return self._aligned
+
+    def frame_paths(self, start_idx, end_idx):
+        """
+        回傳 {影格編號: {串流: 完整路徑}}，影格編號沿用 start_idx 起算的命名規則。
+        """
+        frames = {}
+        if self.rec_rows is not None:
+            for i, names in enumerate(self.aligned()[start_idx - 1:end_idx]):
+                frames[start_idx + i] = {stream: os.path.join(self.folder, name) for stream, name in names.items()}
+            return frames
+        for stream in STREAMS:
+            for i, (_, name) in enumerate(self.sorted_items(stream)[start_idx - 1:end_idx]):
+                frames.setdefault(start_idx + i, {})[stream] = os.path.join(self.folder, name)
+        return frames
+
+def scan_folder(folder, rec_path=None):
+    """
+    以單次 os.scandir 建立 FrameIndex（不使用快取）；rec_path 存在時一併讀取錄製檔。
+    """
+    streams = {stream: [] for stream in STREAMS}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            stream = classify_stream(entry.name)
+            if stream is None:
+                continue
+            try:
+                key = frame_key(entry.name)
+            except ValueError:
+                continue
+            streams[stream].append((key, entry.name))
+    # 只有標題列的錄製檔視為沒有錄製檔
+    rec_rows = (read_rec_table(rec_path) or None) if rec_path and os.path.exists(rec_path) else None
+    return FrameIndex(folder, streams, rec_rows)
+
+def get_frame_index(folder):
+    """
+    取得資料夾的 FrameIndex，資料夾與錄製檔都未改變時直接重用上次的掃描結果。
+    """
+    abs_folder = os.path.abspath(folder)
+    mtime = os.stat(abs_folder).st_mtime_ns
+    rec_path = rec_file_for(abs_folder)
+    rec_mtime = os.stat(rec_path).st_mtime_ns if os.path.exists(rec_path) else None
+    cached = _index_cache.get(abs_folder)
+    if cached is not None and cached[:2] == (mtime, rec_mtime):
+        return cached[2]
+    index = scan_folder(folder, rec_path)
+    _index_cache[abs_folder] = (mtime, rec_mtime, index)
+    return index
@@ -0,0 +1,78 @@
+import os
+import cv2
+import numpy as np
+
+# 多解析度金字塔輸出的串流（影像前綴）與計算結果前綴；Seg 與其他選用輸出不縮小
+PYRAMID_IMAGES = (('left', 'Img0'), ('right', 'Img1'))
+PYRAMID_MAPS = ('DepthGT', 'Disparity')
+
+def get_pyramid_scales(settings):
+    """
+    讀取 Pyramid_Scales 設定（縮小倍率，例如 "2,4"；none 或空白代表不輸出），回傳排序後的整數倍率 tuple。
+    命令列模式傳入的清單或單一整數也可以。
+    """
+    value = settings.get('Pyramid_Scales', 'none')
+    if isinstance(value, (list, tuple)):
+        items = value
+    elif isinstance(value, int):
+        items = [value]
+    else:
+        items = [item.strip() for item in str(value).split(',')]
+    scales = set()
+    for item in items:
+        try:
+            scale = int(item)
+        except (TypeError, ValueError):
+            continue
+        if scale > 1:
+            scales.add(scale)
+    return tuple(sorted(scales))
+
+def scale_folder(scale):
+    """倍率對應的子資料夾名稱（位於 ProcessData 與結果資料夾中）"""
+    return f'Scale{scale}'
+
+def scaled_prefix(scale, prefix):
+    """金字塔輸出的前綴，包含子資料夾：Scale2/DepthGT -> Scale2/DepthGT_<影格>.pfm"""
+    return f'{scale_folder(scale)}/{prefix}'
+
+def pool_stack(stack, scale, reduce):
+    """
+    將 (N, H, W) 堆疊以 scale x scale 區塊做 reduce（np.min / np.max），回傳 (N, H // scale, W // scale)。
+    無法整除的右側與下方像素捨去，與 resize_image 的裁切一致。
+    """
+    n, height, width = stack.shape
+    h, w = height // scale, width // scale
+    blocks = stack[:, :h * scale, :w * scale].reshape(n, h, scale, w, scale)
+    return reduce(blocks, axis=(2, 4))
+
+def pyramid_stacks(depth_stack, disparity_stack, scales):
+    """
+    由整批限制後的深度與視差產生各倍率的結果 {金字塔前綴: (N, h, w) 陣列}：
+    DepthGT 取區塊最小值（最近的表面，不會混合前景與背景產生不存在的深度），
+    Disparity 取區塊最大值（同一個最近的表面）再除以倍率，因為焦距隨解析度縮小。
+    """
+    stacks = {}
+    for scale in scales:
+        stacks[scaled_prefix(scale, 'DepthGT')] = pool_stack(depth_stack, scale, np.min)
+        disparity = pool_stack(disparity_stack, scale, np.max)
+        disparity /= np.float32(scale)
+        stacks[scaled_prefix(scale, 'Disparity')] = disparity
+    return stacks
+
+def resize_image(image, scale):
+    """以 INTER_AREA 將影像縮小 scale 倍（先裁切到可整除的大小，讓像素與深度金字塔對齊）"""
+    h, w = image.shape[0] // scale, image.shape[1] // scale
+    return cv2.resize(image[:h * scale, :w * scale], (w, h), interpolation=cv2.INTER_AREA)
+
+def read_image(path):
+    """讀取要縮小的影像（保留原本的通道數與位元深度），無法讀取時拋出例外"""
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise Exception(f'無法讀取影像：{os.path.basename(path)}')
+    return image
+
+def make_scale_folders(output_folder, scales):
+    """建立各倍率的子資料夾"""
+    for scale in scales:
+        os.makedirs(os.path.join(output_folder, scale_folder(scale)), exist_ok=True)
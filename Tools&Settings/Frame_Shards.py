@@ -0,0 +1,200 @@
+import os
+import json
+from Run_Manifest import FrameManifest
+from File_Stager import materialize
+from Depth_Stats import DEPTH_STATS_NAME, DepthStats
+
+SHARD_INFO_NAME = 'shard.json'
+
+# 合併到結果資料夾時排除的輸出（與 copy_to_results 相同，不包含 Seg）
+MERGE_EXCLUDE_PREFIXES = ('Seg_',)
+
+def parse_shard(text):
+    """
+    解析 "K/N"（第 K 個分片，共 N 個，K 從 1 開始），回傳 (K, N)。
+    """
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f'分片格式應為 K/N：{text}')
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f'分片編號超出範圍：{text}')
+    return index, count
+
+def shard_ranges(start_idx, end_idx, count):
+    """
+    將 start_idx ~ end_idx 切成 count 個連續且不重疊的範圍，各範圍影格數最多相差 1。
+    影格數少於分片數時，多出的分片為空範圍 (start, start - 1)。
+    """
+    total = end_idx - start_idx + 1
+    base, extra = divmod(total, count)
+    ranges = []
+    current = start_idx
+    for i in range(count):
+        size = base + (1 if i < extra else 0)
+        ranges.append((current, current + size - 1))
+        current += size
+    return ranges
+
+def shard_folder(output_folder, index, count):
+    """分片預設的輸出資料夾：ProcessData_shard01of04"""
+    width = len(str(count))
+    return f'{output_folder}_shard{index:0{width}d}of{count:0{width}d}'
+
+def recording_name(source):
+    """
+    錄製資料夾的名稱（AirSim 的 <時間>/images 取 <時間>）。各節點掛載錄製資料的路徑可能不同，
+    因此合併時以名稱而不是絕對路徑判斷分片是否來自同一個錄製。
+    """
+    folder = os.path.abspath(source)
+    if os.path.basename(folder).lower() == 'images':
+        folder = os.path.dirname(folder)
+    return os.path.basename(folder)
+
+def write_shard_info(folder, index, count, start_idx, end_idx, source, frame_count):
+    """
+    在分片資料夾中記錄分片編號、負責的影格範圍與錄製的名稱和影格數，供合併時檢查；
+    source 的絕對路徑只作為參考，不用於比較。
+    """
+    info = {'shard': index, 'shards': count, 'start': start_idx, 'end': end_idx,
+            'recording': recording_name(source), 'frames': frame_count, 'source': os.path.abspath(source)}
+    tmp_path = os.path.join(folder, SHARD_INFO_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2)
+    os.replace(tmp_path, os.path.join(folder, SHARD_INFO_NAME))
+
+def read_shard_info(folder):
+    """讀取分片資訊，沒有時回傳 None"""
+    path = os.path.join(folder, SHARD_INFO_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class ShardCheck:
+    """
+    多個分片資料夾的檢查結果。
+    frames: {影格編號: (資料夾, 輸出檔名清單)}；gaps: 缺少的影格；overlaps: {影格: [重複的資料夾]}；
+    problems: 其他不一致（缺少清單、分片數不一致、來源不同等）的說明文字。
+    """
+    def __init__(self):
+        self.frames = {}
+        self.gaps = []
+        self.overlaps = {}
+        self.problems = []
+        self.start = None
+        self.end = None
+
+    @property
+    def ok(self):
+        return not (self.gaps or self.overlaps or self.problems)
+
+def check_shards(folders):
+    """
+    檢查分片是否剛好涵蓋完整範圍：每個影格只出現在一個分片中，且範圍內沒有缺漏。
+    預期範圍取自各分片的 shard.json；沒有分片資訊時以實際出現的最小、最大影格為準。
+    """
+    check = ShardCheck()
+    infos = []
+    for folder in folders:
+        manifest = FrameManifest(folder)
+        if not manifest.exists():
+            check.problems.append(f'{folder}: 找不到影格清單 / manifest not found')
+            continue
+        info = read_shard_info(folder)
+        if info is not None:
+            infos.append(info)
+            outside = sorted(frame for frame in manifest.records if not info['start'] <= frame <= info['end'])
+            if outside:
+                check.problems.append(f'{folder}: 影格 {outside[0]}~{outside[-1]} 不在分片範圍 '
+                                      f'{info["start"]}~{info["end"]} 內 / frames outside the shard range')
+        for frame, record in manifest.records.items():
+            if not all(os.path.exists(os.path.join(folder, name)) for name in record['outputs']):
+                check.problems.append(f'{folder}: 影格 {frame} 的輸出檔不完整 / frame {frame} has missing outputs')
+                continue
+            if frame in check.frames:
+                check.overlaps.setdefault(frame, [check.frames[frame][0]]).append(folder)
+            else:
+                check.frames[frame] = (folder, record['outputs'])
+
+    if infos:
+        if len({info['shards'] for info in infos}) > 1:
+            check.problems.append('分片總數不一致 / shards disagree on the shard count')
+        if len({(info.get('recording'), info.get('frames')) for info in infos}) > 1:
+            check.problems.append('分片來自不同的錄製（名稱或影格數不同）/ shards come from different recordings')
+        indexes = [info['shard'] for info in infos]
+        missing = sorted(set(range(1, infos[0]['shards'] + 1)) - set(indexes))
+        if missing:
+            check.problems.append(f'缺少分片 / missing shards: {missing}')
+        check.start = min(info['start'] for info in infos)
+        check.end = max(info['end'] for info in infos)
+    elif check.frames:
+        check.start = min(check.frames)
+        check.end = max(check.frames)
+
+    if check.start is not None:
+        check.gaps = [frame for frame in range(check.start, check.end + 1) if frame not in check.frames]
+    return check
+
+def merge_depth_stats(check):
+    """
+    合併各分片 ProcessData 中的深度統計，每個影格取自 check 採用的分片；
+    沒有分片記錄統計時回傳 None，區間數或 MaxDepth 與第一個分片不同的分片略過。
+    """
+    merged = None
+    for folder in sorted({folder for folder, _ in check.frames.values()}):
+        path = os.path.join(folder, DEPTH_STATS_NAME)
+        if not os.path.exists(path):
+            continue
+        if merged is None:
+            stats = DepthStats.load(path)
+            if not stats.rows:
+                continue
+            merged = DepthStats(stats.bins, stats.max_depth)
+        else:
+            stats = DepthStats.load(path, merged.bins, merged.max_depth)
+        merged.merge({frame: row for frame, row in stats.rows.items()
+                      if frame in check.frames and check.frames[frame][0] == folder})
+    return merged
+
+def merge_shards(check, results_folder, stage_mode='link'):
+    """
+    將檢查通過的分片輸出放到結果資料夾：檔名已依 start_idx 規則編號，只需連結/複製，不改寫內容。
+    各分片的深度統計 sidecar 合併為結果資料夾中的一個 DepthStats.npz。
+    結果資料夾中不屬於任何分片的檔案會被刪除。回傳 (放置數量, 已是最新數量, 各放置方法數量)。
+    """
+    os.makedirs(results_folder, exist_ok=True)
+    sources = {}
+    for frame in sorted(check.frames):
+        folder, outputs = check.frames[frame]
+        for name in outputs:
+            if not name.startswith(MERGE_EXCLUDE_PREFIXES):
+                sources[name] = os.path.join(folder, name)
+
+    stats_path = os.path.join(results_folder, DEPTH_STATS_NAME)
+    merged_stats = merge_depth_stats(check)
+    for name in os.listdir(results_folder):
+        path = os.path.join(results_folder, name)
+        if name not in sources and os.path.isfile(path) and not (merged_stats and path == stats_path):
+            os.remove(path)
+    # 多解析度金字塔的輸出位於子資料夾（例如 Scale2/Img0_1.png），同樣只保留屬於分片的檔案
+    for folder in sorted({name.split('/', 1)[0] for name in sources if '/' in name}):
+        os.makedirs(os.path.join(results_folder, folder), exist_ok=True)
+        for name in os.listdir(os.path.join(results_folder, folder)):
+            if f'{folder}/{name}' not in sources:
+                os.remove(os.path.join(results_folder, folder, name))
+    if merged_stats:
+        merged_stats.save(stats_path)
+
+    staged = 0
+    up_to_date = 0
+    stage_counts = {}
+    for name, src in sources.items():
+        dst = os.path.join(results_folder, name)
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            up_to_date += 1
+            continue
+        method = materialize(src, dst, stage_mode)
+        stage_counts[method] = stage_counts.get(method, 0) + 1
+        staged += 1
+    return staged, up_to_date, stage_counts
@@ -3,7 +3,7 @@ import os
 import glob
 import re
 import numpy as np
-import imageio.v2 as iio
+from PFM_Codec import read_map, is_map_file, list_maps
 from PIL import Image, ImageDraw, ImageFont
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLineEdit, QLabel, QTextEdit, QMessageBox, QComboBox, QCheckBox, QFileDialog)
@@ -11,12 +11,13 @@ from PyQt5.QtCore import Qt
 from collections import defaultdict
 import cv2
 
-def read_pfm(file_path):
+def read_map_data(file_path):
     """
-    讀取 PFM 檔案並返回 numpy 陣列
+    讀取深度圖/視差圖（pfm / png16 / npy16 / npz 任一種 Output_Format）並返回 numpy 陣列
     """
     try:
-        data = iio.imread(file_path)
+        # npy16 為 float16，cv2.normalize 需要 float32
+        data = np.asarray(read_map(file_path), dtype=np.float32)
         
         if data.ndim > 2:
             return data[:, :, 0]
@@ -206,14 +207,12 @@ def create_gif(image_paths, output_path, fps, log_func, add_yolo=False, yolo_lab
         mot_labels_by_frame = read_mot_labels(mot_label_file, classes, log_func)
 
     for i, path in enumerate(image_paths):
-        if path.endswith('.pfm'):
-            pfm_data = read_pfm(path)
+        if is_map_file(path):
+            pfm_data = read_map_data(path)
             if pfm_data is not None and isinstance(pfm_data, np.ndarray):
                 try:
                     filename = os.path.basename(path)
                     
-                    pfm_data = np.flipud(pfm_data)
-                    
                     if filename.startswith('DepthGT'):
                         img_np_norm = cv2.normalize(pfm_data, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
                         img_np_color = cv2.applyColorMap(img_np_norm, cv2.COLORMAP_JET)
@@ -229,7 +228,7 @@ def create_gif(image_paths, output_path, fps, log_func, add_yolo=False, yolo_lab
                     log_func(f"normalize 失敗 {path}: {e}")
                     continue
             else:
-                log_func(f"警告：無法讀取 PFM 檔案 \'{os.path.basename(path)}\'，已跳過。")
+                log_func(f"警告：無法讀取深度圖/視差圖 \'{os.path.basename(path)}\'，已跳過。")
                 continue
         else:
             img = Image.open(path).convert('RGB')
@@ -611,14 +610,7 @@ class GIFMakerApp(QWidget):
         """
         根據選擇的類型和幀範圍取得圖片路徑
         """
-        if selected_type == 'Depth':
-            search_pattern = 'DepthGT*.pfm'
-        elif selected_type == 'Disparity':
-            search_pattern = 'Disparity*.pfm'
-        else:
-            search_pattern = f'{selected_type}*.png'
-        
-        image_paths = glob.glob(os.path.join(self.input_folder, search_pattern))
+        image_paths = self.find_paths(selected_type)
         
         if not image_paths:
             return []
@@ -645,6 +637,16 @@ class GIFMakerApp(QWidget):
         
         return image_paths
 
+    def find_paths(self, img_type):
+        """
+        依類型列出輸入資料夾中的檔案；Depth / Disparity 可為任一種 Output_Format 的 DepthGT_N / Disparity_N
+        """
+        if img_type == 'Depth':
+            return list_maps(self.input_folder, 'DepthGT')
+        if img_type == 'Disparity':
+            return list_maps(self.input_folder, 'Disparity')
+        return glob.glob(os.path.join(self.input_folder, f'{img_type}*.png'))
+
     def extract_frame_number(self, path):
         """
         從檔案路徑中提取幀號
@@ -656,13 +658,7 @@ class GIFMakerApp(QWidget):
     def set_default_range_for_type(self, img_type):
         if img_type == 'All':
             return self.set_default_range_for_all()
-        if img_type == 'Depth':
-            pattern = 'DepthGT*.pfm'
-        elif img_type == 'Disparity':
-            pattern = 'Disparity*.pfm'
-        else:
-            pattern = f'{img_type}*.png'
-        paths = glob.glob(os.path.join(self.input_folder, pattern))
+        paths = self.find_paths(img_type)
         if not paths:
             self.start_entry.setText("")
             self.end_entry.setText("")
@@ -687,13 +683,7 @@ class GIFMakerApp(QWidget):
         types = ['Disparity', 'Depth', 'Img0', 'Img1', 'Seg']
         nums = []
         for t in types:
-            if t == 'Depth':
-                pattern = 'DepthGT*.pfm'
-            elif t == 'Disparity':
-                pattern = 'Disparity*.pfm'
-            else:
-                pattern = f'{t}*.png'
-            paths = glob.glob(os.path.join(self.input_folder, pattern))
+            paths = self.find_paths(t)
             paths.sort(key=natsort_key)
             nums.extend([self.extract_frame_number(p) for p in paths])
         nums = [n for n in nums if n is not None]
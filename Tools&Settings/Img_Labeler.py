@@ -8,36 +8,7 @@ from PyQt5.QtCore import Qt, QSize, QRect, pyqtSignal, QRectF
 import numpy as np
 import cv2
 import re
-
-
-def read_pfm(file_path):
-    """
-    讀取 PFM 檔案，回傳 numpy array (height, width) 或 (height, width, 3)
-    """
-    with open(file_path, 'rb') as f:
-        header = f.readline().decode('utf-8').strip()
-        if header not in ('PF', 'Pf'):
-            raise Exception('不是有效的 PFM 檔案')
-        dims = f.readline().decode('utf-8').strip()
-        while dims.startswith('#'):
-            dims = f.readline().decode('utf-8').strip()
-        parts = re.findall(r'-?\d+', dims)
-        if len(parts) < 2:
-            raise Exception('PFM 無法解析寬高')
-        width, height = int(parts[0]), int(parts[1])
-        scale = float(f.readline().decode('utf-8').strip())
-        endian = '<' if scale < 0 else '>'
-        data = np.fromfile(f, endian + 'f4')
-        expected = width * height * (3 if header == 'PF' else 1)
-        if data.size != expected:
-            if data.size > expected:
-                data = data[:expected]
-            else:
-                raise Exception(f'PFM 資料長度不正確: got {data.size}, expected {expected}')
-        if header == 'PF':
-            return np.reshape(data, (height, width, 3))
-        else:
-            return np.reshape(data, (height, width))
+from PFM_Codec import read_map, find_map
 
 class LabelingMode:
     MANUAL = "人工標註"
@@ -617,7 +588,7 @@ class ImageLabeler(QWidget):
                 depth_num = int(depth_num_match.group(0)) if depth_num_match else frame_idx
 
                 seg_path = os.path.join(self.input_dir, f"Seg_{depth_num}.png")
-                depth_path = os.path.join(self.input_dir, f"DepthGT_{depth_num}.pfm")
+                depth_path = find_map(self.input_dir, f"DepthGT_{depth_num}")
 
                 seg_img = None
                 if os.path.exists(seg_path):
@@ -626,9 +597,9 @@ class ImageLabeler(QWidget):
                         seg_img = cv2.cvtColor(seg_bgr, cv2.COLOR_BGR2RGB)
 
                 depth = None
-                if os.path.exists(depth_path):
+                if depth_path:
                     try:
-                        depth = read_pfm(depth_path)
+                        depth = read_map(depth_path)
                         if depth.ndim == 3:
                             depth = depth[:, :, 0]
                     except Exception as e:
@@ -785,9 +756,9 @@ class ImageLabeler(QWidget):
                         labels_to_save_yolo.append(f"{cls_id} {x_center:.6f} {y_center:.6f} {bbox_w:.6f} {bbox_h:.6f}\n")
 
                     z = 0.0
-                    depth_path = os.path.join(self.input_dir, f"DepthGT_{frame_num}.pfm")
-                    if os.path.exists(depth_path):
-                        depth = read_pfm(depth_path)
+                    depth_path = find_map(self.input_dir, f"DepthGT_{frame_num}")
+                    if depth_path:
+                        depth = read_map(depth_path)
                         if depth.ndim == 3:
                             depth = depth[:, :, 0]
                         
@@ -3,28 +3,10 @@ import cv2
 import numpy as np
 import screeninfo
 import re
+from PFM_Codec import read_map, find_map
 def read_pfm_simple(file_path):
     try:
-        with open(file_path, 'rb') as f:
-            header = f.readline().decode('utf-8').strip()
-            dims = f.readline().decode('utf-8').strip()
-            parts = re.findall(r'-?\d+', dims)
-            if len(parts) < 2:
-                raise Exception('PFM 無法解析寬高')
-            width, height = int(parts[0]), int(parts[1])
-            scale = float(f.readline().decode('utf-8').strip())
-            endian = '<' if scale < 0 else '>'
-            data = np.fromfile(f, endian + 'f4')
-            expected = width * height * (3 if header == 'PF' else 1)
-            if data.size != expected:
-                if data.size > expected:
-                    data = data[:expected]
-                else:
-                    raise Exception(f'PFM 資料長度不正確: got {data.size}, expected {expected}')
-            if header == 'PF':
-                return np.reshape(data, (height, width, 3))
-            else:
-                return np.reshape(data, (height, width))
+        return read_map(file_path)
     except Exception as e:
         print(f"讀取 PFM 檔案 {file_path} 失敗: {e}")
         return None
@@ -208,13 +190,15 @@ def display_current_image():
         image_name_prefix = current_category.split(' ')[0] # 例如 'Depth' 或 'Disparity'
         
         if image_name_prefix == "Depth":
-            pfm_file_name = f"DepthGT_{base_name.split('_')[-1]}.pfm"
+            pfm_stem = f"DepthGT_{base_name.split('_')[-1]}"
         elif image_name_prefix == "Disparity":
-            pfm_file_name = f"Disparity_{base_name.split('_')[-1]}.pfm"
+            pfm_stem = f"Disparity_{base_name.split('_')[-1]}"
         else:
             return
 
-        pfm_path = os.path.join(image_folder, pfm_file_name)
+        # 深度圖/視差圖可能以 pfm、16-bit PNG、npy 或 npz 格式輸出
+        pfm_path = find_map(image_folder, pfm_stem) or os.path.join(image_folder, pfm_stem + '.pfm')
+        pfm_file_name = os.path.basename(pfm_path)
         if os.path.exists(pfm_path):
             try:
                 pfm_data = read_pfm_simple(pfm_path)
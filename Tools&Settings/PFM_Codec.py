@@ -0,0 +1,195 @@
+import os
+import re
+import cv2
+import numpy as np
+from Airsim_Record import depth_image_type
+
+# KITTI 16-bit PNG 的縮放倍率：儲存值 = round(數值 × 256)，0 代表無效像素
+PNG16_SCALE = 256.0
+# 16-bit PNG 可儲存的最大數值（約 255.99），超過的深度/視差會被截斷
+PNG16_MAX = 65535 / PNG16_SCALE
+
+def read_pfm_header(file_path):
+    """
+    解析 PFM 檔頭，回傳 (channels, width, height, scale, offset)。
+    scale 保留原始正負號（負數代表 little-endian），offset 為像素資料的起始位置。
+    """
+    with open(file_path, 'rb') as f:
+        header = f.readline().decode('utf-8').strip()
+        if header not in ('PF', 'Pf'):
+            raise Exception(f'不是有效的 PFM 檔案：{os.path.basename(file_path)}')
+
+        dims = f.readline().decode('utf-8').strip()
+        while dims.startswith('#'):
+            dims = f.readline().decode('utf-8').strip()
+        parts = re.findall(r'-?\d+', dims)
+        if len(parts) < 2:
+            raise Exception(f'PFM 無法解析寬高：{os.path.basename(file_path)}')
+        width, height = int(parts[0]), int(parts[1])
+
+        scale = float(f.readline().decode('utf-8').strip())
+        offset = f.tell()
+
+    channels = 3 if header == 'PF' else 1
+    return channels, width, height, scale, offset
+
+def read_pfm(file_path, mmap=True):
+    """
+    讀取 PFM 檔案，回傳 (height, width) 或 (height, width, 3) 的唯讀陣列。
+    mmap=True 時以 np.memmap 對應檔頭之後的資料，只有實際存取的像素才會從磁碟讀入；
+    big-endian 檔案會轉為原生位元組順序。需要可寫入的陣列時請使用 mmap=False。
+    """
+    channels, width, height, scale, offset = read_pfm_header(file_path)
+    dtype = np.dtype('<f4' if scale < 0 else '>f4')
+    shape = (height, width, channels) if channels == 3 else (height, width)
+    expected = width * height * channels
+
+    available = (os.path.getsize(file_path) - offset) // dtype.itemsize
+    if available < expected:
+        raise Exception(f'PFM 資料長度不正確：{os.path.basename(file_path)} '
+                        f'got {available}, expected {expected}')
+
+    if mmap and expected > 0:
+        data = np.memmap(file_path, dtype=dtype, mode='r', offset=offset, shape=shape)
+        if not dtype.isnative:
+            data = data.astype(dtype.newbyteorder('='))
+            data.flags.writeable = False
+        return data
+
+    data = np.fromfile(file_path, dtype=dtype, count=expected, offset=offset).reshape(shape)
+    if not dtype.isnative:
+        data = data.astype(dtype.newbyteorder('='))
+    return data
+
+def write_pfm(file_path, image, scale=-1.0):
+    """
+    將 NumPy 陣列儲存為 little-endian PFM 檔案。
+    輸入已是連續的 float32 陣列時直接串流寫出，不會額外複製。
+    """
+    image = np.ascontiguousarray(image, dtype='<f4')
+
+    with open(file_path, 'wb') as f:
+        header = 'Pf\n' if image.ndim == 2 else 'PF\n'
+        f.write(header.encode('ascii'))
+
+        height, width = image.shape[:2]
+        f.write(f'{width} {height}\n'.encode('ascii'))
+
+        f.write(f'{-abs(scale)}\n'.encode('ascii'))
+        image.tofile(f)
+
+def write_image_png(file_path, image):
+    """
+    將 uint8（或 uint16）的影像/遮罩儲存為 PNG，保留原本的通道數。
+    以 imencode 寫出，檔名不需要以 .png 結尾（方便先寫入暫存檔）。
+    """
+    ok, buffer = cv2.imencode('.png', image)
+    if not ok:
+        raise Exception(f'PNG 編碼失敗：{os.path.basename(file_path)}')
+    buffer.tofile(file_path)
+
+def write_png16(file_path, image, scale=PNG16_SCALE):
+    """
+    以 KITTI 格式儲存為 16-bit PNG：數值 × scale 後四捨五入為 uint16。
+    超過 65535 / scale 的數值會被截斷；四捨五入後為 0 的像素在讀取時視為無效。
+    """
+    data = np.rint(np.clip(np.asarray(image, dtype=np.float32) * scale, 0, 65535)).astype(np.uint16)
+    write_image_png(file_path, data)
+
+def read_png16(file_path, scale=PNG16_SCALE):
+    """讀取 KITTI 格式的 16-bit PNG，回傳 float32 陣列（無效像素為 0）"""
+    data = cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
+    if data is None or data.dtype != np.uint16:
+        raise Exception(f'不是有效的 16-bit PNG 檔案：{os.path.basename(file_path)}')
+    return data.astype(np.float32) / scale
+
+def write_mask_png(file_path, mask):
+    """將 0/255 的 uint8 遮罩儲存為 8-bit PNG"""
+    write_image_png(file_path, np.asarray(mask, dtype=np.uint8))
+
+def write_npy16(file_path, image):
+    """儲存為 float16 的 .npy 檔案（PFM 格式只支援 float32）"""
+    with open(file_path, 'wb') as f:
+        np.save(f, np.asarray(image, dtype=np.float16))
+
+def read_npy(file_path, mmap=True):
+    """讀取 .npy 檔案，mmap=True 時以唯讀的記憶體映射開啟"""
+    return np.load(file_path, mmap_mode='r' if mmap else None)
+
+def write_npz(file_path, image):
+    """以 zip 壓縮儲存 float32 陣列（無損），陣列名稱為 data"""
+    with open(file_path, 'wb') as f:
+        np.savez_compressed(f, data=np.asarray(image, dtype=np.float32))
+
+def read_npz(file_path):
+    """讀取 write_npz 儲存的壓縮陣列"""
+    with np.load(file_path) as archive:
+        return archive['data']
+
+# 深度圖/視差圖的輸出格式：名稱 -> (副檔名, 寫入函式)
+MAP_FORMATS = {
+    'pfm': ('.pfm', write_pfm),
+    'png16': ('.png', write_png16),
+    'npy16': ('.npy', write_npy16),
+    'npz': ('.npz', write_npz),
+}
+
+def get_map_format(settings):
+    """
+    讀取 Output_Format 設定（pfm / png16 / npy16 / npz），預設為 pfm。
+    """
+    name = str(settings.get('Output_Format', 'pfm')).lower()
+    return name if name in MAP_FORMATS else 'pfm'
+
+def read_map(file_path):
+    """依副檔名讀取任一種輸出格式的深度圖/視差圖"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.pfm':
+        return read_pfm(file_path)
+    if ext == '.png':
+        return read_png16(file_path)
+    if ext == '.npy':
+        return read_npy(file_path)
+    if ext == '.npz':
+        return read_npz(file_path)
+    raise Exception(f'不支援的深度圖格式：{os.path.basename(file_path)}')
+
+def find_map(folder, stem):
+    """
+    依 pfm、png16、npy16、npz 的順序尋找 {stem}{副檔名}，找不到時回傳 None。
+    """
+    for ext, _ in MAP_FORMATS.values():
+        path = os.path.join(folder, stem + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+def is_map_file(file_path):
+    """
+    是否為可用 read_map 讀取的深度圖/視差圖：副檔名為任一種輸出格式，且檔名為 Depth* / Disparity* 加上影格編號
+    （DepthGT_N、Disparity_N、DisparityR_N），或是 AirSim 錄製的原始深度圖（img_*_1_* / img_*_2_*）。
+    影像、點雲（Points_N.npy）與光流（Flow_N.npy、SceneFlow_N.npy）使用相同的副檔名，因此一律以檔名區分。
+    """
+    name = os.path.basename(file_path).lower()
+    if os.path.splitext(name)[1] not in [ext for ext, _ in MAP_FORMATS.values()]:
+        return False
+    if re.match(r'(depth|disparity)[a-z]*_\d+\.', name):
+        return True
+    return name.startswith('img_') and depth_image_type(name) is not None
+
+def list_maps(folder, prefix):
+    """
+    列出資料夾中 {prefix}_<影格> 的深度圖/視差圖（任一種輸出格式），回傳依影格排序的路徑清單；
+    同一個影格有多種格式時與 find_map 相同，依 pfm、png16、npy16、npz 的順序取第一個。
+    """
+    order = [ext for ext, _ in MAP_FORMATS.values()]
+    pattern = re.compile(re.escape(prefix) + r'_(\d+)(\.\w+)$')
+    found = {}
+    for name in os.listdir(folder):
+        match = pattern.match(name)
+        if match is None or match.group(2).lower() not in order:
+            continue
+        frame, rank = int(match.group(1)), order.index(match.group(2).lower())
+        if frame not in found or rank < found[frame][0]:
+            found[frame] = (rank, os.path.join(folder, name))
+    return [found[frame][1] for frame in sorted(found)]
@@ -4,6 +4,7 @@ import re
 import numpy as np
 import cv2
 from PIL import Image
+from PFM_Codec import read_pfm_header, read_map, is_map_file, list_maps
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QComboBox, QPushButton, QMessageBox, QFileDialog)
 from PyQt5.QtCore import Qt, QTimer
@@ -43,57 +44,17 @@ def load_settings():
     
     return settings
 
-def read_pfm(file_path):
+def read_map_file(file_path):
     """
-    Reads a PFM file and returns the data and scale factor.
+    Reads a depth/disparity map in any Output_Format (pfm / png16 / npy16 / npz) and returns the data and scale factor.
     """
     try:
-        with open(file_path, 'rb') as file:
-            header = file.readline().rstrip().decode('utf-8')
-            color = header == 'PF'
-            
-            temp_str = file.readline().rstrip().decode('utf-8')
-            dim_match = re.match(r'^(\d+)\s(\d+)\s*$', temp_str)
-            if not dim_match:
-                raise Exception(f'Malformed PFM header in file: {os.path.basename(file_path)}')
-            width, height = map(int, dim_match.groups())
-            
-            scale = float(file.readline().rstrip().decode('utf-8'))
-            endian = '<' if scale < 0 else '>'
-            scale = abs(scale)
-            
-            # 獲取文件當前位置（頭部結束位置）
-            header_end = file.tell()
-            # 獲取文件總大小
-            file.seek(0, 2)  # 移動到文件末尾
-            file_size = file.tell()
-            file.seek(header_end)  # 回到數據開始位置
-            
-            # 計算預期的數據大小
-            expected_size = width * height * (3 if color else 1)
-            available_size = (file_size - header_end) // 4  # 每個 float 是 4 字節
-            
-            data = np.fromfile(file, endian + 'f')
-            shape = (height, width, 3) if color else (height, width)
-            
-            if data.size != expected_size:
-                error_msg = (
-                    f'Inconsistent PFM data size in file: {os.path.basename(file_path)}\n'
-                    f'Header declares: {width}x{height} ({expected_size} pixels)\n'
-                    f'Actual data size: {data.size} pixels\n'
-                    f'File size suggests: {available_size} pixels available\n'
-                    f'Possible causes: file corrupted, incomplete, or header information incorrect.'
-                )
-                raise Exception(error_msg)
-            
-            data = np.reshape(data, shape)
-            return data, scale
+        scale = abs(read_pfm_header(file_path)[3]) if file_path.lower().endswith('.pfm') else 1.0
+        # 檢視器會就地修改數據（例如將 inf 替換為顯示範圍），因此讀取可寫入的 float32 副本
+        data = np.array(read_map(file_path), dtype=np.float32)
+        return data, scale
     except Exception as e:
-        # 重新拋出異常，但包含文件名信息
-        if 'Inconsistent PFM data size' in str(e) or 'Malformed PFM header' in str(e):
-            raise e
-        else:
-            raise Exception(f'Error reading PFM file {os.path.basename(file_path)}: {str(e)}')
+        raise Exception(f'Error reading map file {os.path.basename(file_path)}: {str(e)}')
 
 def read_png(file_path):
     """
@@ -458,10 +419,9 @@ class ImageViewerWidget(QWidget):
         except Exception as e:
             all_files = []
         
-        # 如果使用自訂資料夾，載入所有支援的圖片檔案（.pfm 和 .png）
+        # 如果使用自訂資料夾，載入所有 .png 影像與深度圖/視差圖（任一種 Output_Format，點雲與光流的 .npy 不列入）
         if is_custom_folder:
-            supported_exts = ['.pfm', '.png']
-            picked = [f for f in all_files if os.path.splitext(f)[1].lower() in supported_exts]
+            picked = [f for f in all_files if os.path.splitext(f)[1].lower() == '.png' or is_map_file(f)]
             self.image_files = [os.path.join(data_folder, f) for f in picked]
         else:
             # 使用原本的邏輯，根據圖片類型過濾
@@ -487,7 +447,11 @@ class ImageViewerWidget(QWidget):
             
             picked = []
             
-            strict_match = [f for f in candidates if os.path.splitext(f)[0].lower().startswith(prefix.lower())]
+            if t in ('depth', 'disparity'):
+                # 深度圖/視差圖可為任一種 Output_Format
+                strict_match = [os.path.basename(path) for path in list_maps(data_folder, prefix.rstrip('_'))]
+            else:
+                strict_match = [f for f in candidates if os.path.splitext(f)[0].lower().startswith(prefix.lower())]
             
             if not strict_match:
                 if t == 'depth':
@@ -534,8 +498,8 @@ class ImageViewerWidget(QWidget):
         file_ext = os.path.splitext(current_file)[1].lower()
         
         try:
-            if file_ext == '.pfm':
-                data, scale = read_pfm(current_file)
+            if is_map_file(current_file):
+                data, scale = read_map_file(current_file)
                 if data is None:
                     return
                 if data.ndim == 3:
@@ -557,7 +521,7 @@ class ImageViewerWidget(QWidget):
             # 設定顯示參數
             filename = os.path.basename(current_file)
             
-            if file_ext == '.pfm':
+            if is_map_file(current_file):
                 min_val, max_val = find_min_max_no_inf(data)
                 
                 if min_val is not None and max_val is not None:
@@ -688,8 +652,8 @@ class ImageViewerWidget(QWidget):
             # 保存圖片
             data_to_save = self.current_data.copy()
             
-            # 如果是 PFM 文件（深度圖或視差圖），需要進行歸一化處理
-            if self.image_files[self.current_index].lower().endswith('.pfm'):
+            # 如果是深度圖或視差圖（任一種輸出格式），需要進行歸一化處理
+            if is_map_file(self.image_files[self.current_index]):
                 # 處理無限值和 NaN
                 data_to_save = np.nan_to_num(data_to_save, nan=0, posinf=0, neginf=0)
                 
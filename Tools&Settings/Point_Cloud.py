@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+from Camera_Model import ray_grid
+
+def depth_to_points(depth, fov_degrees, max_depth, planar_depth=None, image=None, perspective=False):
+    """
+    將已限制範圍的深度圖轉為點雲，回傳 (points (N, 3) float32, colors (N, 3) uint8 RGB 或 None)。
+    depth 為 DepthGT（perspective=True 時為沿射線的距離）；planar_depth 為對應的平面深度，用來排除無效、
+    被限制在下限或 max_depth 的像素（planar_depth 為 None 時使用 depth）。image 為 Img0 的 BGR 影像，解析度不同時不上色。
+    """
+    height, width = depth.shape
+    planar_depth = depth if planar_depth is None else planar_depth
+    # 平面深度被限制在 max_depth 的像素經過透視轉換後可能有些微誤差，因此保留一點容許值
+    mask = np.isfinite(planar_depth) & (planar_depth > 1e-6) & (planar_depth < max_depth * (1 - 1e-5))
+    # 只取有效像素後做一次廣播乘法
+    points = ray_grid(width, height, fov_degrees, perspective)[mask] * depth[mask][:, np.newaxis]
+    colors = None
+    if image is not None and image.shape[:2] == depth.shape:
+        colors = np.ascontiguousarray(image[mask][:, 2::-1])
+    return points, colors
+
+def write_ply(file_path, points, colors=None):
+    """寫出 binary little-endian PLY（float x/y/z，有顏色時加上 uchar red/green/blue）"""
+    fields = [('x', '<f4'), ('y', '<f4'), ('z', '<f4')]
+    properties = ['property float x', 'property float y', 'property float z']
+    if colors is not None:
+        fields += [('red', 'u1'), ('green', 'u1'), ('blue', 'u1')]
+        properties += ['property uchar red', 'property uchar green', 'property uchar blue']
+    vertices = np.empty(len(points), dtype=fields)
+    vertices['x'], vertices['y'], vertices['z'] = points[:, 0], points[:, 1], points[:, 2]
+    if colors is not None:
+        vertices['red'], vertices['green'], vertices['blue'] = colors[:, 0], colors[:, 1], colors[:, 2]
+    header = '\n'.join(['ply', 'format binary_little_endian 1.0', f'element vertex {len(points)}']
+                       + properties + ['end_header']) + '\n'
+    with open(file_path, 'wb') as f:
+        f.write(header.encode('ascii'))
+        vertices.tofile(f)
+
+def write_points_npy(file_path, points, colors=None):
+    """寫出 (N, 3) 或加上 RGB（0-255）的 (N, 6) float32 NPY；以檔案物件寫入，避免 np.save 自動加上副檔名"""
+    data = points if colors is None else np.hstack([points, colors.astype(np.float32)])
+    with open(file_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(data, dtype=np.float32))
+
+def read_color_image(path):
+    """讀取上色用的 Img0（BGR），無法讀取時回傳 None"""
+    return cv2.imread(path, cv2.IMREAD_COLOR)
+
+# 點雲輸出格式：設定值 -> (副檔名, 寫入函式)
+POINT_CLOUD_FORMATS = {
+    'ply': ('.ply', write_ply),
+    'npy': ('.npy', write_points_npy),
+}
+
+def get_point_cloud_format(settings):
+    """讀取 Point_Cloud 設定：none（不輸出）/ ply / npy"""
+    value = str(settings.get('Point_Cloud', 'none')).lower()
+    return value if value in POINT_CLOUD_FORMATS else 'none'
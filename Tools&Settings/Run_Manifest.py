@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+
+MANIFEST_NAME = 'manifest.jsonl'
+
+def settings_hash(values):
+    """
+    對會影響輸出內容的參數計算雜湊值，任何一個參數改變都會讓對應影格重新處理。
+    """
+    text = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+def source_fingerprint(path, stat_result=None):
+    """
+    以 (路徑, 大小, 修改時間) 描述一個來源檔案。
+    """
+    st = stat_result if stat_result is not None else os.stat(path)
+    return {'path': os.path.abspath(path), 'size': st.st_size, 'mtime': st.st_mtime_ns}
+
+class FrameManifest:
+    """
+    ProcessData 的影格清單（JSON Lines）。
+    每處理完一個影格就附加一行紀錄並立即寫入磁碟，中斷後重新執行時可從最後完成的影格繼續；
+    同一影格有多行紀錄時以最後一行為準。
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.records = {}
+        self._file = None
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 中斷時可能留下不完整的最後一行，直接略過
+                        continue
+                    if record.get('removed'):
+                        self.records.pop(record['frame'], None)
+                    else:
+                        self.records[record['frame']] = record
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def is_current(self, frame, sources, config_hash):
+        """
+        影格的來源檔案、設定雜湊都與紀錄相同，且所有輸出檔仍存在時回傳 True。
+        """
+        record = self.records.get(frame)
+        if record is None or record['settings'] != config_hash or record['sources'] != sources:
+            return False
+        return all(os.path.exists(os.path.join(self.folder, name)) for name in record['outputs'])
+
+    def record(self, frame, sources, config_hash, outputs):
+        """附加一筆已完成影格的紀錄，並刪除上次紀錄中這次不再產生的輸出檔（例如更換輸出格式後的舊檔）"""
+        previous = self.records.get(frame)
+        if previous is not None:
+            for name in set(previous['outputs']) - set(outputs):
+                path = os.path.join(self.folder, name)
+                if os.path.exists(path):
+                    os.remove(path)
+        record = {'frame': frame, 'sources': sources, 'settings': config_hash, 'outputs': list(outputs)}
+        self.records[frame] = record
+        self._append(record)
+
+    def remove(self, frame):
+        """刪除影格的輸出檔與紀錄，回傳被刪除的檔案數量"""
+        record = self.records.pop(frame, None)
+        if record is None:
+            return 0
+        removed = 0
+        for name in record['outputs']:
+            path = os.path.join(self.folder, name)
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        self._append({'frame': frame, 'removed': True})
+        return removed
+
+    def _append(self, record):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """關閉檔案並將清單重寫為每個影格一行"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for frame in sorted(self.records):
+                f.write(json.dumps(self.records[frame]) + '\n')
+        os.replace(tmp_path, self.path)
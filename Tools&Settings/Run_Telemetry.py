@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+REPORT_NAME = 'DataGenerator_Report.json'
+
+# 各階段的顯示順序；未列出的階段依第一次記錄的順序排在後面
+STAGE_ORDER = ('scan', 'subsample', 'dedupe', 'depth_read', 'copy_left', 'copy_right', 'copy_seg',
+               'depth_convert', 'depth_clamp', 'depth_stats', 'disparity', 'right_view', 'scene_flow', 'pyramid',
+               'write_maps', 'point_cloud', 'results_copy', 'export')
+
+def peak_rss_bytes():
+    """
+    目前行程（以及已結束的子行程）的峰值記憶體用量（bytes），無法取得時回傳 0。
+    Unix 使用 resource.getrusage，Windows 以 ctypes 呼叫 GetProcessMemoryInfo。
+    """
+    try:
+        import resource
+        # Linux 的 ru_maxrss 單位為 KB，macOS 為 bytes
+        unit = 1 if sys.platform == 'darwin' else 1024
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+        return max(own, children)
+    except ImportError:
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    except (ImportError, AttributeError, OSError):
+        pass
+    return 0
+
+def format_bytes(value):
+    """將 bytes 格式化為 KB / MB / GB"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024 or unit == 'GB':
+            return f'{value:.0f}{unit}' if unit == 'B' else f'{value:.1f}{unit}'
+        value /= 1024.0
+
+class Telemetry:
+    """
+    各處理階段的統計：耗時、影格數、讀取與寫入的 bytes，以及峰值記憶體。
+    管線中的階段在多個執行緒中同時進行，seconds 為各執行緒實際花在該階段的時間總和。
+    可在多個執行緒中同時記錄；子行程以 to_dict() 回傳，再由主行程 merge()。
+    """
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}
+        self.peak_rss = 0
+        self.info = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds=0.0, frames=0, bytes_read=0, bytes_written=0):
+        with self._lock:
+            stats = self.stages.setdefault(stage, {'seconds': 0.0, 'frames': 0, 'bytes_read': 0, 'bytes_written': 0})
+            stats['seconds'] += seconds
+            stats['frames'] += frames
+            stats['bytes_read'] += bytes_read
+            stats['bytes_written'] += bytes_written
+
+    @contextmanager
+    def measure(self, stage, frames=0, bytes_read=0, bytes_written=0):
+        """以 with 區塊計時一個階段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, frames, bytes_read, bytes_written)
+
+    def merge(self, data):
+        """合併另一個 Telemetry.to_dict() 的結果（例如子行程回傳的統計）"""
+        for stage, stats in data.get('stages', {}).items():
+            self.add(stage, stats['seconds'], stats['frames'], stats['bytes_read'], stats['bytes_written'])
+        with self._lock:
+            self.peak_rss = max(self.peak_rss, data.get('peak_rss_bytes', 0))
+
+    def ordered_stages(self):
+        with self._lock:
+            stages = dict(self.stages)
+        names = [name for name in STAGE_ORDER if name in stages]
+        names += [name for name in stages if name not in STAGE_ORDER]
+        return [(name, stages[name]) for name in names]
+
+    def to_dict(self):
+        stages = {}
+        for name, stats in self.ordered_stages():
+            seconds = stats['seconds']
+            stages[name] = dict(stats, seconds=round(seconds, 4),
+                                fps=round(stats['frames'] / seconds, 2) if seconds > 0 else None)
+        with self._lock:
+            self.peak_rss = max(self.peak_rss, peak_rss_bytes())
+            peak = self.peak_rss
+        return {'wall_seconds': round(time.time() - self.started, 3), 'peak_rss_bytes': peak, 'stages': stages}
+
+    def summary_lines(self):
+        """每個階段一行的摘要文字，用於進度視窗與終端機"""
+        data = self.to_dict()
+        lines = []
+        for name, stats in data['stages'].items():
+            fps = f"{stats['fps']:.1f} fps" if stats['fps'] else '-'
+            lines.append(f"{name:<13} {stats['seconds']:>8.2f}s  {stats['frames']:>6}  {fps:>11}  "
+                         f"R {format_bytes(stats['bytes_read']):>8}  W {format_bytes(stats['bytes_written']):>8}")
+        lines.append(f"wall {data['wall_seconds']:.1f}s  peak RSS {format_bytes(data['peak_rss_bytes'])}")
+        return lines
+
+    def write_report(self, path, **extra):
+        """將統計、info 與額外資訊（來源、範圍、設定等）寫成 JSON 報告，回傳報告內容"""
+        report = dict(self.info)
+        report.update(extra)
+        report.update(self.to_dict())
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return report
+
+def report_path_for(results_folder):
+    """報告放在結果資料夾的上一層（與 Results/Info.txt 同一個資料夾）"""
+    folder = os.path.dirname(os.path.normpath(results_folder.replace('\\', '/'))) or '.'
+    return os.path.join(folder, REPORT_NAME)
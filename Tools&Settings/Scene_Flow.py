@@ -0,0 +1,109 @@
+import numpy as np
+from Camera_Model import focal_length_px, ray_grid
+from Frame_Filter import frame_records
+
+# 車體座標（AirSim NED：x 向前、y 向右、z 向下）轉為相機座標（x 向右、y 向下、z 向前）
+CAMERA_FROM_BODY = np.array([[0.0, 1.0, 0.0],
+                             [0.0, 0.0, 1.0],
+                             [1.0, 0.0, 0.0]])
+
+# 與 Airsim settings/settings.json 中 front_left 相機的 X, Y, Z（公尺）與 Pitch, Roll, Yaw（度）相同
+DEFAULT_CAMERA_OFFSET = (2.0, -0.1, -1.0)
+DEFAULT_CAMERA_ROTATION = (0.0, 0.0, 0.0)
+
+def parse_vector(value, default):
+    """將 "x,y,z" 字串（或命令列傳入的清單）解析為 3 個浮點數，格式不正確時使用 default"""
+    items = value if isinstance(value, (list, tuple)) else str(value).split(',')
+    try:
+        vector = tuple(float(item) for item in items)
+    except (TypeError, ValueError):
+        return default
+    return vector if len(vector) == 3 else default
+
+def euler_matrix(pitch, roll, yaw):
+    """AirSim 的 Pitch / Roll / Yaw（度）轉為旋轉矩陣（NED，依 yaw、pitch、roll 的順序旋轉）"""
+    p, r, y = np.deg2rad([pitch, roll, yaw])
+    rz = np.array([[np.cos(y), -np.sin(y), 0.0], [np.sin(y), np.cos(y), 0.0], [0.0, 0.0, 1.0]])
+    ry = np.array([[np.cos(p), 0.0, np.sin(p)], [0.0, 1.0, 0.0], [-np.sin(p), 0.0, np.cos(p)]])
+    rx = np.array([[1.0, 0.0, 0.0], [0.0, np.cos(r), -np.sin(r)], [0.0, np.sin(r), np.cos(r)]])
+    return rz @ ry @ rx
+
+def get_camera_extrinsic(settings):
+    """
+    讀取 Camera_Offset（相機在車體座標中的位置 X,Y,Z，公尺，NED：x 向前、y 向右、z 向下）與
+    Camera_Rotation（相機相對車體的 Pitch,Roll,Yaw，度），與 settings.json 中相機的設定相同。
+    回傳 (安裝旋轉 3x3, 安裝位置 (3,))：車體座標的點 = 旋轉 @ 相機（車體軸向）座標的點 + 位置。
+    """
+    offset = parse_vector(settings.get('Camera_Offset', DEFAULT_CAMERA_OFFSET), DEFAULT_CAMERA_OFFSET)
+    rotation = parse_vector(settings.get('Camera_Rotation', DEFAULT_CAMERA_ROTATION), DEFAULT_CAMERA_ROTATION)
+    return euler_matrix(*rotation), np.asarray(offset, dtype=np.float64)
+
+def quaternion_matrix(q):
+    """四元數 (w, x, y, z) 轉為旋轉矩陣（車體座標 -> 世界座標）"""
+    w, x, y, z = np.asarray(q, dtype=np.float64) / np.linalg.norm(q)
+    return np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+                     [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+                     [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)]])
+
+def relative_transform(row, next_row, extrinsic=None):
+    """
+    由 airsim_rec.txt 兩行的車輛位姿計算相機座標的相對運動 (R, t)：影格 t 相機座標的點 p
+    在影格 t+1 的相機座標為 R @ p + t。錄製檔只有車輛位姿，extrinsic 為 get_camera_extrinsic 的相機安裝
+    (旋轉, 位置)；相機不在車輛原點時，轉彎會讓相機額外平移（位置 × 偏航角），因此必須一起計算。
+    extrinsic 為 None 時視為相機位於車輛原點且座標軸一致。
+    """
+    mount, offset = extrinsic if extrinsic is not None else (np.eye(3), np.zeros(3))
+    r0 = quaternion_matrix(row['orientation'])
+    r1 = quaternion_matrix(next_row['orientation'])
+    p0 = np.asarray(row['position'], dtype=np.float64)
+    p1 = np.asarray(next_row['position'], dtype=np.float64)
+    # 車體座標的相對運動：影格 t 車體座標的點 b 在影格 t+1 為 body_rotation @ b + body_translation
+    body_rotation = r1.T @ r0
+    body_translation = r1.T @ (p0 - p1)
+    # 套上相機安裝：b = mount @ c + offset，c' = mount.T @ (b' - offset)
+    rotation = mount.T @ body_rotation @ mount
+    translation = mount.T @ (body_rotation @ offset + body_translation - offset)
+    return CAMERA_FROM_BODY @ rotation @ CAMERA_FROM_BODY.T, CAMERA_FROM_BODY @ translation
+
+def flow_transforms(frames, rec_rows, extrinsic=None):
+    """
+    frames 為依順序排列的 [(影格編號, {串流: 路徑})]，回傳 {影格: 3x4 相對運動 [R | t] 的 list}。
+    只有下一個編號的影格存在，且兩個影格都找得到錄製紀錄時才有值（最後一個影格沒有光流）。
+    以 list 回傳，可直接寫入影格清單的來源紀錄，位姿或相機安裝改變時影格會重新處理。
+    """
+    records = frame_records(frames, rec_rows)
+    transforms = {}
+    for frame, _ in frames:
+        if frame in records and frame + 1 in records:
+            rotation, translation = relative_transform(records[frame], records[frame + 1], extrinsic)
+            transforms[frame] = np.hstack([rotation, translation[:, np.newaxis]]).tolist()
+    return transforms
+
+def flow_batch(planar_stack, transforms, fov_degrees, max_depth):
+    """
+    以整批 (N, H, W) 平面深度與每個影格的相對運動 (N, 3, 4) 計算靜態場景的光流與場景流：
+    每個像素由快取的射線方向乘上深度得到 3D 點，以 [R | t] 轉到下一個影格的相機座標再投影。
+    回傳 (光流 (N, H, W, 2) 像素位移 [du, dv]，場景流 (N, H, W, 3) 相機座標的 3D 位移 [dx, dy, dz]（公尺）)，
+    皆為 float32；深度無效、被限制在下限或 max_depth，或投影到相機後方的像素為 NaN。
+    """
+    n, height, width = planar_stack.shape
+    grid = ray_grid(width, height, fov_degrees)
+    focal = focal_length_px(width, fov_degrees)
+    transforms = np.asarray(transforms, dtype=np.float32)
+    points = grid[np.newaxis] * planar_stack[..., np.newaxis]
+    # 整批以一次批次矩陣乘法套用各影格的旋轉
+    moved = np.matmul(points.reshape(n, -1, 3), transforms[:, :, :3].transpose(0, 2, 1)).reshape(points.shape)
+    moved += transforms[:, np.newaxis, np.newaxis, :, 3]
+    depth_next = moved[..., 2]
+    invalid = ~(np.isfinite(planar_stack) & (planar_stack > 1e-6) & (planar_stack < max_depth * (1 - 1e-5))
+                & (depth_next > 1e-6))
+    flow = np.empty((n, height, width, 2), dtype=np.float32)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(moved[..., :2], depth_next[..., np.newaxis], out=flow)
+    flow -= grid[np.newaxis, ..., :2]
+    flow *= np.float32(focal)
+    scene_flow = moved
+    scene_flow -= points
+    flow[invalid] = np.nan
+    scene_flow[invalid] = np.nan
+    return flow, scene_flow
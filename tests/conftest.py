@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 工具腳本皆為 Tools&Settings 中的扁平模組
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Tools&Settings'))
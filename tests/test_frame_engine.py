@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+import numpy as np
+import Frame_Engine
+from Fake_Recording import write_recording
+from Frame_Index import scan_folder
+from Frame_Engine import (BufferPool, FrameConfig, compute_batch, right_view_kernel, run_frame_pipeline,
+                          split_batch)
+from PFM_Codec import read_pfm, write_pfm
+
+FRAMES = 12
+WIDTH, HEIGHT = 64, 48
+
+def run_to_completion(tasks, config, timeout=60):
+    """在背景執行緒中執行管線，超過 timeout 秒仍未結束時判定為卡住"""
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(result=run_frame_pipeline(tasks, config)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), '管線沒有在時限內完成 / pipeline did not finish'
+    return outcome['result']
+
+def convert(tmp_path, depth_type, depth_output='planar', batch_size=4):
+    images_folder = write_recording(str(tmp_path), FRAMES, WIDTH, HEIGHT, variants=4, folder_name=depth_type,
+                                    depth_type=depth_type)
+    output_folder = os.path.join(str(tmp_path), f'{depth_type}_{depth_output}')
+    os.makedirs(output_folder)
+    config = FrameConfig(output_folder, 32.0, 0.2, 40.0, batch_size=batch_size, fov=90.0,
+                         depth_output=depth_output)
+    tasks = sorted(scan_folder(images_folder).frame_paths(1, FRAMES).items())
+    results, errors, _ = run_to_completion(tasks, config)
+    assert errors == []
+    assert len(results) == FRAMES
+    return output_folder
+
+def test_mixed_planar_perspective_batches_complete(tmp_path):
+    # 批次中 DepthPlanar 與 DepthPerspective 逐影格交替，組數多於緩衝區數量時也不能卡住
+    mixed = convert(tmp_path, 'mixed', batch_size=8)
+    planar = convert(tmp_path, 'planar', batch_size=8)
+    for frame in range(1, FRAMES + 1):
+        for prefix in ('DepthGT', 'Disparity'):
+            np.testing.assert_allclose(read_pfm(os.path.join(mixed, f'{prefix}_{frame}.pfm')),
+                                       read_pfm(os.path.join(planar, f'{prefix}_{frame}.pfm')), rtol=1e-5)
+
+def test_mixed_recording_perspective_output(tmp_path):
+    mixed = convert(tmp_path, 'mixed', 'perspective')
+    perspective = convert(tmp_path, 'perspective', 'perspective')
+    for frame in range(1, FRAMES + 1):
+        np.testing.assert_allclose(read_pfm(os.path.join(mixed, f'DepthGT_{frame}.pfm')),
+                                   read_pfm(os.path.join(perspective, f'DepthGT_{frame}.pfm')), rtol=1e-5)
+
+def test_interleaved_depthless_and_mixed_shape_batches_complete(tmp_path, monkeypatch):
+    # 沒有深度圖的影格與兩種解析度交錯出現：組數多於緩衝區數量時也不能卡住，結果與單張計算相同
+    images_folder = write_recording(str(tmp_path), FRAMES, WIDTH, HEIGHT, variants=4)
+    tasks = sorted(scan_folder(images_folder).frame_paths(1, FRAMES).items())
+    small_folder = os.path.join(str(tmp_path), 'small')
+    os.makedirs(small_folder)
+    expected = {}
+    for frame, paths in tasks:
+        if frame % 2 == 0:
+            del paths['depth']
+        elif frame > FRAMES * 2 // 3:
+            depth = read_pfm(paths['depth'])[::2, ::2]
+            paths['depth'] = os.path.join(small_folder, f'depth_{frame}.pfm')
+            write_pfm(paths['depth'], depth)
+        if 'depth' in paths:
+            expected[frame] = np.clip(read_pfm(paths['depth']), 1e-6, 40.0)
+    output_folder = os.path.join(str(tmp_path), 'output')
+    os.makedirs(output_folder)
+    config = FrameConfig(output_folder, 32.0, 0.2, 40.0, batch_size=8, fov=90.0)
+    # 放慢計算，讓讀取執行緒先填滿佇列，之後的每一批都是完整的 8 個交錯影格
+    kernel = Frame_Engine.depth_batch_kernel
+    monkeypatch.setattr(Frame_Engine, 'depth_batch_kernel', lambda *args: (time.sleep(0.1), kernel(*args))[1])
+    results, errors, _ = run_to_completion(tasks, config)
+    assert errors == []
+    assert sorted(frame for frame, _ in results) == list(range(1, FRAMES + 1))
+    for frame in range(1, FRAMES + 1):
+        path = os.path.join(output_folder, f'DepthGT_{frame}.pfm')
+        assert os.path.exists(path) == (frame in expected)
+        if frame in expected:
+            np.testing.assert_array_equal(read_pfm(path), expected[frame])
+
+def test_compute_batch_takes_one_buffer_per_group():
+    # 每組只取用一個緩衝區：每種解析度只有一個緩衝區時，整批仍能在不歸還的情況下算完
+    config = FrameConfig('', 32.0, 0.2, 40.0, batch_size=8)
+    pool = BufferPool(config.batch_size, count=1)
+    items = []
+    for frame in range(8):
+        shape = (HEIGHT, WIDTH) if frame % 4 < 2 else (HEIGHT // 2, WIDTH // 2)
+        items.append((frame, {}, None if frame % 2 else np.full(shape, frame + 1.0, dtype=np.float32)))
+    groups = split_batch(items)
+    assert [[frame for frame, _, _ in group] for group in groups] == [[0, 4], [1, 3, 5, 7], [2, 6]]
+    computed = {}
+    for group in groups:
+        for frame, _, maps, _ in compute_batch(group, config, pool):
+            computed[frame] = maps
+    for frame, _, depth in items:
+        if depth is None:
+            assert computed[frame] == {}
+        else:
+            np.testing.assert_array_equal(computed[frame]['DepthGT'], depth)
+
+def test_right_view_keeps_nearer_disparity_and_marks_occlusion():
+    # 左影像 x = 0..5 為背景（視差 1），x = 6..9 為前景（視差 3）：前景在右影像中蓋住背景的 x = 4, 5
+    step = np.array([1, 1, 1, 1, 1, 1, 3, 3, 3, 3], dtype=np.float32)
+    # 第二個影格為固定視差 2，確認整批散佈時各影格、各列互不干擾
+    disparity = np.stack([np.tile(step, (2, 1)), np.full((2, 10), 2, dtype=np.float32)])
+    disparity_right, occlusion = right_view_kernel(disparity)
+
+    np.testing.assert_array_equal(disparity_right[0], np.tile([1, 1, 1, 3, 3, 3, 3, 0, 0, 0], (2, 1)))
+    # x = 0 投影到畫面外，x = 4, 5 被前景遮擋
+    np.testing.assert_array_equal(occlusion[0], np.tile([255, 0, 0, 0, 255, 255, 0, 0, 0, 0], (2, 1)))
+    np.testing.assert_array_equal(disparity_right[1], np.tile([2, 2, 2, 2, 2, 2, 2, 2, 0, 0], (2, 1)))
+    np.testing.assert_array_equal(occlusion[1], np.tile([255, 255, 0, 0, 0, 0, 0, 0, 0, 0], (2, 1)))
+    assert disparity_right.dtype == np.float32 and occlusion.dtype == np.uint8
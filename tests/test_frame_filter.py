@@ -0,0 +1,78 @@
+import os
+import shutil
+import pytest
+import DataGenerator
+from Airsim_Record import REC_FILE_NAME
+from Fake_Recording import write_recording
+from Frame_Index import scan_folder
+from Run_Telemetry import Telemetry
+
+FRAMES = 8
+WIDTH, HEIGHT = 48, 32
+
+@pytest.fixture(autouse=True)
+def telemetry(monkeypatch):
+    monkeypatch.setattr(DataGenerator, 'run_telemetry', Telemetry())
+
+def recording(tmp_path, stationary=()):
+    """
+    寫出假錄製並回傳 (images 資料夾, airsim_rec.txt 的各行欄位)；stationary 中的影格（從 0 起算）
+    複製上一個影格的檔案內容與位姿，模擬車輛靜止時重複錄下的畫面。
+    """
+    images_folder = write_recording(str(tmp_path), FRAMES, WIDTH, HEIGHT, variants=FRAMES)
+    rec_path = os.path.join(os.path.dirname(images_folder), REC_FILE_NAME)
+    with open(rec_path, encoding='utf-8') as f:
+        lines = [line.rstrip('\n').split('\t') for line in f]
+    for index in stationary:
+        previous, row = lines[index], lines[index + 1]
+        row[2:9] = previous[2:9]
+        for src, dst in zip(previous[-1].split(';'), row[-1].split(';')):
+            shutil.copyfile(os.path.join(images_folder, src), os.path.join(images_folder, dst))
+    with open(rec_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(''.join('\t'.join(fields) + '\n' for fields in lines))
+    return images_folder, lines[1:]
+
+def filtered(images_folder, start, end, **settings):
+    frame_index = scan_folder(images_folder, os.path.join(os.path.dirname(images_folder), REC_FILE_NAME))
+    frames = frame_index.frame_paths(start, end)
+    return frames, DataGenerator.apply_frame_filters(frames, frame_index, start, settings, 40.0)
+
+def test_duplicate_frames_are_dropped_and_renumbered(tmp_path):
+    images_folder, _ = recording(tmp_path, stationary=(3, 4))
+    frames, kept = filtered(images_folder, 1, FRAMES, Dedupe_Frames=True)
+    # 影格 4、5 與影格 3 相同，保留的影格從 1 起連續編號
+    assert sorted(kept) == list(range(1, FRAMES - 1))
+    assert [kept[frame] for frame in sorted(kept)] == [frames[frame] for frame in (1, 2, 3, 6, 7, 8)]
+
+def test_duplicate_poses_are_dropped_in_motion_mode(tmp_path):
+    images_folder, _ = recording(tmp_path, stationary=(3,))
+    frames, kept = filtered(images_folder, 1, FRAMES, Subsample_Mode='motion', Subsample_Min_Translation=0.01,
+                            Subsample_Min_Rotation=float('inf'))
+    assert [kept[frame] for frame in sorted(kept)] == [frames[frame] for frame in (1, 2, 3, 5, 6, 7, 8)]
+
+def test_stride_within_range(tmp_path):
+    images_folder, _ = recording(tmp_path)
+    frames, kept = filtered(images_folder, 3, 8, Subsample_Mode='stride', Subsample_Stride=2)
+    assert sorted(kept) == [3, 4, 5]
+    assert [kept[frame] for frame in sorted(kept)] == [frames[frame] for frame in (3, 5, 7)]
+    # 沒有篩選時原樣回傳
+    frames, kept = filtered(images_folder, 3, 8)
+    assert kept is frames
+
+def test_missing_stream_row_is_incomplete_without_shifting(tmp_path, capsys):
+    images_folder, rows = recording(tmp_path)
+    # 第 3 行的右影像掉格
+    os.remove(os.path.join(images_folder, rows[2][-1].split(';')[1]))
+    frame_index = scan_folder(images_folder, os.path.join(os.path.dirname(images_folder), REC_FILE_NAME))
+    frames = frame_index.frame_paths(1, FRAMES)
+    assert frame_index.incomplete == [(int(rows[2][1]), ['right'])]
+    assert len(frames) == FRAMES - 1
+    # 之後的影格仍由同一行的四個檔案組成，沒有與其他行錯位
+    expected = [row for i, row in enumerate(rows) if i != 2]
+    for frame, row in zip(sorted(frames), expected):
+        assert sorted(os.path.basename(path) for path in frames[frame].values()) == sorted(row[-1].split(';'))
+
+    DataGenerator.report_alignment(frame_index)
+    out = capsys.readouterr().out
+    assert rows[2][1] in out and 'right' in out
+    assert DataGenerator.run_telemetry.info['incomplete_rows'] == 1
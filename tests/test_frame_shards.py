@@ -0,0 +1,47 @@
+import os
+import re
+import numpy as np
+import DataGenerator
+from Fake_Recording import write_recording
+from Frame_Shards import check_shards, shard_folder
+from PFM_Codec import read_map
+
+FRAMES = 7
+WIDTH, HEIGHT = 48, 32
+# 效能報告與深度統計每次執行都不同（時間、合併順序），不列入比較
+REPORT_FILES = ('DataGenerator_Report.json', 'DepthStats.npz')
+
+def headless(*args):
+    assert DataGenerator.run_headless([str(arg) for arg in args] + ['--workers', '1', '--scene-flow']) == 0
+
+def result_files(folder):
+    return sorted(name for name in os.listdir(folder) if name not in REPORT_FILES)
+
+def test_two_shards_merge_like_unsharded_run(tmp_path):
+    images_folder = write_recording(str(tmp_path), FRAMES, WIDTH, HEIGHT, variants=3)
+    output = tmp_path / 'ProcessData'
+    for shard in ('1/2', '2/2'):
+        headless('--source', images_folder, '--shard', shard, '--output', output)
+    folders = [shard_folder(str(output), index, 2) for index in (1, 2)]
+
+    # 每個影格只出現在一個分片中，且從 1 起連續編號
+    check = check_shards(folders)
+    assert check.ok, check.problems
+    assert sorted(check.frames) == list(range(1, FRAMES + 1))
+    assert {check.frames[frame][0] for frame in check.frames} == set(folders)
+
+    merged = tmp_path / 'Merged'
+    headless('--merge', *folders, '--results', merged)
+    full = tmp_path / 'Full'
+    headless('--source', images_folder, '--output', tmp_path / 'FullData', '--results', full)
+
+    frames = sorted(int(re.match(r'DepthGT_(\d+)\.', name).group(1))
+                    for name in os.listdir(merged) if name.startswith('DepthGT_'))
+    assert frames == list(range(1, FRAMES + 1))
+    assert result_files(merged) == result_files(full)
+    for name in result_files(merged):
+        if name.endswith(('.pfm', '.npy')):
+            np.testing.assert_array_equal(read_map(os.path.join(merged, name)), read_map(os.path.join(full, name)))
+        else:
+            with open(os.path.join(merged, name), 'rb') as a, open(os.path.join(full, name), 'rb') as b:
+                assert a.read() == b.read(), name
@@ -0,0 +1,13 @@
+import pytest
+from PFM_Codec import is_map_file
+
+@pytest.mark.parametrize('name', ['DepthGT_3.pfm', 'DepthGT_3.png', 'Disparity_3.npy', 'DisparityR_3.npz',
+                                  'Scale2/DepthGT_3.png', 'img_front_left_1_1700000000.pfm',
+                                  'img_front_left_2_1700000000.pfm'])
+def test_map_files(name):
+    assert is_map_file(name)
+
+@pytest.mark.parametrize('name', ['Img0_3.png', 'Seg_3.png', 'Occlusion_3.png', 'Points_3.npy', 'Flow_3.npy',
+                                  'SceneFlow_3.npy', 'img_front_left_0_1700000000.png', 'DepthStats.npz'])
+def test_other_files(name):
+    assert not is_map_file(name)
@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pytest
+import DataGenerator
+from Fake_Recording import write_recording
+from PFM_Codec import read_pfm, write_pfm
+from Run_Manifest import MANIFEST_NAME
+
+FRAMES = 6
+WIDTH, HEIGHT = 48, 32
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    """回傳 run(**設定)：以命令列模式處理假錄製的所有影格，回傳這次實際轉換的影格編號"""
+    images_folder = write_recording(str(tmp_path), FRAMES, WIDTH, HEIGHT, variants=3)
+    converted = []
+
+    def spy(tasks, *args, **kwargs):
+        converted.append(sorted(frame for frame, _ in tasks))
+        return run_frame_conversion(tasks, *args, **kwargs)
+    run_frame_conversion = DataGenerator.run_frame_conversion
+    monkeypatch.setattr(DataGenerator, 'run_frame_conversion', spy)
+
+    def run_once(**overrides):
+        settings = {'output_folder_Seg': os.path.join(str(tmp_path), 'ProcessData'), 'Worker_Num': 1,
+                    'MaxDepth': 40.0, 'FOV_degrees': 90, 'image_width': WIDTH, 'image_height': HEIGHT}
+        settings.update(overrides)
+        assert DataGenerator.process_raw_data(input_source=images_folder, frame_range=(1, FRAMES),
+                                              settings=settings)
+        return converted.pop()
+    run_once.images_folder = images_folder
+    run_once.output_folder = os.path.join(str(tmp_path), 'ProcessData')
+    return run_once
+
+def output_mtimes(folder):
+    """輸出檔的修改時間；影格清單每次結束時都會重寫為每個影格一行，因此改為比較內容"""
+    mtimes = {name: os.stat(os.path.join(folder, name)).st_mtime_ns for name in os.listdir(folder)}
+    with open(os.path.join(folder, MANIFEST_NAME), encoding='utf-8') as f:
+        mtimes[MANIFEST_NAME] = f.read()
+    return mtimes
+
+def test_second_run_is_noop(run):
+    assert run() == list(range(1, FRAMES + 1))
+    before = output_mtimes(run.output_folder)
+    assert run() == []
+    assert output_mtimes(run.output_folder) == before
+
+def test_edited_source_rerenders_only_that_frame(run):
+    run()
+    depth_files = sorted(name for name in os.listdir(run.images_folder) if name.endswith('.pfm'))
+    # 第 3 個影格的深度圖改為 5 公尺的平面
+    path = os.path.join(run.images_folder, depth_files[2])
+    write_pfm(path, np.full_like(read_pfm(path, mmap=False), 5.0))
+    assert run() == [3]
+    np.testing.assert_array_equal(read_pfm(os.path.join(run.output_folder, 'DepthGT_3.pfm')), 5.0)
+
+def test_changed_config_hash_rerenders_all_frames(run):
+    run()
+    assert run(MaxDepth=20.0) == list(range(1, FRAMES + 1))
+    assert read_pfm(os.path.join(run.output_folder, 'DepthGT_1.pfm')).max() <= 20.0
+    assert run(MaxDepth=20.0) == []
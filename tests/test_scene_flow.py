@@ -0,0 +1,55 @@
+import numpy as np
+from Camera_Model import focal_length_px, ray_grid
+from Scene_Flow import euler_matrix, flow_batch, relative_transform
+
+WIDTH, HEIGHT, FOV, MAX_DEPTH = 64, 48, 90.0, 100.0
+
+def yaw_pose(x, y, yaw_degrees):
+    """只有偏航的車輛位姿（airsim_rec.txt 一行的 position 與 orientation (w, x, y, z)）"""
+    half = np.deg2rad(yaw_degrees) / 2
+    return {'position': (x, y, 0.0), 'orientation': (np.cos(half), 0.0, 0.0, np.sin(half))}
+
+def world_from_camera(pose, mount, offset):
+    """相機（x 向右、y 向下、z 向前）到世界座標 (NED) 的旋轉與平移，以獨立的寫法計算作為對照"""
+    yaw = 2 * np.arctan2(pose['orientation'][3], pose['orientation'][0])
+    body = np.array([[np.cos(yaw), -np.sin(yaw), 0.0], [np.sin(yaw), np.cos(yaw), 0.0], [0.0, 0.0, 1.0]])
+    axes = np.array([[0.0, 0.0, 1.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    return body @ mount @ axes, body @ offset + np.asarray(pose['position'])
+
+def expected_flow(depth, pose0, pose1, mount, offset):
+    """將每個像素反投影到世界座標，再投影到下一個影格的相機，回傳像素位移 (H, W, 2)"""
+    points = ray_grid(WIDTH, HEIGHT, FOV).astype(np.float64) * depth[..., np.newaxis]
+    r0, t0 = world_from_camera(pose0, mount, offset)
+    r1, t1 = world_from_camera(pose1, mount, offset)
+    world = points @ r0.T + t0
+    moved = (world - t1) @ r1
+    focal = focal_length_px(WIDTH, FOV)
+    return focal * (moved[..., :2] / moved[..., 2:] - points[..., :2] / points[..., 2:])
+
+def test_yawing_flow_includes_camera_offset():
+    # 轉彎（每影格 3 度）時，位於車輛前方 2 公尺的相機會額外橫向平移
+    rng = np.random.default_rng(0)
+    depth = rng.uniform(3.0, 20.0, (HEIGHT, WIDTH)).astype(np.float32)
+    pose0, pose1 = yaw_pose(0.0, 0.0, 10.0), yaw_pose(0.3, 0.05, 13.0)
+    mount, offset = euler_matrix(0.0, 0.0, 0.0), np.array([2.0, -0.1, -1.0])
+    expected = expected_flow(depth, pose0, pose1, mount, offset)
+
+    rotation, translation = relative_transform(pose0, pose1, (mount, offset))
+    transform = np.hstack([rotation, translation[:, np.newaxis]])
+    flow, _ = flow_batch(depth[np.newaxis], [transform], FOV, MAX_DEPTH)
+    np.testing.assert_allclose(flow[0], expected, atol=1e-2)
+
+    # 忽略相機安裝位置時，近處的光流會明顯偏差
+    rotation, translation = relative_transform(pose0, pose1)
+    flow, _ = flow_batch(depth[np.newaxis], [np.hstack([rotation, translation[:, np.newaxis]])], FOV, MAX_DEPTH)
+    assert np.nanmax(np.abs(flow[0] - expected)) > 1.0
+
+def test_camera_rotation_mount():
+    # 相機朝右偏 30 度且向下俯 5 度安裝時，相對運動仍與逐點計算一致
+    rng = np.random.default_rng(1)
+    depth = rng.uniform(3.0, 20.0, (HEIGHT, WIDTH)).astype(np.float32)
+    pose0, pose1 = yaw_pose(5.0, 2.0, -20.0), yaw_pose(5.4, 1.9, -24.0)
+    mount, offset = euler_matrix(-5.0, 0.0, 30.0), np.array([1.5, 0.4, -1.2])
+    rotation, translation = relative_transform(pose0, pose1, (mount, offset))
+    flow, _ = flow_batch(depth[np.newaxis], [np.hstack([rotation, translation[:, np.newaxis]])], FOV, MAX_DEPTH)
+    np.testing.assert_allclose(flow[0], expected_flow(depth, pose0, pose1, mount, offset), atol=1e-2)